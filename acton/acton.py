@@ -2,10 +2,12 @@
 
 import logging
 import time
-from typing import Iterable, List, TypeVar
+from typing import Iterable, Iterator, List, Sequence, Tuple, TypeVar
 
 import acton.database
+import acton.index
 import acton.labellers
+import acton.pool
 import acton.predictors
 import acton.proto.io
 import acton.proto.wrappers
@@ -78,6 +80,33 @@ def validate_recommender(recommender: str):
                                       acton.recommenders.RECOMMENDERS.keys()))
 
 
+def predict_chunks(
+        predictor: acton.predictors.Predictor,
+        ids: Sequence[int],
+        chunk_size: int) -> Iterator[Tuple[Sequence[int], numpy.ndarray]]:
+    """Lazily predicts labels for chunks of instances.
+
+    Parameters
+    ----------
+    predictor
+        Fitted predictor.
+    ids
+        IDs of instances to predict.
+    chunk_size
+        Number of instances to predict at once.
+
+    Yields
+    ------
+    (Sequence[int], numpy.ndarray)
+        IDs of a chunk of instances and the corresponding N x T x C array of
+        predictions.
+    """
+    for start in range(0, len(ids), chunk_size):
+        chunk_ids = ids[start:start + chunk_size]
+        predictions, _variances = predictor.predict(chunk_ids)
+        yield chunk_ids, predictions
+
+
 def simulate_active_learning(
         ids: Iterable[int],
         db: acton.database.Database,
@@ -88,7 +117,14 @@ def simulate_active_learning(
         test_size: int=0.2,
         recommender: str='RandomRecommender',
         predictor: str='LogisticRegression',
-        n_recommendations: int=1):
+        n_recommendations: int=1,
+        candidate_pool_size: float=None,
+        candidate_sampling: str='random',
+        chunk_size: int=None,
+        diversity: float=0.5,
+        selection: str='boltzmann',
+        index_path: str=None,
+        density_weight: float=0):
     """Simulates an active learning task.
 
     Parameters
@@ -113,6 +149,32 @@ def simulate_active_learning(
         Name of predictor to make predictions.
     n_recommendations
         Number of recommendations to make at once.
+    candidate_pool_size
+        Number of unlabelled instances to predict and recommend from each
+        epoch, or the fraction of the unlabelled pool if less than 1. If not
+        specified, the whole unlabelled pool is used.
+    candidate_sampling
+        How to sample the candidate pool: 'random' or 'systematic'. See
+        acton.pool.Pool.sample_unlabelled.
+    chunk_size
+        Number of unlabelled instances to predict at once. If specified,
+        recommendations are streamed over chunks of the unlabelled pool so
+        that predictions for the whole pool are never held in memory, and the
+        predictor reads and predicts features in chunks of this size. See
+        acton.recommenders.Recommender.recommend_stream and
+        acton.predictors.predict_chunked.
+    diversity
+        Recommendation diversity in [0, 1].
+    selection
+        Strategy for selecting recommendations from their scores. One of
+        acton.recommenders.SELECTIONS.
+    index_path
+        Path to an index over the features of the pool. It is built if it
+        doesn't exist and updated if it is missing instances. See
+        acton.index.FeatureIndex.
+    density_weight
+        Exponent of the density that recommendation scores are weighted by.
+        Requires index_path.
     """
     validate_recommender(recommender)
     validate_predictor(predictor)
@@ -121,7 +183,14 @@ def simulate_active_learning(
     numpy.random.seed(0)
 
     # Bytestring describing this run.
-    metadata = '{} | {}'.format(recommender, predictor).encode('ascii')
+    metadata = '{} | {}'.format(recommender, predictor)
+    if selection != 'boltzmann':
+        metadata += ' | {} selection (diversity {})'.format(
+            selection, diversity)
+    if candidate_pool_size:
+        metadata += ' | {} candidates ({})'.format(
+            candidate_pool_size, candidate_sampling)
+    metadata = metadata.encode('ascii')
 
     # Split into training and testing sets.
     logging.debug('Found {} instances.'.format(len(ids)))
@@ -133,20 +202,26 @@ def simulate_active_learning(
     # Set up predictor, labeller, and recommender.
     # TODO(MatthewJA): Handle multiple labellers better than just averaging.
     predictor_name = predictor  # For saving.
-    predictor = acton.predictors.PREDICTORS[predictor](db=db, n_jobs=-1)
+    predictor = acton.predictors.PREDICTORS[predictor](
+        db=db, n_jobs=-1, chunk_size=chunk_size)
 
     labeller = acton.labellers.DatabaseLabeller(db)
-    recommender = acton.recommenders.RECOMMENDERS[recommender](db=db)
+    index = None
+    if index_path:
+        logging.debug('Opening index {}.'.format(index_path))
+        index = acton.index.FeatureIndex.from_database(
+            db, index_path, ids=ids, with_density=bool(density_weight))
+    recommender = acton.recommenders.RECOMMENDERS[recommender](
+        db=db, selection=selection, index=index,
+        density_weight=density_weight)
 
     # Draw some initial labels.
     logging.debug('Drawing initial labels.')
     recommendations = draw(n_initial_labels, train_ids, replace=False)
     logging.debug('Recommending: {}'.format(recommendations))
 
-    # This will store all IDs of things we have already labelled.
-    labelled_ids = []
-    # This will store all the corresponding labels.
-    labels = numpy.zeros((0, 1))
+    # This tracks which instances we have already labelled.
+    pool = acton.pool.Pool(ids)
 
     # Simulation loop.
     logging.debug('Writing protobufs to {}.'.format(output_path))
@@ -156,13 +231,10 @@ def simulate_active_learning(
         logging.info('Epoch {}/{}'.format(epoch + 1, n_epochs))
         # Label the recommendations.
         logging.debug('Labelling recommendations.')
-        new_labels = numpy.array([
-            labeller.query(id_) for id_ in recommendations]).reshape((-1, 1))
-
-        labelled_ids.extend(recommendations)
-        logging.debug('Sorting label IDs.')
-        labelled_ids.sort()
-        labels = numpy.concatenate([labels, new_labels], axis=0)
+        new_labels = labeller.query_batch(recommendations)
+        logging.debug('Labels: {}'.format(new_labels.ravel()))
+        pool.label(recommendations)
+        labelled_ids = pool.labelled_ids
 
         # Here, we would write the labels to the database, but they're already
         # there since we're just reading them from there anyway.
@@ -178,7 +250,8 @@ def simulate_active_learning(
         logging.debug(
             'Making predictions (reference, n = {}).'.format(len(test_ids)))
         then = time.time()
-        test_pred, _test_var = predictor.reference_predict(test_ids)
+        test_pred, _test_var = predictor.reference_predict(
+            test_ids, compute_confidences=False)
         logging.debug('(Took {:.02} s.)'.format(time.time() - then))
 
         logging.debug(test_pred)
@@ -195,12 +268,26 @@ def simulate_active_learning(
         writer.send(proto.proto)
 
         # Pass the predictions to the recommender.
-        unlabelled_ids = list(set(ids) - set(labelled_ids))
-        if not unlabelled_ids:
+        unlabelled_ids = pool.unlabelled_ids
+        if not len(unlabelled_ids):
             logging.info('Labelled all instances.')
             break
 
-        unlabelled_ids.sort()
+        if candidate_pool_size:
+            unlabelled_ids = pool.sample_unlabelled(
+                candidate_pool_size, strategy=candidate_sampling)
+
+        if chunk_size:
+            logging.debug(
+                'Making predictions and recommendations (unlabelled, n = {}, '
+                'chunk size = {}).'.format(len(unlabelled_ids), chunk_size))
+            then = time.time()
+            recommendations = recommender.recommend_stream(
+                predict_chunks(predictor, unlabelled_ids, chunk_size),
+                n=n_recommendations, diversity=diversity)
+            logging.debug('(Took {:.02} s.)'.format(time.time() - then))
+            logging.debug('Recommending: {}'.format(recommendations))
+            continue
 
         logging.debug(
             'Making predictions (unlabelled, n = {}).'.format(
@@ -210,7 +297,8 @@ def simulate_active_learning(
         logging.debug('(Took {:.02} s.)'.format(time.time() - then))
         logging.debug('Making recommendations.')
         recommendations = recommender.recommend(
-            unlabelled_ids, predictions, n=n_recommendations)
+            unlabelled_ids, predictions, n=n_recommendations,
+            diversity=diversity)
         logging.debug('Recommending: {}'.format(recommendations))
 
     return 0
@@ -284,7 +372,10 @@ def main(data_path: str, feature_cols: List[str], label_col: str,
          output_path: str, n_epochs: int=10, initial_count: int=10,
          recommender: str='RandomRecommender',
          predictor: str='LogisticRegression', pandas_key: str='',
-         n_recommendations: int=1):
+         n_recommendations: int=1, candidate_pool_size: float=None,
+         candidate_sampling: str='random', chunk_size: int=None,
+         diversity: float=0.5, selection: str='boltzmann',
+         index_path: str=None, density_weight: float=0):
     """Simulate an active learning experiment.
 
     Parameters
@@ -310,6 +401,25 @@ def main(data_path: str, feature_cols: List[str], label_col: str,
         Key for pandas HDF5. Specify iff using pandas.
     n_recommendations
         Number of recommendations to make at once.
+    candidate_pool_size
+        Number of unlabelled instances to predict and recommend from each
+        epoch, or the fraction of the unlabelled pool if less than 1.
+    candidate_sampling
+        How to sample the candidate pool: 'random' or 'systematic'.
+    chunk_size
+        Number of unlabelled instances to predict at once. If not specified,
+        the whole candidate pool is predicted at once.
+    diversity
+        Recommendation diversity in [0, 1].
+    selection
+        Strategy for selecting recommendations from their scores. One of
+        acton.recommenders.SELECTIONS.
+    index_path
+        Path to an index over the features of the pool. Built if it doesn't
+        exist.
+    density_weight
+        Exponent of the density that recommendation scores are weighted by.
+        Requires index_path.
     """
     DB, db_kwargs = get_DB(data_path, pandas_key=pandas_key)
 
@@ -317,18 +427,26 @@ def main(data_path: str, feature_cols: List[str], label_col: str,
     db_kwargs['label_col'] = label_col
 
     with DB(data_path, **db_kwargs) as reader:
-        return simulate_active_learning(reader.get_known_instance_ids(), reader,
-                                        db_kwargs, output_path,
-                                        n_epochs=n_epochs,
-                                        n_initial_labels=initial_count,
-                                        recommender=recommender,
-                                        predictor=predictor,
-                                        n_recommendations=n_recommendations)
+        return simulate_active_learning(
+            reader.get_known_instance_ids(), reader, db_kwargs, output_path,
+            n_epochs=n_epochs,
+            n_initial_labels=initial_count,
+            recommender=recommender,
+            predictor=predictor,
+            n_recommendations=n_recommendations,
+            candidate_pool_size=candidate_pool_size,
+            candidate_sampling=candidate_sampling,
+            chunk_size=chunk_size,
+            diversity=diversity,
+            selection=selection,
+            index_path=index_path,
+            density_weight=density_weight)
 
 
 def predict(
         labels: acton.proto.wrappers.LabelPool,
-        predictor: str) -> acton.proto.wrappers.Predictions:
+        predictor: str,
+        chunk_size: int=None) -> acton.proto.wrappers.Predictions:
     """Train a predictor and predict labels.
 
     Parameters
@@ -337,6 +455,9 @@ def predict(
         IDs of labelled instances.
     predictor
         Name of predictor to make predictions.
+    chunk_size
+        Number of instances to predict at once. If not specified, all
+        instances are predicted at once. See acton.predictors.predict_chunked.
     """
     validate_predictor(predictor)
 
@@ -345,12 +466,14 @@ def predict(
         train_ids = labels.ids
 
         predictor_name = predictor
-        predictor = acton.predictors.PREDICTORS[predictor](db=db, n_jobs=-1)
+        predictor = acton.predictors.PREDICTORS[predictor](
+            db=db, n_jobs=-1, chunk_size=chunk_size)
 
         logging.debug('Training predictor with IDs: {}'.format(train_ids))
         predictor.fit(train_ids)
 
-        predictions, _variances = predictor.reference_predict(ids)
+        predictions, _variances = predictor.reference_predict(
+            ids, compute_confidences=False)
 
         # Construct a protobuf for outputting predictions.
         proto = acton.proto.wrappers.Predictions.make(
@@ -365,7 +488,11 @@ def predict(
 def recommend(
         predictions: acton.proto.wrappers.Predictions,
         recommender: str='RandomRecommender',
-        n_recommendations: int=1) -> acton.proto.wrappers.Recommendations:
+        n_recommendations: int=1,
+        diversity: float=0.5,
+        selection: str='boltzmann',
+        index_path: str=None,
+        density_weight: float=0) -> acton.proto.wrappers.Recommendations:
     """Recommends instances to label based on predictions.
 
     Parameters
@@ -374,6 +501,17 @@ def recommend(
         Name of recommender to make recommendations.
     n_recommendations
         Number of recommendations to make at once. Default 1.
+    diversity
+        Recommendation diversity in [0, 1]. Default 0.5.
+    selection
+        Strategy for selecting recommendations from their scores. One of
+        acton.recommenders.SELECTIONS. Default 'boltzmann'.
+    index_path
+        Path to an index over the features of the predicted instances. Built
+        if it doesn't exist.
+    density_weight
+        Exponent of the density that recommendation scores are weighted by.
+        Requires index_path. Default 0.
 
     Returns
     -------
@@ -395,9 +533,16 @@ def recommend(
 
     with predictions.DB() as db:
         recommender_name = recommender
-        recommender = acton.recommenders.RECOMMENDERS[recommender](db=db)
+        index = None
+        if index_path:
+            index = acton.index.FeatureIndex.from_database(
+                db, index_path, ids=predictions.predicted_ids,
+                with_density=bool(density_weight))
+        recommender = acton.recommenders.RECOMMENDERS[recommender](
+            db=db, selection=selection, index=index,
+            density_weight=density_weight)
         recommendations = recommender.recommend(
-            ids, predictions_array, n=n_recommendations)
+            ids, predictions_array, n=n_recommendations, diversity=diversity)
 
         logging.debug('Recommending: {}'.format(list(recommendations)))
 
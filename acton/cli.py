@@ -6,6 +6,7 @@ import sys
 from typing import BinaryIO, Iterable, List
 
 import acton.acton
+import acton.database
 import acton.predictors
 import acton.proto.wrappers
 import acton.recommenders
@@ -69,6 +70,35 @@ def write_binary(string: bytes):
     sys.stdout.buffer.flush()
 
 
+def validate_diversity(ctx: click.Context, param: click.Parameter,
+                       value: float) -> float:
+    """Checks that a diversity is in [0, 1].
+
+    Parameters
+    ----------
+    ctx
+        Click context.
+    param
+        Diversity parameter.
+    value
+        Diversity.
+
+    Returns
+    -------
+    float
+        Diversity.
+
+    Raises
+    ------
+    click.BadParameter
+        If the diversity is not in [0, 1].
+    """
+    if not 0 <= value <= 1:
+        raise click.BadParameter('must be in [0, 1]: {}'.format(value))
+
+    return value
+
+
 # acton
 
 
@@ -98,8 +128,22 @@ def write_binary(string: bytes):
               help='Column name of IDs')
 @click.option('--diversity',
               type=float,
-              help='Diversity of recommendations',
-              default=0.0)
+              callback=validate_diversity,
+              help='Diversity of recommendations in [0, 1]',
+              default=0.5)
+@click.option('--selection',
+              type=click.Choice(acton.recommenders.SELECTIONS.keys()),
+              default='boltzmann',
+              help='How to select recommendations from their scores')
+@click.option('--index',
+              type=click.Path(dir_okay=False),
+              help='Path to a nearest-neighbour index over the features, '
+                   'built if it does not exist')
+@click.option('--density-weight',
+              type=float,
+              default=0.0,
+              help='Weight recommendations by feature density to this power '
+                   '(requires --index)')
 @click.option('--recommendation-count',
               type=int,
               help='Number of recommendations to make',
@@ -124,6 +168,18 @@ def write_binary(string: bytes):
               type=str,
               default='',
               help='Key for pandas HDF5')
+@click.option('--candidate-pool-size',
+              type=float,
+              help='Number (or fraction, if less than 1) of unlabelled '
+                   'instances to predict and recommend from each epoch')
+@click.option('--candidate-sampling',
+              type=click.Choice(['random', 'systematic']),
+              default='random',
+              help='How to sample the candidate pool')
+@click.option('--chunk-size',
+              type=int,
+              help='Number of unlabelled instances to predict at once when '
+                   'streaming recommendations')
 @click.option('-v', '--verbose',
               is_flag=True,
               help='Verbose output')
@@ -135,6 +191,9 @@ def main(
         epochs: int,
         id: str,
         diversity: float,
+        selection: str,
+        index: str,
+        density_weight: float,
         recommendation_count: int,
         labeller_accuracy: float,
         initial_count: int,
@@ -142,8 +201,11 @@ def main(
         recommender: str,
         verbose: bool,
         pandas_key: str,
+        candidate_pool_size: float,
+        candidate_sampling: str,
+        chunk_size: int,
 ):
-    logging.warning('Not implemented: diversity, id_col, labeller_accuracy')
+    logging.warning('Not implemented: id_col, labeller_accuracy')
     logging.captureWarnings(True)
     if verbose:
         logging.root.setLevel(logging.DEBUG)
@@ -157,7 +219,14 @@ def main(
         recommender=recommender,
         predictor=predictor,
         pandas_key=pandas_key,
-        n_recommendations=recommendation_count)
+        n_recommendations=recommendation_count,
+        candidate_pool_size=candidate_pool_size,
+        candidate_sampling=candidate_sampling,
+        chunk_size=chunk_size,
+        diversity=diversity,
+        selection=selection,
+        index_path=index,
+        density_weight=density_weight)
 
 
 # acton-predict
@@ -168,11 +237,15 @@ def main(
               type=click.Choice(acton.predictors.PREDICTORS.keys()),
               default='LogisticRegression',
               help='Predictor to use')
+@click.option('--chunk-size',
+              type=int,
+              help='Number of instances to predict at once')
 @click.option('-v', '--verbose',
               is_flag=True,
               help='Verbose output')
 def predict(
         predictor: str,
+        chunk_size: int,
         verbose: bool,
 ):
     # Logging setup.
@@ -185,7 +258,8 @@ def predict(
     labels = acton.proto.wrappers.LabelPool.deserialise(labels)
 
     # Write predictions.
-    proto = acton.acton.predict(labels=labels, predictor=predictor)
+    proto = acton.acton.predict(labels=labels, predictor=predictor,
+                                chunk_size=chunk_size)
     write_binary(proto.proto.SerializeToString())
 
 
@@ -195,8 +269,22 @@ def predict(
 @click.command()
 @click.option('--diversity',
               type=float,
-              help='Diversity of recommendations',
-              default=0.0)
+              callback=validate_diversity,
+              help='Diversity of recommendations in [0, 1]',
+              default=0.5)
+@click.option('--selection',
+              type=click.Choice(acton.recommenders.SELECTIONS.keys()),
+              default='boltzmann',
+              help='How to select recommendations from their scores')
+@click.option('--index',
+              type=click.Path(dir_okay=False),
+              help='Path to a nearest-neighbour index over the features, '
+                   'built if it does not exist')
+@click.option('--density-weight',
+              type=float,
+              default=0.0,
+              help='Weight recommendations by feature density to this power '
+                   '(requires --index)')
 @click.option('--recommendation-count',
               type=int,
               help='Number of recommendations to make',
@@ -210,12 +298,14 @@ def predict(
               help='Verbose output')
 def recommend(
         diversity: float,
+        selection: str,
+        index: str,
+        density_weight: float,
         recommendation_count: int,
         recommender: str,
         verbose: bool,
 ):
     # Logging setup.
-    logging.warning('Not implemented: diversity')
     logging.captureWarnings(True)
     if verbose:
         logging.root.setLevel(logging.DEBUG)
@@ -228,7 +318,11 @@ def recommend(
     proto = acton.acton.recommend(
         predictions=predictions,
         recommender=recommender,
-        n_recommendations=recommendation_count)
+        n_recommendations=recommendation_count,
+        diversity=diversity,
+        selection=selection,
+        index_path=index,
+        density_weight=density_weight)
     write_binary(proto.proto.SerializeToString())
 
 
@@ -319,5 +413,47 @@ def label(
     write_binary(proto.proto.SerializeToString())
 
 
+# acton-layout
+
+
+@click.command()
+@click.option('--instances',
+              type=int,
+              required=True,
+              help='Number of instances in the dataset')
+@click.option('--features',
+              type=int,
+              required=True,
+              help='Number of features in the dataset')
+@click.option('--feature-dtype',
+              type=str,
+              default='float32',
+              help='Data type of features')
+@click.option('--max-instances',
+              type=int,
+              default=100000,
+              help='Maximum number of instances to benchmark with')
+@click.option('-v', '--verbose',
+              is_flag=True,
+              help='Verbose output')
+def layout(
+        instances: int,
+        features: int,
+        feature_dtype: str,
+        max_instances: int,
+        verbose: bool,
+):
+    # Logging setup.
+    logging.captureWarnings(True)
+    if verbose:
+        logging.root.setLevel(logging.DEBUG)
+
+    recommended = acton.database.recommend_layout(
+        instances, features, feature_dtype=feature_dtype,
+        max_instances=max_instances)
+    for key, value in sorted(recommended.items()):
+        click.echo('{}: {}'.format(key, value))
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -1,12 +1,14 @@
 """Wrapper class for databases."""
 
 from abc import ABC, abstractmethod
+import hashlib
 from inspect import Traceback
 import json
 import logging
 import os.path
 import tempfile
-from typing import Iterable, List, Sequence
+import time
+from typing import Iterable, List, Sequence, Tuple
 import warnings
 
 from acton.proto.acton_pb2 import Database as DatabasePB
@@ -16,11 +18,15 @@ import astropy.table
 import h5py
 import numpy
 import pandas
+import sklearn.base
 import sklearn.preprocessing
 
 
 LabelEncoderPB = DatabasePB.LabelEncoder
 
+# Number of entries read at once when gathering from an unchunked dataset.
+_GATHER_BLOCK_ROWS = 4096
+
 
 def product(seq: Iterable[int]):
     """Finds the product of a list of ints.
@@ -41,6 +47,143 @@ def product(seq: Iterable[int]):
     return prod
 
 
+def _unique_last(ids: numpy.ndarray) -> numpy.ndarray:
+    """Finds the indices that sort an array of IDs, dropping duplicates.
+
+    Notes
+    -----
+    Where an ID is repeated, the index of its last occurrence is kept. This
+    matches the result of writing rows one at a time, where later rows
+    overwrite earlier ones.
+
+    Parameters
+    ----------
+    ids
+        1D array of IDs.
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices into ids such that ids[indices] is sorted and unique.
+    """
+    order = numpy.argsort(ids, kind='mergesort')
+    sorted_ids = ids[order]
+    is_last = numpy.ones(len(ids), dtype=bool)
+    is_last[:-1] = sorted_ids[1:] != sorted_ids[:-1]
+    return order[is_last]
+
+
+def _contiguous_runs(sorted_ids: numpy.ndarray) -> List[Tuple[int, int]]:
+    """Finds runs of consecutive integers in a sorted array of IDs.
+
+    Parameters
+    ----------
+    sorted_ids
+        Sorted 1D array of unique IDs.
+
+    Returns
+    -------
+    List[Tuple[int, int]]
+        (start, stop) index pairs such that sorted_ids[start:stop] is a run of
+        consecutive IDs.
+    """
+    if not len(sorted_ids):
+        return []
+
+    breaks = numpy.flatnonzero(numpy.diff(sorted_ids) != 1) + 1
+    starts = numpy.concatenate([[0], breaks])
+    stops = numpy.concatenate([breaks, [len(sorted_ids)]])
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _gather(dataset: h5py.Dataset, ids: Sequence[int],
+            axis: int=0) -> numpy.ndarray:
+    """Reads the entries of an HDF5 dataset at the given indices along an axis.
+
+    Notes
+    -----
+    The indices are sorted and duplicates removed; all indices falling in the
+    same HDF5 chunk (or block of _GATHER_BLOCK_ROWS entries, for unchunked
+    datasets) are then read with a single slice spanning them, so each chunk
+    is read at most once. The result
+    is scattered back into the order of `ids`.
+
+    Parameters
+    ----------
+    dataset
+        HDF5 dataset to read from.
+    ids
+        Indices to read along axis. May be unsorted and contain duplicates.
+    axis
+        Axis of dataset to index.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array with the same shape as dataset except along axis, which has
+        length len(ids).
+    """
+    ids = numpy.asarray(ids, dtype=int).ravel()
+    unique_ids, inverse = numpy.unique(ids, return_inverse=True)
+
+    shape = list(dataset.shape)
+    shape[axis] = len(unique_ids)
+    gathered = numpy.empty(shape, dtype=dataset.dtype)
+    if not len(unique_ids):
+        return gathered
+
+    # Group the IDs by the chunk they are stored in. Unchunked datasets are
+    # grouped into blocks of _GATHER_BLOCK_ROWS entries instead, which bounds
+    # the number of reads for large, scattered requests.
+    if dataset.chunks:
+        block_rows = dataset.chunks[axis]
+    else:
+        block_rows = _GATHER_BLOCK_ROWS
+    blocks = unique_ids // block_rows
+    breaks = numpy.flatnonzero(numpy.diff(blocks)) + 1
+    starts = numpy.concatenate([[0], breaks]).astype(int)
+    stops = numpy.concatenate([breaks, [len(unique_ids)]]).astype(int)
+    groups = zip(starts.tolist(), stops.tolist())
+
+    selection = [slice(None)] * len(shape)
+    for start, stop in groups:
+        low = unique_ids[start]
+        high = unique_ids[stop - 1] + 1
+        selection[axis] = slice(low, high)
+        span = dataset[tuple(selection)]
+        selection[axis] = slice(start, stop)
+        gathered[tuple(selection)] = numpy.take(
+            span, unique_ids[start:stop] - low, axis=axis)
+
+    return numpy.take(gathered, inverse, axis=axis)
+
+
+def encode_label_column(
+        encoder: sklearn.preprocessing.LabelEncoder,
+        labels: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Encodes a column of labels as integers of the smallest type that fits.
+
+    Parameters
+    ----------
+    encoder
+        LabelEncoder. A copy is fitted to the labels, so the encoder itself
+        is left unchanged.
+    labels
+        1D array of labels.
+
+    Returns
+    -------
+    numpy.ndarray
+        1D array of encoded labels.
+    numpy.ndarray
+        Classes of the fitted encoder.
+    """
+    encoder = sklearn.base.clone(encoder)
+    encoded = encoder.fit_transform(labels)
+    dtype = numpy.min_scalar_type(max(len(encoder.classes_) - 1, 0))
+    return encoded.astype(dtype), encoder.classes_
+
+
 def serialise_encoder(
         encoder: sklearn.preprocessing.LabelEncoder) -> LabelEncoderPB:
     """Serialises a LabelEncoder as a protobuf.
@@ -237,14 +380,30 @@ class ManagedHDF5Database(HDF5Database):
         Data type of labels.
     feature_dtype : str
         Data type of features.
+    layout : str
+        'row' or 'column' chunk layout of features and labels.
+    chunk_rows : int
+        Number of instances per HDF5 chunk.
+    compression : str
+        HDF5 compression filter: 'gzip', 'lzf', or 'none'.
+    shuffle : bool
+        Whether the HDF5 shuffle filter is applied.
+    read_only : bool
+        Whether the HDF5 file is opened read-only.
     _h5_file : h5py.File
         Opened HDF5 file.
+    _known_ids : Dict[str, numpy.ndarray]
+        Maps 'instance_ids' and 'labeller_ids' to boolean arrays where the ith
+        entry is True iff ID i is known. Loaded when the file is opened, and
+        grown geometrically, so it may extend past the largest known ID.
     _sync_attrs : List[str]
         List of instance attributes to sync with the HDF5 file's attributes.
     """
 
     def __init__(self, path: str, label_dtype: str=None,
-                 feature_dtype: str=None):
+                 feature_dtype: str=None, layout: str=None,
+                 chunk_rows: int=None, compression: str=None,
+                 shuffle: bool=None, read_only: bool=False):
         """
         Parameters
         ----------
@@ -258,15 +417,55 @@ class ManagedHDF5Database(HDF5Database):
             Data type of features. If not provided then it will be read from the
             database file; if the database file does not exist then the default
             type of 'float32' will be used.
+        layout
+            'row' to store whole feature vectors together in each chunk, which
+            suits reading rows by ID, or 'column' to store each feature in
+            its own chunks, which suits reading whole columns. If not provided
+            then it will be read from the database file; if the database file
+            does not exist then the default of 'row' will be used.
+        chunk_rows
+            Number of instances per HDF5 chunk. If not provided then it will be
+            read from the database file; if the database file does not exist
+            then the default of 1024 will be used.
+        compression
+            HDF5 compression filter for features and labels: 'gzip', 'lzf', or
+            'none'. If not provided then it will be read from the database
+            file; if the database file does not exist then the default of
+            'none' will be used.
+        shuffle
+            Whether to apply the HDF5 shuffle filter to features and labels,
+            which usually improves compression. If not provided then it will be
+            read from the database file; if the database file does not exist
+            then the default of False will be used.
+        read_only
+            Whether to open the HDF5 file read-only. The file must exist, and
+            it is never created or modified, so it is safe to share between
+            processes.
         """
         super().__init__(path)
+        self.read_only = read_only
         self.label_dtype = label_dtype
         self._default_label_dtype = 'float32'
         self.feature_dtype = feature_dtype
         self._default_feature_dtype = 'float32'
+        self.layout = layout
+        self._default_layout = 'row'
+        self.chunk_rows = chunk_rows
+        self._default_chunk_rows = 1024
+        self.compression = compression
+        self._default_compression = 'none'
+        self.shuffle = shuffle
+        self._default_shuffle = False
+
+        if layout not in {None, 'row', 'column'}:
+            raise ValueError('Unknown layout: {}'.format(layout))
+
+        if compression not in {None, 'gzip', 'lzf', 'none'}:
+            raise ValueError('Unknown compression: {}'.format(compression))
 
         # List of attributes to keep in sync with the HDF5 file.
-        self._sync_attrs = ['label_dtype', 'feature_dtype']
+        self._sync_attrs = ['label_dtype', 'feature_dtype', 'layout',
+                            'chunk_rows', 'compression', 'shuffle']
 
     def to_proto(self) -> DatabasePB:
         """Serialises this database as a protobuf.
@@ -297,15 +496,114 @@ class ManagedHDF5Database(HDF5Database):
         -----
         The HDF5 file will be stored in self._h5_file.
         """
-        super()._open_hdf5()
+        if self.read_only:
+            self._h5_file = h5py.File(self.path, 'r')
+        else:
+            super()._open_hdf5()
 
-        # Load attrs from HDF5 file if we haven't specified them.
+        # Load attrs from HDF5 file if we haven't specified them. Files made
+        # before an attr existed get the default.
         for attr in self._sync_attrs:
             if getattr(self, attr) is None:
-                setattr(self, attr, self._h5_file.attrs[attr])
+                value = self._h5_file.attrs.get(
+                    attr, getattr(self, '_default_' + attr))
+                if isinstance(value, numpy.generic):
+                    value = value.item()
+                setattr(self, attr, value)
 
         self._validate_hdf5()
 
+        # Index the known IDs in one go so that lookups don't have to read
+        # the file.
+        self._known_ids = {}
+        for dataset in ['instance_ids', 'labeller_ids']:
+            ids = self._h5_file[dataset][()]
+            known = numpy.zeros(ids.max() + 1 if len(ids) else 0, dtype=bool)
+            known[ids] = True
+            self._known_ids[dataset] = known
+
+    def _has_ids(self, dataset: str, ids: Sequence[int]) -> numpy.ndarray:
+        """Checks which IDs are known.
+
+        Parameters
+        ----------
+        dataset
+            Name of the ID dataset, either 'instance_ids' or 'labeller_ids'.
+        ids
+            Iterable of IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array, True where the corresponding ID is known.
+        """
+        self._assert_open()
+        ids = numpy.asarray(ids, dtype=int).ravel()
+        known = self._known_ids[dataset]
+        in_range = (ids >= 0) & (ids < len(known))
+        has_ids = numpy.zeros(len(ids), dtype=bool)
+        has_ids[in_range] = known[ids[in_range]]
+        return has_ids
+
+    def _add_ids(self, dataset: str, ids: numpy.ndarray):
+        """Records IDs in the database and the ID index.
+
+        Parameters
+        ----------
+        dataset
+            Name of the ID dataset, either 'instance_ids' or 'labeller_ids'.
+        ids
+            1D array of unique IDs. IDs that are already known are ignored.
+        """
+        new_ids = ids[~self._has_ids(dataset, ids)]
+        if not len(new_ids):
+            return
+
+        n_old_ids = self._h5_file[dataset].shape[0]
+        self._h5_file[dataset].resize((n_old_ids + len(new_ids),))
+        self._h5_file[dataset][n_old_ids:] = new_ids
+
+        known = self._known_ids[dataset]
+        if new_ids.max() >= len(known):
+            # Grow geometrically so that writing increasing IDs in many small
+            # batches doesn't copy the index every time.
+            grown = numpy.zeros(max(new_ids.max() + 1, 2 * len(known)),
+                                dtype=bool)
+            grown[:len(known)] = known
+            known = grown
+        known[new_ids] = True
+        self._known_ids[dataset] = known
+
+    def has_instance_ids(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Checks which instance IDs are known.
+
+        Parameters
+        ----------
+        ids
+            Iterable of instance IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array, True where the corresponding ID is known.
+        """
+        return self._has_ids('instance_ids', ids)
+
+    def has_labeller_ids(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Checks which labeller IDs are known.
+
+        Parameters
+        ----------
+        ids
+            Iterable of labeller IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array, True where the corresponding ID is known.
+        """
+        return self._has_ids('labeller_ids', ids)
+
     def write_features(self, ids: Sequence[int], features: numpy.ndarray):
         """Writes feature vectors to the database.
 
@@ -330,15 +628,18 @@ class ManagedHDF5Database(HDF5Database):
 
         if self._h5_file.attrs['n_features'] == -1:
             # This is the first time we've stored features, so make a record of
-            # the dimensionality.
+            # the dimensionality. Now that we know it, we can also chunk the
+            # features.
             self._h5_file.attrs['n_features'] = features.shape[1]
+            self._create_dataset(
+                'features', (0, features.shape[1]), self.feature_dtype)
         elif self._h5_file.attrs['n_features'] != features.shape[1]:
             raise ValueError(
                 'Expected features to have dimensionality {}, got {}'.format(
                     self._h5_file.attrs['n_features'], features.shape[1]))
 
         # Early termination.
-        if not ids:
+        if not len(ids):
             return
 
         # Cast the features to the right type.
@@ -347,25 +648,26 @@ class ManagedHDF5Database(HDF5Database):
                 features.dtype, self.feature_dtype))
             features = features.astype(self.feature_dtype)
 
+        # Sort the IDs so that runs of consecutive IDs can be written as single
+        # blocks. HDF5 doesn't fully support NumPy's fancy indexing, and one
+        # write per row is very slow for large arrays.
+        ids = numpy.asarray(ids, dtype=int)
+        order = _unique_last(ids)
+        ids = ids[order]
+        features = features[order]
+
         # Resize the feature array if we need to store more IDs than before.
-        max_id = max(ids) + 1
+        max_id = ids[-1] + 1
         if max_id > self._h5_file['features'].shape[0]:
             self._h5_file['features'].resize(
                 (max_id, self._h5_file.attrs['n_features']))
         # Store the feature vectors.
-        # TODO(MatthewJA): Vectorise this. This could be tricky as HDF5 doesn't
-        # fully support NumPy's fancy indexing.
-        for id_, feature in zip(ids, features):
-            self._h5_file['features'][id_, :] = feature
+        features_h5 = self._h5_file['features']
+        for start, stop in _contiguous_runs(ids):
+            features_h5[ids[start]:ids[stop - 1] + 1] = features[start:stop]
 
         # Add the IDs to the database.
-        known_ids = set(self.get_known_instance_ids())
-        new_ids = [i for i in ids if i not in known_ids]
-        n_new_ids = len(new_ids)
-        n_old_ids = self._h5_file['instance_ids'].shape[0]
-        self._h5_file['instance_ids'].resize((n_old_ids + n_new_ids,))
-        self._h5_file['instance_ids'][-n_new_ids:] = numpy.array(
-            new_ids, dtype=int)
+        self._add_ids('instance_ids', ids)
 
     def read_features(self, ids: Sequence[int]) -> numpy.ndarray:
         """Reads feature vectors from the database.
@@ -385,12 +687,8 @@ class ManagedHDF5Database(HDF5Database):
         if self._h5_file.attrs['n_features'] == -1 and ids:
             raise KeyError('No features stored in database.')
 
-        # Allocate the features array.
-        features = numpy.zeros((len(ids), self._h5_file.attrs['n_features']),
-                               dtype=self._h5_file.attrs['feature_dtype'])
-        # Loop through each ID we want to query and put the associated feature
-        # into the features array.
-        features = self._h5_file['features'].value[ids, :]
+        # Read only the rows we need.
+        features = _gather(self._h5_file['features'], ids)
         features = numpy.asarray(
             features, dtype=self._h5_file.attrs['feature_dtype'])
         return features
@@ -429,15 +727,18 @@ class ManagedHDF5Database(HDF5Database):
 
         if self._h5_file.attrs['label_dim'] == -1:
             # This is the first time we've stored labels, so make a record of
-            # the dimensionality.
+            # the dimensionality. Now that we know it, we can also chunk the
+            # labels.
             self._h5_file.attrs['label_dim'] = labels.shape[2]
+            self._create_dataset(
+                'labels', (0, 0, labels.shape[2]), self.label_dtype)
         elif self._h5_file.attrs['label_dim'] != labels.shape[2]:
             raise ValueError(
                 'Expected labels to have dimensionality {}, got {}'.format(
                     self._h5_file.attrs['label_dim'], labels.shape[2]))
 
         # Early termination.
-        if not labeller_ids or not instance_ids:
+        if not len(labeller_ids) or not len(instance_ids):
             return
 
         # Cast the labels to the right type.
@@ -446,48 +747,43 @@ class ManagedHDF5Database(HDF5Database):
                 labels.dtype, self.label_dtype))
             labels = labels.astype(self.label_dtype)
 
+        # Sort both sets of IDs so that the labels can be written as T x N x D
+        # slabs covering runs of consecutive labeller and instance IDs.
+        labeller_ids = numpy.asarray(labeller_ids, dtype=int)
+        instance_ids = numpy.asarray(instance_ids, dtype=int)
+        labeller_order = _unique_last(labeller_ids)
+        instance_order = _unique_last(instance_ids)
+        labeller_ids = labeller_ids[labeller_order]
+        instance_ids = instance_ids[instance_order]
+        labels = labels[labeller_order][:, instance_order]
+
         # Resize the label array if necessary.
-        max_labeller_id = max(labeller_ids) + 1
-        max_instance_id = max(instance_ids) + 1
+        max_labeller_id = labeller_ids[-1] + 1
+        max_instance_id = instance_ids[-1] + 1
         if (max_labeller_id > self._h5_file['labels'].shape[0] or
                 max_instance_id > self._h5_file['labels'].shape[1]):
             self._h5_file['labels'].resize(
-                (max_labeller_id, max_instance_id,
+                (max(max_labeller_id, self._h5_file['labels'].shape[0]),
+                 max(max_instance_id, self._h5_file['labels'].shape[1]),
                  self._h5_file.attrs['label_dim']))
         # Store the labels.
-        # TODO(MatthewJA): Vectorise this.
-        for labeller_idx, labeller_id in enumerate(labeller_ids):
-            for instance_idx, instance_id in enumerate(instance_ids):
-                label = labels[labeller_idx, instance_idx]
-                self._h5_file['labels'][
-                    labeller_id, instance_id, :] = label
+        labels_h5 = self._h5_file['labels']
+        instance_runs = _contiguous_runs(instance_ids)
+        for l_start, l_stop in _contiguous_runs(labeller_ids):
+            labeller_slice = slice(labeller_ids[l_start],
+                                   labeller_ids[l_stop - 1] + 1)
+            for i_start, i_stop in instance_runs:
+                instance_slice = slice(instance_ids[i_start],
+                                       instance_ids[i_stop - 1] + 1)
+                labels_h5[labeller_slice, instance_slice, :] = labels[
+                    l_start:l_stop, i_start:i_stop]
 
         logging.debug(
             'New label array size: {}'.format(self._h5_file['labels'].shape))
 
-        # Add the instance IDs to the database.
-        known_instance_ids = set(self.get_known_instance_ids())
-        new_instance_ids = [i for i in instance_ids
-                            if i not in known_instance_ids]
-        n_new_instance_ids = len(new_instance_ids)
-        n_old_instance_ids = self._h5_file['instance_ids'].shape[0]
-        if n_new_instance_ids:
-            self._h5_file['instance_ids'].resize(
-                (n_old_instance_ids + n_new_instance_ids,))
-            self._h5_file['instance_ids'][-n_new_instance_ids:] = numpy.array(
-                new_instance_ids, dtype=int)
-
-        # Add the labeller IDs to the database.
-        known_labeller_ids = set(self.get_known_labeller_ids())
-        new_labeller_ids = [i for i in labeller_ids
-                            if i not in known_labeller_ids]
-        n_new_labeller_ids = len(new_labeller_ids)
-        n_old_labeller_ids = self._h5_file['labeller_ids'].shape[0]
-        if n_new_labeller_ids:
-            self._h5_file['labeller_ids'].resize(
-                (n_old_labeller_ids + n_new_labeller_ids,))
-            self._h5_file['labeller_ids'][-n_new_labeller_ids:] = numpy.array(
-                new_labeller_ids, dtype=int)
+        # Add the IDs to the database.
+        self._add_ids('instance_ids', instance_ids)
+        self._add_ids('labeller_ids', labeller_ids)
 
     def read_labels(self,
                     labeller_ids: Sequence[int],
@@ -512,7 +808,10 @@ class ManagedHDF5Database(HDF5Database):
                 labeller_ids or instance_ids):
             raise KeyError('No labels stored in database.')
 
-        labels = self._h5_file['labels'].value[labeller_ids][:, instance_ids, :]
+        # Read only the instances we need. There are few labellers, so we can
+        # select them after reading.
+        labels = _gather(self._h5_file['labels'], instance_ids, axis=1)
+        labels = labels[numpy.asarray(labeller_ids, dtype=int)]
         labels = numpy.asarray(labels, dtype=self._h5_file.attrs['label_dtype'])
 
         return labels
@@ -526,7 +825,7 @@ class ManagedHDF5Database(HDF5Database):
             A list of known instance IDs.
         """
         self._assert_open()
-        return [id_ for id_ in self._h5_file['instance_ids']]
+        return numpy.flatnonzero(self._known_ids['instance_ids']).tolist()
 
     def get_known_labeller_ids(self) -> List[int]:
         """Returns a list of known labeller IDs.
@@ -537,7 +836,46 @@ class ManagedHDF5Database(HDF5Database):
             A list of known labeller IDs.
         """
         self._assert_open()
-        return [id_ for id_ in self._h5_file['labeller_ids']]
+        return numpy.flatnonzero(self._known_ids['labeller_ids']).tolist()
+
+    def _create_dataset(self, name: str, shape: Tuple[int, ...], dtype: str):
+        """Creates an empty, resizable features or labels dataset.
+
+        Notes
+        -----
+        Any existing dataset with the same name is replaced. The chunk shape
+        and filters are set by the layout attributes of this database.
+
+        Parameters
+        ----------
+        name
+            'features' (N x D) or 'labels' (T x N x D).
+        shape
+            Initial shape of the dataset. The last axis is fixed.
+        dtype
+            Data type of the dataset.
+        """
+        dim = max(shape[-1], 1)
+        if self.layout == 'row':
+            feature_chunk = dim
+        else:
+            feature_chunk = 1
+        if name == 'features':
+            chunks = (self.chunk_rows, feature_chunk)
+        else:
+            chunks = (1, self.chunk_rows, feature_chunk)
+
+        kwargs = {}
+        if self.compression != 'none':
+            kwargs['compression'] = self.compression
+        if self.shuffle:
+            kwargs['shuffle'] = True
+
+        if name in self._h5_file:
+            del self._h5_file[name]
+        self._h5_file.create_dataset(name, shape=shape, dtype=dtype,
+                                     maxshape=(None,) * len(shape),
+                                     chunks=chunks, **kwargs)
 
     def _setup_hdf5(self, h5_file: h5py.File):
         """Sets up an HDF5 file to work as a database.
@@ -547,10 +885,11 @@ class ManagedHDF5Database(HDF5Database):
         h5_file
             HDF5 file to set up. Must be opened in write mode.
         """
-        if self.label_dtype is None:
-            self.label_dtype = self._default_label_dtype
-        if self.feature_dtype is None:
-            self.feature_dtype = self._default_feature_dtype
+        for attr in self._sync_attrs:
+            if getattr(self, attr) is None:
+                setattr(self, attr, getattr(self, '_default_' + attr))
+        # The features and labels datasets will be replaced by properly chunked
+        # datasets when their dimensionality is known.
         h5_file.create_dataset('features', shape=(0, 0),
                                dtype=self.feature_dtype,
                                maxshape=(None, None))
@@ -558,11 +897,12 @@ class ManagedHDF5Database(HDF5Database):
                                dtype=self.label_dtype,
                                maxshape=(None, None, None))
         h5_file.create_dataset('instance_ids', shape=(0,),
-                               dtype=int, maxshape=(None,))
+                               dtype=int, maxshape=(None,),
+                               chunks=(self.chunk_rows,))
         h5_file.create_dataset('labeller_ids', shape=(0,),
                                dtype=int, maxshape=(None,))
-        h5_file.attrs['label_dtype'] = self.label_dtype
-        h5_file.attrs['feature_dtype'] = self.feature_dtype
+        for attr in self._sync_attrs:
+            h5_file.attrs[attr] = getattr(self, attr)
         h5_file.attrs['n_features'] = -1
         h5_file.attrs['label_dim'] = -1
 
@@ -588,11 +928,105 @@ class ManagedHDF5Database(HDF5Database):
 
         for attr in self._sync_attrs:
             assert getattr(self, attr) is not None
+            if attr not in self._h5_file.attrs:
+                continue
+
             if self._h5_file.attrs[attr] != getattr(self, attr):
                 raise ValueError('Incompatible {}: expected {}, got {}'.format(
                     attr, getattr(self, attr), self._h5_file.attrs[attr]))
 
 
+def benchmark_layouts(n_instances: int, n_features: int,
+                      feature_dtype: str='float32', n_reads: int=20,
+                      read_size: int=100, layouts: Sequence[dict]=None
+                      ) -> List[Tuple[dict, float]]:
+    """Times random row reads from ManagedHDF5Databases with different layouts.
+
+    Parameters
+    ----------
+    n_instances
+        Number of instances in the benchmark dataset.
+    n_features
+        Number of features in the benchmark dataset.
+    feature_dtype
+        Data type of features.
+    n_reads
+        Number of reads to time for each layout.
+    read_size
+        Number of random IDs to read at once.
+    layouts
+        List of dictionaries of ManagedHDF5Database layout keyword arguments
+        to compare. By default, row and column layouts are compared with small
+        and large chunks, with and without compression.
+
+    Returns
+    -------
+    List[Tuple[dict, float]]
+        (layout keyword arguments, mean seconds per read) pairs, fastest first.
+    """
+    if layouts is None:
+        layouts = [{'layout': layout, 'chunk_rows': chunk_rows,
+                    'compression': compression}
+                   for layout in ['row', 'column']
+                   for chunk_rows in [64, 1024]
+                   for compression in ['none', 'lzf']]
+
+    random_state = numpy.random.RandomState(0)
+    features = random_state.random_sample(
+        size=(n_instances, n_features)).astype(feature_dtype)
+    ids = numpy.arange(n_instances)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='acton') as tempdir:
+        for index, kwargs in enumerate(layouts):
+            path = os.path.join(tempdir, 'layout_{}.h5'.format(index))
+            with ManagedHDF5Database(path, feature_dtype=feature_dtype,
+                                     **kwargs) as db:
+                db.write_features(ids, features)
+
+            with ManagedHDF5Database(path) as db:
+                then = time.perf_counter()
+                for _ in range(n_reads):
+                    db.read_features(
+                        random_state.randint(n_instances, size=read_size))
+                duration = (time.perf_counter() - then) / n_reads
+
+            logging.debug('Layout {}: {:.02} s per read.'.format(
+                kwargs, duration))
+            results.append((kwargs, duration))
+
+    results.sort(key=lambda result: result[1])
+    return results
+
+
+def recommend_layout(n_instances: int, n_features: int,
+                     feature_dtype: str='float32',
+                     max_instances: int=100000, **kwargs: dict) -> dict:
+    """Recommends a ManagedHDF5Database layout for random row reads.
+
+    Parameters
+    ----------
+    n_instances
+        Number of instances in the dataset.
+    n_features
+        Number of features in the dataset.
+    feature_dtype
+        Data type of features.
+    max_instances
+        Maximum number of instances to benchmark with. Larger datasets are
+        benchmarked with this many instances to keep the benchmark quick.
+    kwargs
+        Keyword arguments passed to benchmark_layouts.
+
+    Returns
+    -------
+    dict
+        ManagedHDF5Database layout keyword arguments.
+    """
+    results = benchmark_layouts(min(n_instances, max_instances), n_features,
+                                feature_dtype=feature_dtype, **kwargs)
+    return results[0][0]
+
+
 class HDF5Reader(HDF5Database):
     """Reads HDF5 databases.
 
@@ -614,15 +1048,27 @@ class HDF5Reader(HDF5Database):
         Whether to encode labels as integers.
     label_encoder : sklearn.preprocessing.LabelEncoder
         Encodes labels as integers.
+    feature_cache : str
+        Path to a sidecar HDF5 file holding the feature columns packed into a
+        single N x D dataset, or None.
     _h5_file : h5py.File
         HDF5 file object.
+    _feature_cache_file : h5py.File
+        Opened sidecar HDF5 file, or None if there is no feature cache.
     _is_multidimensional : bool
         Whether the features are in a multidimensional dataset.
+    _labels : numpy.ndarray
+        N array of encoded labels, encoded when the file is opened. Only
+        present if encode_labels is True.
+    _label_classes : numpy.ndarray
+        Classes of the encoded labels. Copied to label_encoder when labels
+        are read. Only present if encode_labels is True.
     """
 
     def __init__(self, path: str, feature_cols: List[str], label_col: str,
                  encode_labels: bool=True,
-                 label_encoder: sklearn.preprocessing.LabelEncoder=None):
+                 label_encoder: sklearn.preprocessing.LabelEncoder=None,
+                 feature_cache: str=None):
         """
         Parameters
         ----------
@@ -639,6 +1085,12 @@ class HDF5Reader(HDF5Database):
         label_encoder
             Encodes labels as integers. If not specified, the label column will
             be read and a label encoding generated.
+        feature_cache
+            Path to a sidecar HDF5 file. If specified, the feature datasets are
+            packed into a single chunked N x D dataset in this file the first
+            time the database is opened, and features are read from there. The
+            sidecar is rebuilt if the HDF5 file or feature columns change. Only
+            valid if each feature is stored in its own dataset.
         """
         super().__init__(path)
 
@@ -649,6 +1101,8 @@ class HDF5Reader(HDF5Database):
         self.label_col = label_col
         self.encode_labels = encode_labels
         self.label_encoder = label_encoder
+        self.feature_cache = feature_cache
+        self._feature_cache_file = None
 
         if self.label_encoder and not self.encode_labels:
             raise ValueError('label_encoder specified but encode_labels is '
@@ -681,6 +1135,93 @@ class HDF5Reader(HDF5Database):
             else:
                 self.n_features = len(feature_cols)
 
+        if self.feature_cache and self._is_multidimensional:
+            raise ValueError(
+                'feature_cache specified but features are already stored in '
+                'one dataset')
+
+    def _open_hdf5(self):
+        """Opens the HDF5 file.
+
+        Notes
+        -----
+        The HDF5 file will be stored in self._h5_file. If labels are encoded,
+        the label column is read and encoded once here. If there is a feature
+        cache, it is built if needed and opened in self._feature_cache_file.
+        """
+        # Open read-only: r+ would update the file's modification time, which
+        # identifies the contents of the feature cache.
+        self._h5_file = h5py.File(self.path, 'r')
+        if self.encode_labels and self.n_labels == 1:
+            labels = self._h5_file[self.label_col][()].ravel()
+            self._labels, self._label_classes = encode_label_column(
+                self.label_encoder, labels)
+        if self.feature_cache:
+            self._feature_cache_file = self._open_feature_cache()
+
+    def __exit__(self, exc_type: Exception, exc_val: object,
+                 exc_tb: Traceback):
+        if self._feature_cache_file is not None:
+            self._feature_cache_file.close()
+            self._feature_cache_file = None
+        super().__exit__(exc_type, exc_val, exc_tb)
+
+    def _feature_cache_key(self) -> str:
+        """Makes a key identifying the features packed into the feature cache.
+
+        Returns
+        -------
+        str
+            Hex digest of the file path, modification time, size, and the
+            feature columns.
+        """
+        stat = os.stat(self.path)
+        key = json.dumps([os.path.abspath(self.path), stat.st_mtime_ns,
+                          stat.st_size, list(self.feature_cols)])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _open_feature_cache(self) -> h5py.File:
+        """Opens the feature cache, building it if it is missing or stale.
+
+        Returns
+        -------
+        h5py.File
+            Sidecar HDF5 file opened for reading.
+        """
+        key = self._feature_cache_key()
+        try:
+            cache_file = h5py.File(self.feature_cache, 'r')
+        except OSError:
+            cache_file = None
+        if cache_file is not None:
+            if cache_file.attrs.get('key') == key:
+                return cache_file
+            cache_file.close()
+
+        logging.debug('Packing features of {} into {}.'.format(
+            self.path, self.feature_cache))
+        cache_dir = os.path.dirname(os.path.abspath(self.feature_cache))
+        # Build in a temporary file first so that other processes never see a
+        # partially-written cache.
+        with tempfile.TemporaryDirectory(dir=cache_dir) as tempdir:
+            temp_filepath = os.path.join(tempdir, 'features.h5')
+            with h5py.File(temp_filepath, 'w') as cache_file:
+                chunk_rows = max(min(1024, self.n_instances), 1)
+                features_h5 = cache_file.create_dataset(
+                    'features', shape=(self.n_instances, self.n_features),
+                    dtype='float64', chunks=(chunk_rows, self.n_features))
+                # Copy many chunks at a time to bound memory use.
+                block_rows = chunk_rows * 64
+                for start in range(0, self.n_instances, block_rows):
+                    stop = min(start + block_rows, self.n_instances)
+                    features_h5[start:stop] = numpy.nan_to_num(
+                        numpy.column_stack(
+                            [self._h5_file[col][start:stop]
+                             for col in self.feature_cols]))
+                cache_file.attrs['key'] = key
+            os.replace(temp_filepath, self.feature_cache)
+        return h5py.File(self.feature_cache, 'r')
+
     def to_proto(self) -> DatabasePB:
         """Serialises this database as a protobuf.
 
@@ -695,7 +1236,8 @@ class HDF5Reader(HDF5Database):
         db_kwargs = {
             'feature_cols': self.feature_cols,
             'label_col': self.label_col,
-            'encode_labels': self.encode_labels}
+            'encode_labels': self.encode_labels,
+            'feature_cache': self.feature_cache}
         for key, value in db_kwargs.items():
             kwarg = proto.kwarg.add()
             kwarg.key = key
@@ -716,36 +1258,21 @@ class HDF5Reader(HDF5Database):
         numpy.ndarray
             N x D array of feature vectors.
         """
-        # TODO(MatthewJA): Optimise this.
         self._assert_open()
-        # For each ID, get the corresponding features.
+        if self._feature_cache_file is not None:
+            return _gather(self._feature_cache_file['features'], ids)
+
+        # _gather reads each ID once, in sorted order, and scatters the
+        # result back so unsorted and repeated IDs are both fine.
         if self._is_multidimensional:
-            # If there are duplicates in ids, then this will crash with an
-            # OSError! (and a very cryptic error message...) To get around this,
-            # we'll first get all the unique IDs.
-            unique_ids = []
-            unique_ids_set = set()  # For lookups.
-            id_to_index = {}  # For reconstructing the features.
-            for id_ in ids:
-                if id_ not in unique_ids_set:
-                    unique_ids.append(id_)
-                    unique_ids_set.add(id_)
-                    id_to_index[id_] = len(unique_ids) - 1
-            # Then index with just the unique IDs.
-            features_ = self._h5_file[self.feature_cols[0]][unique_ids]
-            # Finally, reconstruct the features array.
-            features = numpy.zeros((len(ids), features_.shape[1]))
-            for index, id_ in enumerate(ids):
-                index_ = id_to_index[id_]
-                features[index, :] = features_[index_, :]
-            return features
-        else:
-            # Allocate output array.
-            features = numpy.zeros((len(ids), len(self.feature_cols)))
-            # Read each feature.
-            features_h5 = self._h5_file[self.feature_cols[0]]
-            for feature_idx, feature_name in enumerate(self.feature_cols):
-                features[ids, feature_idx] = features_h5[feature_name][ids]
+            features = _gather(self._h5_file[self.feature_cols[0]], ids)
+            return features.astype('float64', copy=False)
+
+        # Each feature is stored in its own dataset.
+        features = numpy.zeros((len(ids), len(self.feature_cols)))
+        for feature_idx, feature_name in enumerate(self.feature_cols):
+            features[:, feature_idx] = _gather(
+                self._h5_file[feature_name], ids).reshape(-1)
         return numpy.nan_to_num(features)
 
     def read_labels(self,
@@ -770,42 +1297,20 @@ class HDF5Reader(HDF5Database):
         if len(labeller_ids) > 1:
             raise NotImplementedError('Multiple labellers not yet supported.')
 
-        # TODO(MatthewJA): Optimise this.
-        # For each ID, get the corresponding labels.
-        # If there are duplicates in ids, then this will crash with an
-        # OSError! (and a very cryptic error message...) To get around this,
-        # we'll first get all the unique IDs.
-        unique_ids = []
-        unique_ids_set = set()  # For lookups.
-        id_to_index = {}  # For reconstructing the labels.
-        for id_ in instance_ids:
-            if id_ not in unique_ids_set:
-                unique_ids.append(id_)
-                unique_ids_set.add(id_)
-                id_to_index[id_] = len(unique_ids) - 1
-        # Then index with just the unique IDs.
-        labels_ = self._h5_file[self.label_col][unique_ids].reshape(
-            (1, len(unique_ids), -1))
-        # Finally, reconstruct the labels array.
-        labels = numpy.zeros(
-            (1, len(instance_ids), labels_.shape[2]),
-            dtype=labels_.dtype)
-        for index, id_ in enumerate(instance_ids):
-            index_ = id_to_index[id_]
-            labels[0, index, :] = labels_[0, index_, :]
+        if self.encode_labels and self.n_labels == 1:
+            # Labels were encoded when the file was opened.
+            self.label_encoder.classes_ = self._label_classes
+            labels = numpy.take(self._labels,
+                                numpy.asarray(instance_ids, dtype=int))
+            return labels.reshape((1, -1, 1))
+
+        labels = _gather(self._h5_file[self.label_col], instance_ids).reshape(
+            (1, len(instance_ids), -1))
 
         if labels.shape[2] != 1:
             raise NotImplementedError('Multidimensional labels not currently '
                                       'supported.')
 
-        # Encode labels.
-        if self.encode_labels:
-            labels = numpy.apply_along_axis(
-                self.label_encoder.fit_transform,
-                axis=1,
-                arr=labels.reshape(labels.shape[:2])
-                ).reshape(labels.shape)
-
         return labels
 
     def write_features(self, ids: Sequence[int], features: numpy.ndarray):
@@ -839,6 +1344,45 @@ class HDF5Reader(HDF5Database):
         raise NotImplementedError()
 
 
+def _evict_cache(cache_dir: str, max_bytes: int, keep: str=None):
+    """Removes least recently used entries from a converted table cache.
+
+    Parameters
+    ----------
+    cache_dir
+        Cache directory.
+    max_bytes
+        Maximum total size of the cache in bytes.
+    keep
+        Key of an entry that should not be removed.
+    """
+    entries = []
+    total_bytes = 0
+    for filename in os.listdir(cache_dir):
+        key, ext = os.path.splitext(filename)
+        if ext != '.h5':
+            continue
+
+        stat = os.stat(os.path.join(cache_dir, filename))
+        entries.append((stat.st_mtime, key, stat.st_size))
+        total_bytes += stat.st_size
+
+    entries.sort()
+    for _, key, size in entries:
+        if total_bytes <= max_bytes:
+            break
+
+        if key == keep:
+            continue
+
+        logging.debug('Evicting {} from cache.'.format(key))
+        for ext in ['.h5', '.json']:
+            path = os.path.join(cache_dir, key + ext)
+            if os.path.exists(path):
+                os.remove(path)
+        total_bytes -= size
+
+
 class ASCIIReader(Database):
     """Reads ASCII databases.
 
@@ -862,17 +1406,27 @@ class ASCIIReader(Database):
         Whether to encode labels as integers.
     label_encoder : sklearn.preprocessing.LabelEncoder
         Encodes labels as integers.
+    chunk_size : int
+        Size in bytes of each chunk of the file to parse at once, or None to
+        parse the whole file at once.
+    cache_dir : str
+        Directory to cache the converted table in, or None.
+    cache_max_bytes : int
+        Maximum total size of the cache in bytes.
     _db : Database
         Underlying ManagedHDF5Database.
     _db_filepath : str
         Path of underlying HDF5 database.
-    _tempdir : str
-        Temporary directory where the underlying HDF5 database is stored.
+    _tempdir : tempfile.TemporaryDirectory
+        Temporary directory where the underlying HDF5 database is stored, or
+        None if the database is cached.
     """
 
     def __init__(self, path: str, feature_cols: List[str], label_col: str,
                  encode_labels: bool=True,
-                 label_encoder: sklearn.preprocessing.LabelEncoder=None):
+                 label_encoder: sklearn.preprocessing.LabelEncoder=None,
+                 chunk_size: int=None, cache_dir: str=None,
+                 cache_max_bytes: int=2 ** 30):
         """
         Parameters
         ----------
@@ -887,12 +1441,30 @@ class ASCIIReader(Database):
         label_encoder
             Encodes labels as integers. If not specified, the label column will
             be read and a label encoding generated.
+        chunk_size
+            Size in bytes of each chunk of the file to parse at once. If
+            specified, the file is streamed into the underlying database one
+            chunk at a time with the fast CSV reader, so the whole table is
+            never held in memory. The file must then be comma-separated (if
+            its name ends with .csv) or whitespace-separated with a header
+            line. If not specified, the whole file is read at once.
+        cache_dir
+            Directory to cache the converted table in, so that later readers of
+            the same unchanged file skip parsing it. Defaults to the
+            ACTON_CACHE_DIR environment variable; if neither is set, the table
+            is converted into a temporary directory on every open.
+        cache_max_bytes
+            Maximum total size of the cache. Least recently used entries are
+            removed when a new entry takes the cache above this size.
         """
         self.path = path
         self.feature_cols = feature_cols
         self.label_col = label_col
         self.encode_labels = encode_labels
         self.label_encoder = label_encoder
+        self.chunk_size = chunk_size
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
 
         if self.label_encoder and not self.encode_labels:
             raise ValueError('label_encoder specified but encode_labels is '
@@ -915,7 +1487,10 @@ class ASCIIReader(Database):
         db_kwargs = {
             'feature_cols': self.feature_cols,
             'label_col': self.label_col,
-            'encode_labels': self.encode_labels}
+            'encode_labels': self.encode_labels,
+            'chunk_size': self.chunk_size,
+            'cache_dir': self.cache_dir,
+            'cache_max_bytes': self.cache_max_bytes}
         for key, value in db_kwargs.items():
             kwarg = proto.kwarg.add()
             kwarg.key = key
@@ -979,10 +1554,95 @@ class ASCIIReader(Database):
         db.write_features(ids, features)
         db.write_labels(labeller_ids, ids, labels)
 
-    def __enter__(self):
-        self._tempdir = tempfile.TemporaryDirectory(prefix='acton')
-        # Read the whole file into a DB.
-        self._db_filepath = os.path.join(self._tempdir.name, 'db.h5')
+    def _read_chunks(self, **kwargs: dict) -> Iterable[astropy.table.Table]:
+        """Reads the ASCII table in chunks.
+
+        Parameters
+        ----------
+        kwargs
+            Keyword arguments passed to astropy.io.ascii.read.
+
+        Returns
+        -------
+        Iterable[astropy.table.Table]
+            Tables of consecutive rows, each parsed from about chunk_size
+            bytes.
+        """
+        format_ = 'csv' if self.path.endswith('.csv') else 'basic'
+        return io_ascii.read(self.path, format=format_, guess=False,
+                             fast_reader={'chunk_size': self.chunk_size,
+                                          'chunk_generator': True},
+                             **kwargs)
+
+    def _db_from_ascii_chunks(self, db: Database, labels: numpy.ndarray):
+        """Streams the ASCII table into a database one chunk at a time.
+
+        Notes
+        -----
+        Only one chunk of the table is held in memory at once.
+
+        Arguments
+        ---------
+        db
+            Database. Labels will be written with labeller ID 0.
+        labels
+            1D array of (encoded) labels for every row of the table. These are
+            read separately so that they can be encoded consistently across
+            chunks.
+        """
+        offset = 0
+        for chunk in self._read_chunks():
+            feature_cols = self.feature_cols
+            if not feature_cols:
+                # If there are no features given, use all columns.
+                feature_cols = [c for c in chunk.colnames
+                                if c != self.label_col]
+
+            # Chunks are parsed separately, so a column may come out as an
+            # integer column in one chunk and a float column in another.
+            features = numpy.column_stack(
+                [numpy.asarray(chunk[col], dtype='float64')
+                 for col in feature_cols])
+            ids = numpy.arange(offset, offset + len(chunk))
+            db.write_features(ids, features)
+            db.write_labels([0], ids, labels[ids].reshape((1, -1, 1)))
+            offset += len(chunk)
+
+    def _convert(self, db_filepath: str) -> 'ManagedHDF5Database':
+        """Converts the ASCII table into a ManagedHDF5Database.
+
+        Parameters
+        ----------
+        db_filepath
+            Path to write the HDF5 database to.
+
+        Returns
+        -------
+        ManagedHDF5Database
+            Opened database containing the table.
+        """
+        if self.chunk_size:
+            # Read just the labels first to find their type and encoding.
+            labels = numpy.concatenate(
+                [numpy.array(chunk[self.label_col])
+                 for chunk in self._read_chunks(
+                     include_names=[self.label_col])])
+            max_label_len = numpy.char.str_len(labels.astype(str)).max()
+            if self.encode_labels:
+                labels = self.label_encoder.fit_transform(labels)
+
+            db = ManagedHDF5Database(
+                db_filepath,
+                label_dtype='<S{}'.format(max_label_len),
+                feature_dtype='float64')
+            db.__enter__()
+            try:
+                self._db_from_ascii_chunks(db, labels)
+            except BaseException as e:
+                # Close the half-written database so it can be removed.
+                db.__exit__(type(e), e, e.__traceback__)
+                raise
+            return db
 
         data = io_ascii.read(self.path)
         ids = list(range(len(data[self.label_col])))
@@ -990,24 +1650,117 @@ class ASCIIReader(Database):
         max_label_len = max(len(str(i)) for i in data[self.label_col])
         label_dtype = '<S{}'.format(max_label_len)
 
-        self._db = ManagedHDF5Database(
-            self._db_filepath,
+        db = ManagedHDF5Database(
+            db_filepath,
             label_dtype=label_dtype,
             feature_dtype='float64')
-        self._db.__enter__()
+        db.__enter__()
         try:
-            # We want to handle the encoding ourselves.
-            self._db_from_ascii(self._db, data, self.feature_cols,
-                                self.label_col, ids, encode_labels=False)
-        except TypeError:
-            # Encoding isn't supported in the underlying database.
-            self._db_from_ascii(self._db, data, self.feature_cols,
-                                self.label_col, ids)
+            try:
+                # We want to handle the encoding ourselves.
+                self._db_from_ascii(db, data, self.feature_cols,
+                                    self.label_col, ids, encode_labels=False)
+            except TypeError:
+                # Encoding isn't supported in the underlying database.
+                self._db_from_ascii(db, data, self.feature_cols,
+                                    self.label_col, ids)
+        except BaseException as e:
+            # Close the half-written database so it can be removed.
+            db.__exit__(type(e), e, e.__traceback__)
+            raise
+        return db
+
+    def _cache_key(self) -> str:
+        """Makes a key identifying the converted table in the cache.
+
+        Returns
+        -------
+        str
+            Hex digest of the file path, modification time, size, and the
+            column selection.
+        """
+        stat = os.stat(self.path)
+        key = json.dumps([os.path.abspath(self.path), stat.st_mtime_ns,
+                          stat.st_size, list(self.feature_cols or []),
+                          self.label_col, self.encode_labels])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _open_cached(self, cache_dir: str) -> 'ManagedHDF5Database':
+        """Opens the converted table from the cache, converting it if needed.
+
+        Parameters
+        ----------
+        cache_dir
+            Cache directory.
+
+        Returns
+        -------
+        ManagedHDF5Database
+            Opened database containing the table.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        key = self._cache_key()
+        db_filepath = os.path.join(cache_dir, key + '.h5')
+        encoder_filepath = os.path.join(cache_dir, key + '.json')
+
+        if os.path.exists(db_filepath) and os.path.exists(encoder_filepath):
+            logging.debug('Reading {} from cache {}.'.format(
+                self.path, db_filepath))
+            # Mark the entry as recently used.
+            os.utime(db_filepath)
+            with open(encoder_filepath) as encoder_file:
+                classes = json.load(encoder_file)
+            if classes is not None:
+                self.label_encoder.classes_ = numpy.array(classes)
+        else:
+            logging.debug('Caching {} in {}.'.format(self.path, db_filepath))
+            # Convert into a temporary file first so that other processes never
+            # see a partially-written entry.
+            with tempfile.TemporaryDirectory(dir=cache_dir) as tempdir:
+                temp_filepath = os.path.join(tempdir, 'db.h5')
+                self._convert(temp_filepath).__exit__(None, None, None)
+                os.replace(temp_filepath, db_filepath)
+
+            classes = None
+            if self.encode_labels and hasattr(self.label_encoder, 'classes_'):
+                classes = self.label_encoder.classes_.tolist()
+            with tempfile.TemporaryDirectory(dir=cache_dir) as tempdir:
+                temp_filepath = os.path.join(tempdir, 'encoder.json')
+                with open(temp_filepath, 'w') as encoder_file:
+                    json.dump(classes, encoder_file)
+                os.replace(temp_filepath, encoder_filepath)
+
+            _evict_cache(cache_dir, self.cache_max_bytes, keep=key)
+
+        # Cache entries are shared between processes, so open them read-only.
+        db = ManagedHDF5Database(db_filepath, read_only=True)
+        db.__enter__()
+        return db
+
+    def __enter__(self):
+        cache_dir = self.cache_dir or os.environ.get('ACTON_CACHE_DIR')
+        if cache_dir:
+            self._tempdir = None
+            self._db = self._open_cached(cache_dir)
+            self._db_filepath = self._db.path
+            return self
+
+        self._tempdir = tempfile.TemporaryDirectory(prefix='acton')
+        # Read the whole file into a DB.
+        self._db_filepath = os.path.join(self._tempdir.name, 'db.h5')
+        try:
+            self._db = self._convert(self._db_filepath)
+        except BaseException:
+            # Don't leave a half-written DB behind if the table can't be read.
+            self._tempdir.cleanup()
+            self._tempdir = None
+            raise
         return self
 
     def __exit__(self, exc_type: Exception, exc_val: object, exc_tb: Traceback):
         self._db.__exit__(exc_type, exc_val, exc_tb)
-        self._tempdir.cleanup()
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
         delattr(self, '_db')
 
     def read_features(self, ids: Sequence[int]) -> numpy.ndarray:
@@ -1098,6 +1851,13 @@ class PandasReader(Database):
         Encodes labels as integers.
     _df : pandas.DataFrame
         Pandas dataframe.
+    _features : numpy.ndarray
+        N x D array of features, read from the dataframe once.
+    _labels : numpy.ndarray
+        N array of (encoded) labels, read from the dataframe once.
+    _label_classes : numpy.ndarray
+        Classes of the encoded labels. Copied to label_encoder when labels
+        are read. Only present if encode_labels is True.
     """
 
     def __init__(self, path: str, feature_cols: List[str], label_col: str,
@@ -1143,6 +1903,15 @@ class PandasReader(Database):
         self.n_instances = len(self._df[self.label_col])
         self.n_features = len(self.feature_cols)
 
+        # Copy the features and labels out of the dataframe once so that reads
+        # are just array lookups.
+        self._features = numpy.ascontiguousarray(
+            self._df[list(self.feature_cols)].to_numpy(dtype='float64'))
+        self._labels = self._df[self.label_col].to_numpy()
+        if self.encode_labels:
+            self._labels, self._label_classes = encode_label_column(
+                self.label_encoder, self._labels)
+
     def to_proto(self) -> DatabasePB:
         """Serialises this database as a protobuf.
 
@@ -1171,6 +1940,8 @@ class PandasReader(Database):
 
     def __exit__(self, exc_type: Exception, exc_val: object, exc_tb: Traceback):
         delattr(self, '_df')
+        delattr(self, '_features')
+        delattr(self, '_labels')
 
     def read_features(self, ids: Sequence[int]) -> numpy.ndarray:
         """Reads feature vectors from the database.
@@ -1185,17 +1956,8 @@ class PandasReader(Database):
         numpy.ndarray
             N x D array of feature vectors.
         """
-        # TODO(MatthewJA): Optimise this.
-        # Allocate output features array.
-        features = numpy.zeros((len(ids), self.n_features))
-        # For each ID, get the corresponding features.
-        for out_index, id_ in enumerate(ids):
-            sel = self._df.iloc[id_]
-
-            for feature_index, feature in enumerate(self.feature_cols):
-                features[out_index, feature_index] = sel[feature]
-
-        return features
+        return numpy.take(self._features, numpy.asarray(ids, dtype=int),
+                          axis=0)
 
     def read_labels(self,
                     labeller_ids: Sequence[int],
@@ -1214,35 +1976,14 @@ class PandasReader(Database):
         numpy.ndarray
             T x N x 1 array of label vectors.
         """
-        # Draw a label to get the dtype.
-        dtype = type(self._df.iloc[0][self.label_col])
-
-        # Allocate output labels array.
-        labels = numpy.zeros(
-            (len(labeller_ids), len(instance_ids), 1),
-            dtype=dtype)
-
         if len(labeller_ids) > 1:
             raise NotImplementedError('Multiple labellers not yet supported.')
 
-        # For each ID, get the corresponding labels.
-        for out_index, id_ in enumerate(instance_ids):
-            sel = self._df.iloc[int(id_)]
-            labels[0, out_index, 0] = sel[self.label_col]
-
-        if labels.shape[2] != 1:
-            raise NotImplementedError('Multidimensional labels not currently '
-                                      'supported.')
-
-        # Encode labels.
         if self.encode_labels:
-            labels = numpy.apply_along_axis(
-                self.label_encoder.fit_transform,
-                axis=1,
-                arr=labels.reshape(labels.shape[:2])
-                ).reshape(labels.shape)
-
-        return labels
+            self.label_encoder.classes_ = self._label_classes
+        instance_ids = numpy.asarray(instance_ids, dtype=int)
+        labels = numpy.take(self._labels, instance_ids)
+        return labels.reshape((1, -1, 1))
 
     def write_features(self, ids: Sequence[int], features: numpy.ndarray):
         raise PermissionError('Cannot write to read-only database.')
@@ -1297,13 +2038,26 @@ class FITSReader(Database):
         Whether to encode labels as integers.
     label_encoder : sklearn.preprocessing.LabelEncoder
         Encodes labels as integers.
+    memmap : bool
+        Whether to memory-map the file, or None to use astropy's default,
+        which memory-maps the file when it can.
     _hdulist : astropy.io.fits.HDUList
         FITS HDUList.
+    _features : numpy.ndarray
+        N x D array of features. Either a view of the memory-mapped file or a
+        read-only copy of the feature columns.
+    _labels : numpy.ndarray
+        N array of encoded labels, encoded when the file is opened. Only
+        present if encode_labels is True.
+    _label_classes : numpy.ndarray
+        Classes of the encoded labels. Copied to label_encoder when labels
+        are read. Only present if encode_labels is True.
     """
 
     def __init__(self, path: str, feature_cols: List[str], label_col: str,
                  hdu_index: int=1, encode_labels: bool=True,
-                 label_encoder: sklearn.preprocessing.LabelEncoder=None):
+                 label_encoder: sklearn.preprocessing.LabelEncoder=None,
+                 memmap: bool=None):
         """
         Parameters
         ----------
@@ -1322,6 +2076,13 @@ class FITSReader(Database):
         label_encoder
             Encodes labels as integers. If not specified, the label column will
             be read and a label encoding generated.
+        memmap
+            Whether to memory-map the file. If not specified, astropy's default
+            is used, which memory-maps the file when it can. Unless memmap is
+            False, features are read straight from the file rather than copied
+            into memory if the feature columns are adjacent, unscaled, and of
+            the same type; otherwise the feature columns are copied. Set False
+            to always read the whole file and copy the feature columns.
         """
         self.path = path
         self.feature_cols = feature_cols
@@ -1329,6 +2090,7 @@ class FITSReader(Database):
         self.hdu_index = hdu_index
         self.encode_labels = encode_labels
         self.label_encoder = label_encoder
+        self.memmap = memmap
 
         if self.label_encoder and not self.encode_labels:
             raise ValueError('label_encoder specified but encode_labels is '
@@ -1356,7 +2118,8 @@ class FITSReader(Database):
             'feature_cols': self.feature_cols,
             'label_col': self.label_col,
             'hdu_index': self.hdu_index,
-            'encode_labels': self.encode_labels}
+            'encode_labels': self.encode_labels,
+            'memmap': self.memmap}
         for key, value in db_kwargs.items():
             kwarg = proto.kwarg.add()
             kwarg.key = key
@@ -1364,8 +2127,49 @@ class FITSReader(Database):
         proto.label_encoder.CopyFrom(serialise_encoder(self.label_encoder))
         return proto
 
+    def _feature_view(self) -> numpy.ndarray:
+        """Makes an N x D view of the feature columns without copying them.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only view of the features, or None if the feature columns
+            can't be viewed as one array.
+        """
+        hdu = self._hdulist[self.hdu_index]
+        records = hdu.data.view(numpy.ndarray)
+        fields = records.dtype.fields
+        dtypes = {fields[col][0] for col in self.feature_cols}
+        if len(dtypes) != 1:
+            return None
+
+        dtype = dtypes.pop()
+        if dtype.shape or dtype.kind not in 'fiu':
+            return None
+
+        # Columns must be adjacent and in order within each record.
+        offsets = [fields[col][1] for col in self.feature_cols]
+        if any(b - a != dtype.itemsize for a, b in zip(offsets, offsets[1:])):
+            return None
+
+        # Scaled columns aren't stored as the values they represent.
+        for col in self.feature_cols:
+            if hdu.columns[col].bscale not in {None, 1} or \
+                    hdu.columns[col].bzero not in {None, 0}:
+                return None
+
+        view = numpy.ndarray(
+            shape=(len(records), len(self.feature_cols)), dtype=dtype,
+            buffer=records, offset=offsets[0],
+            strides=(records.strides[0], dtype.itemsize))
+        view.setflags(write=False)
+        return view
+
     def __enter__(self):
-        self._hdulist = io_fits.open(self.path)
+        if self.memmap is None:
+            self._hdulist = io_fits.open(self.path)
+        else:
+            self._hdulist = io_fits.open(self.path, memmap=self.memmap)
 
         # If we haven't specified columns, use all except the label column.
         cols = self._hdulist[self.hdu_index].columns.names
@@ -1376,9 +2180,32 @@ class FITSReader(Database):
         self.n_instances = \
             self._hdulist[self.hdu_index].data[self.label_col].ravel().shape[0]
 
+        # Set up the feature array once so that reads are just array lookups.
+        self._features = None
+        if self.memmap is not False:
+            self._features = self._feature_view()
+            if self._features is None:
+                logging.debug('Can\'t view features of {} in place; '
+                              'copying them into memory.'.format(self.path))
+
+        if self._features is None:
+            data = self._hdulist[self.hdu_index].data
+            self._features = numpy.column_stack(
+                [numpy.asarray(data[col], dtype='float64')
+                 for col in self.feature_cols])
+            self._features.setflags(write=False)
+
+        if self.encode_labels:
+            labels = self._hdulist[self.hdu_index].data[self.label_col]
+            self._labels, self._label_classes = encode_label_column(
+                self.label_encoder, numpy.asarray(labels).ravel())
+
         return self
 
     def __exit__(self, exc_type: Exception, exc_val: object, exc_tb: Traceback):
+        delattr(self, '_features')
+        if self.encode_labels:
+            delattr(self, '_labels')
         self._hdulist.close()
         delattr(self, '_hdulist')
 
@@ -1395,14 +2222,16 @@ class FITSReader(Database):
         numpy.ndarray
             N x D array of feature vectors.
         """
-        # TODO(MatthewJA): Optimise this.
-        # Allocate output features array.
-        features = numpy.zeros((len(ids), self.n_features))
-        for f_index, col in enumerate(self.feature_cols):
-            col = self._hdulist[self.hdu_index].data[col]
-            features[:, f_index] = col[ids]
+        ids = numpy.asarray(ids, dtype=int)
+        if len(ids) and ids[-1] - ids[0] + 1 == len(ids) and \
+                (numpy.diff(ids) == 1).all():
+            # Consecutive IDs can be served as a slice, which won't be copied
+            # if the features are already native float64.
+            features = self._features[ids[0]:ids[-1] + 1]
+        else:
+            features = numpy.take(self._features, ids, axis=0)
 
-        return features
+        return features.astype('float64', copy=False)
 
     def read_labels(self,
                     labeller_ids: Sequence[int],
@@ -1418,21 +2247,18 @@ class FITSReader(Database):
 
         Returns
         -------
-        numpy.p
+        numpy.ndarray
             T x N x 1 array of label vectors.
         """
-        label_col = self._hdulist[self.hdu_index].data[self.label_col]
-        labels = label_col[instance_ids].reshape((1, -1, 1))
-
-        # Encode labels.
         if self.encode_labels:
-            labels = numpy.apply_along_axis(
-                self.label_encoder.fit_transform,
-                axis=1,
-                arr=labels.reshape(labels.shape[:2])
-                ).reshape(labels.shape)
+            # Labels were encoded when the file was opened.
+            self.label_encoder.classes_ = self._label_classes
+            labels = numpy.take(self._labels,
+                                numpy.asarray(instance_ids, dtype=int))
+            return labels.reshape((1, -1, 1))
 
-        return labels
+        label_col = self._hdulist[self.hdu_index].data[self.label_col]
+        return label_col[instance_ids].reshape((1, -1, 1))
 
     def write_features(self, ids: Sequence[int], features: numpy.ndarray):
         raise PermissionError('Cannot write to read-only database.')
@@ -0,0 +1,689 @@
+"""Approximate nearest-neighbour index over database features."""
+
+import hashlib
+import json
+import logging
+import os.path
+import tempfile
+from typing import Sequence, Tuple
+
+import acton.database
+import h5py
+import numpy
+
+# Number of rows compared against the centroids at once.
+_ASSIGN_BLOCK_ROWS = 4096
+
+# Number of feature vectors read from the database at once when assigning
+# instances to lists.
+_READ_BLOCK_ROWS = 65536
+
+# Default number of neighbours to estimate density from.
+DENSITY_NEIGHBOURS = 10
+
+
+def _sq_dists(a: numpy.ndarray, b: numpy.ndarray,
+              b_sq_norms: numpy.ndarray=None) -> numpy.ndarray:
+    """Computes squared Euclidean distances between two sets of vectors.
+
+    Parameters
+    ----------
+    a
+        M x D array of vectors.
+    b
+        N x D array of vectors.
+    b_sq_norms
+        N array of squared norms of b, if already known.
+
+    Returns
+    -------
+    numpy.ndarray
+        M x N array of non-negative squared distances.
+    """
+    if b_sq_norms is None:
+        b_sq_norms = (b ** 2).sum(axis=1)
+    # |x - y|^2 = |x|^2 + |y|^2 - 2 x.y.
+    sq_dists = a.dot(b.T)
+    sq_dists *= -2
+    sq_dists += b_sq_norms
+    sq_dists += (a ** 2).sum(axis=1)[:, None]
+    return numpy.maximum(sq_dists, 0, out=sq_dists)
+
+
+def _nearest(features: numpy.ndarray,
+             centroids: numpy.ndarray) -> numpy.ndarray:
+    """Finds the nearest centroid to each feature vector.
+
+    Parameters
+    ----------
+    features
+        N x D array of feature vectors.
+    centroids
+        L x D array of centroids.
+
+    Returns
+    -------
+    numpy.ndarray
+        N array of indices into centroids.
+    """
+    centroid_sq_norms = (centroids ** 2).sum(axis=1)
+    nearest = numpy.zeros(len(features), dtype=int)
+    for start in range(0, len(features), _ASSIGN_BLOCK_ROWS):
+        stop = start + _ASSIGN_BLOCK_ROWS
+        nearest[start:stop] = _sq_dists(
+            features[start:stop], centroids, centroid_sq_norms).argmin(axis=1)
+    return nearest
+
+
+def _kmeans(features: numpy.ndarray, n_clusters: int,
+            n_iter: int=10) -> numpy.ndarray:
+    """Finds cluster centroids with Lloyd's algorithm.
+
+    Parameters
+    ----------
+    features
+        N x D array of feature vectors.
+    n_clusters
+        Number of clusters. Must be at most N.
+    n_iter
+        Number of iterations.
+
+    Returns
+    -------
+    numpy.ndarray
+        n_clusters x D array of centroids.
+    """
+    centroids = features[numpy.random.choice(
+        len(features), size=n_clusters, replace=False)].astype(float)
+    for _ in range(n_iter):
+        nearest = _nearest(features, centroids)
+        counts = numpy.bincount(nearest, minlength=n_clusters)
+        sums = numpy.zeros_like(centroids)
+        numpy.add.at(sums, nearest, features)
+        # Empty clusters keep their old centroid.
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+    return centroids
+
+
+def _assign(db: acton.database.Database, ids: numpy.ndarray,
+            centroids: numpy.ndarray) -> numpy.ndarray:
+    """Finds the nearest centroid to each instance in a database.
+
+    Parameters
+    ----------
+    db
+        Database to read features from. Features are read a block of IDs at a
+        time.
+    ids
+        N array of IDs.
+    centroids
+        L x D array of centroids.
+
+    Returns
+    -------
+    numpy.ndarray
+        N array of indices into centroids.
+    """
+    lists = numpy.zeros(len(ids), dtype=int)
+    for start in range(0, len(ids), _READ_BLOCK_ROWS):
+        stop = start + _READ_BLOCK_ROWS
+        features = db.read_features(ids[start:stop]).reshape(
+            (-1, centroids.shape[1]))
+        lists[start:stop] = _nearest(features, centroids)
+    return lists
+
+
+def _fingerprint(db: acton.database.Database) -> str:
+    """Makes a key identifying the features in a database.
+
+    Notes
+    -----
+    Like the ASCIIReader cache, this only looks at the file's metadata, so
+    opening the file for writing also changes the key.
+
+    Parameters
+    ----------
+    db
+        Database to identify.
+
+    Returns
+    -------
+    str
+        Hex digest of the database class, file path, modification time, size,
+        and feature columns.
+    """
+    stat = os.stat(db.path)
+    key = json.dumps([type(db).__name__, os.path.abspath(db.path),
+                      stat.st_mtime_ns, stat.st_size,
+                      list(getattr(db, 'feature_cols', None) or [])])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class FeatureIndex(object):
+    """Inverted-file index for nearest-neighbour queries over features.
+
+    Notes
+    -----
+    Feature vectors are partitioned into lists by their nearest k-means
+    centroid. A query only compares against the members of the n_probe lists
+    with the nearest centroids, so queries cost about n_probe / n_lists of a
+    brute-force search. Results are approximate: a neighbour in an unprobed
+    list is missed. Probing every list gives exact results.
+
+    The centroids are fixed when the index is built. Adding instances assigns
+    them to the nearest existing list, so the index can be updated
+    incrementally as the database grows without rebuilding it.
+
+    The index only stores the centroids and the list containing each instance.
+    Feature vectors stay in the database: each probed list is read from it
+    when queried, so the index stays small and never disagrees with the
+    database.
+
+    Attributes
+    ----------
+    centroids : numpy.ndarray
+        L x D array of list centroids.
+    ids : numpy.ndarray
+        N array of indexed IDs, in the order they were added.
+    n_probe : int
+        Default number of lists to search per query.
+    source : str
+        Fingerprint of the database the features were read from, or ''.
+    _db : acton.database.Database
+        Database to read feature vectors from.
+    _lists : numpy.ndarray
+        N array of the list containing each indexed instance.
+    _order : numpy.ndarray
+        N array of indices into ids, sorted by list.
+    _offsets : numpy.ndarray
+        L + 1 array. Members of list l are _order[_offsets[l]:_offsets[l + 1]].
+    _sorted_ids : numpy.ndarray
+        Sorted array of indexed IDs.
+    _sorted_positions : numpy.ndarray
+        N array of indices into ids, so that ids[_sorted_positions] is
+        _sorted_ids.
+    _densities : Dict[int, numpy.ndarray]
+        Maps a number of neighbours to the cached density of each instance.
+    """
+
+    def __init__(self, db: acton.database.Database, centroids: numpy.ndarray,
+                 ids: Sequence[int], lists: numpy.ndarray=None,
+                 n_probe: int=None, source: str=''):
+        """
+        Parameters
+        ----------
+        db
+            Database to read feature vectors from.
+        centroids
+            L x D array of list centroids.
+        ids
+            N array of IDs to index.
+        lists
+            N array of the list containing each instance. Computed from the
+            database if not specified.
+        n_probe
+            Default number of lists to search per query. Default 8.
+        source
+            Fingerprint of the database the features were read from.
+        """
+        self._db = db
+        self.centroids = numpy.asarray(centroids, dtype=float)
+        self.ids = numpy.asarray(ids, dtype=int)
+        if lists is None:
+            lists = _assign(db, self.ids, self.centroids)
+        self._lists = numpy.asarray(lists, dtype=int)
+        if n_probe is None:
+            n_probe = 8
+        self.n_probe = n_probe
+        self.source = source
+        self._reindex()
+
+    @classmethod
+    def build(cls, db: acton.database.Database, ids: Sequence[int]=None,
+              n_lists: int=None, n_probe: int=None,
+              n_train: int=None) -> 'FeatureIndex':
+        """Builds an index by clustering feature vectors.
+
+        Notes
+        -----
+        Only the n_train instances that are clustered are read at once. The
+        rest are then assigned to lists a block at a time.
+
+        Parameters
+        ----------
+        db
+            Database to read feature vectors from.
+        ids
+            N array of IDs to index. Default is all instances in the database.
+        n_lists
+            Number of lists to partition instances into. Default is the square
+            root of N, rounded up.
+        n_probe
+            Default number of lists to search per query.
+        n_train
+            Number of instances to cluster to find the centroids. Default is
+            256 per list.
+
+        Returns
+        -------
+        FeatureIndex
+        """
+        if ids is None:
+            ids = db.get_known_instance_ids()
+        ids = numpy.asarray(ids, dtype=int)
+        if not len(ids):
+            raise ValueError('Cannot build an index of no instances.')
+
+        if n_lists is None:
+            n_lists = int(numpy.ceil(numpy.sqrt(len(ids))))
+        n_lists = min(n_lists, len(ids))
+        if n_train is None:
+            n_train = 256 * n_lists
+        if n_train < len(ids):
+            train_ids = numpy.sort(ids[numpy.random.choice(
+                len(ids), size=n_train, replace=False)])
+        else:
+            train_ids = ids
+        train = db.read_features(train_ids).reshape((len(train_ids), -1))
+
+        logging.debug('Clustering {} instances into {} lists.'.format(
+            len(train), n_lists))
+        centroids = _kmeans(train, n_lists)
+        return cls(db, centroids, ids, n_probe=n_probe)
+
+    @classmethod
+    def from_database(cls, db: acton.database.Database, path: str,
+                      ids: Sequence[int]=None, with_density: bool=False,
+                      **kwargs: dict) -> 'FeatureIndex':
+        """Opens the index persisted at a path, building or updating it.
+
+        Notes
+        -----
+        If the index exists and was built from the same database, any IDs it
+        doesn't contain are read from the database and added to it. If the
+        database has changed since (e.g. features were rewritten, or it is a
+        different file at the same path), or there is no index, the index is
+        built from scratch. Either way, the index is saved back to the path
+        if it changed.
+
+        Parameters
+        ----------
+        db
+            Database to read features from.
+        path
+            Path to the index file, usually beside the database.
+        ids
+            IDs to index. Default is all instances in the database.
+        with_density
+            Whether to compute densities (see FeatureIndex.density) and save
+            them with the index.
+        kwargs
+            Keyword arguments for FeatureIndex.build.
+
+        Returns
+        -------
+        FeatureIndex
+        """
+        if ids is None:
+            ids = db.get_known_instance_ids()
+        ids = numpy.asarray(ids, dtype=int)
+
+        source = _fingerprint(db)
+        index = None
+        changed = False
+        if os.path.exists(path):
+            index = cls.load(path, db)
+            if index.source != source:
+                logging.debug('Index {} is stale.'.format(path))
+                index = None
+
+        if index is not None:
+            new_ids = ids[~index.contains(ids)]
+            if len(new_ids):
+                logging.debug('Adding {} instances to index {}.'.format(
+                    len(new_ids), path))
+                index.add(new_ids)
+                changed = True
+        else:
+            logging.debug('Building index {} of {} instances.'.format(
+                path, len(ids)))
+            index = cls.build(db, ids, **kwargs)
+            index.source = source
+            changed = True
+
+        if with_density and DENSITY_NEIGHBOURS not in index._densities:
+            index.density(ids[:1])
+            changed = True
+
+        if changed:
+            index.save(path)
+        return index
+
+    @classmethod
+    def load(cls, path: str,
+             db: acton.database.Database) -> 'FeatureIndex':
+        """Loads an index from an HDF5 file.
+
+        Parameters
+        ----------
+        path
+            Path to the index file.
+        db
+            Database to read feature vectors from.
+
+        Returns
+        -------
+        FeatureIndex
+        """
+        with h5py.File(path, 'r') as index_file:
+            source = index_file.attrs.get('source', '')
+            if isinstance(source, bytes):
+                source = source.decode('ascii')
+            index = cls(db, index_file['centroids'][()],
+                        index_file['ids'][()],
+                        lists=index_file['lists'][()],
+                        n_probe=int(index_file.attrs['n_probe']),
+                        source=source)
+            for name, dataset in index_file.get('densities', {}).items():
+                index._densities[int(name)] = dataset[()]
+        return index
+
+    def save(self, path: str):
+        """Saves the index to an HDF5 file.
+
+        Parameters
+        ----------
+        path
+            Path to the index file. Will be overwritten.
+        """
+        index_dir = os.path.dirname(os.path.abspath(path))
+        # Write to a temporary file first so that other processes never see a
+        # partially-written index.
+        with tempfile.TemporaryDirectory(dir=index_dir) as tempdir:
+            temp_filepath = os.path.join(tempdir, 'index.h5')
+            with h5py.File(temp_filepath, 'w') as index_file:
+                index_file.create_dataset('centroids', data=self.centroids)
+                index_file.create_dataset('ids', data=self.ids)
+                index_file.create_dataset('lists', data=self._lists)
+                index_file.attrs['n_probe'] = self.n_probe
+                index_file.attrs['source'] = self.source
+                densities = index_file.create_group('densities')
+                for k, density in self._densities.items():
+                    densities.create_dataset(str(k), data=density)
+            os.replace(temp_filepath, path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _reindex(self):
+        """Rebuilds the lookup tables after instances change."""
+        self._order = numpy.argsort(self._lists, kind='mergesort')
+        self._offsets = numpy.searchsorted(
+            self._lists[self._order], numpy.arange(len(self.centroids) + 1))
+        self._sorted_positions = numpy.argsort(self.ids, kind='mergesort')
+        self._sorted_ids = self.ids[self._sorted_positions]
+        self._densities = {}
+
+    def _positions(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Finds the positions of IDs in the index.
+
+        Parameters
+        ----------
+        ids
+            Indexed IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of indices into self.ids.
+
+        Raises
+        ------
+        KeyError
+            If an ID is not in the index.
+        """
+        ids = numpy.asarray(ids, dtype=int)
+        found = self.contains(ids)
+        if not found.all():
+            raise KeyError('Unknown id: {}'.format(ids[~found][0]))
+
+        return self._sorted_positions[
+            numpy.searchsorted(self._sorted_ids, ids)]
+
+    def contains(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Checks whether IDs are in the index.
+
+        Parameters
+        ----------
+        ids
+            IDs to check.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array where the ith entry is True iff the ith ID is
+            indexed.
+        """
+        ids = numpy.asarray(ids, dtype=int)
+        if not len(self._sorted_ids):
+            return numpy.zeros(ids.shape, dtype=bool)
+
+        positions = numpy.minimum(numpy.searchsorted(self._sorted_ids, ids),
+                                  len(self._sorted_ids) - 1)
+        return self._sorted_ids[positions] == ids
+
+    def add(self, ids: Sequence[int]):
+        """Adds instances in the database to the index.
+
+        Parameters
+        ----------
+        ids
+            N array of IDs to add. IDs already in the index are reassigned to
+            the list nearest their current features.
+        """
+        ids = numpy.asarray(ids, dtype=int)
+        lists = _assign(self._db, ids, self.centroids)
+
+        existing = self.contains(ids)
+        if existing.any():
+            self._lists[self._positions(ids[existing])] = lists[existing]
+
+        new = ~existing
+        self.ids = numpy.concatenate([self.ids, ids[new]])
+        self._lists = numpy.concatenate([self._lists, lists[new]])
+        self._reindex()
+
+    def _members(self, list_: int) -> numpy.ndarray:
+        """Finds the members of a list.
+
+        Parameters
+        ----------
+        list_
+            Index of the list.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of indices into self.ids.
+        """
+        return self._order[self._offsets[list_]:self._offsets[list_ + 1]]
+
+    def _read_members(self, members: numpy.ndarray) -> numpy.ndarray:
+        """Reads the feature vectors of indexed instances from the database.
+
+        Parameters
+        ----------
+        members
+            M array of indices into self.ids.
+
+        Returns
+        -------
+        numpy.ndarray
+            M x D array of feature vectors.
+        """
+        return self._db.read_features(self.ids[members]).reshape(
+            (len(members), self.centroids.shape[1]))
+
+    def _merge_list(self, features: numpy.ndarray, queries: numpy.ndarray,
+                    members: numpy.ndarray, member_features: numpy.ndarray,
+                    k: int,
+                    best_sq_dists: numpy.ndarray,
+                    best_positions: numpy.ndarray):
+        """Merges the members of a list into the nearest neighbours so far.
+
+        Parameters
+        ----------
+        features
+            Q x D array of query feature vectors.
+        queries
+            Q array of row indices of the queries in best_sq_dists.
+        members
+            M array of indices into self.ids of the list members.
+        member_features
+            M x D array of feature vectors of the list members.
+        k
+            Number of neighbours to find.
+        best_sq_dists
+            Array of the squared distances to the k nearest neighbours so far
+            of every query. Updated in place. Column k - 1 holds the kth
+            nearest.
+        best_positions
+            Array of indices into self.ids of the k nearest neighbours so far
+            of every query, or -1 if not found. Updated in place.
+        """
+        member_sq_dists = _sq_dists(features, member_features)
+        # Only queries with a member nearer than their kth best need merging.
+        improved = member_sq_dists.min(axis=1) < best_sq_dists[queries, k - 1]
+        if not improved.any():
+            return
+
+        queries = queries[improved]
+        # Columns before k are the best so far and columns from k are members.
+        sq_dists = numpy.concatenate(
+            [best_sq_dists[queries], member_sq_dists[improved]], axis=1)
+        best = numpy.argpartition(sq_dists, k - 1, axis=1)[:, :k]
+        from_members = best >= k
+        positions = numpy.take_along_axis(
+            best_positions[queries], numpy.minimum(best, k - 1), axis=1)
+        positions[from_members] = members[best[from_members] - k]
+        best_sq_dists[queries] = numpy.take_along_axis(sq_dists, best, axis=1)
+        best_positions[queries] = positions
+
+    def query(self, features: numpy.ndarray, k: int=1,
+              n_probe: int=None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Finds the approximate nearest neighbours of feature vectors.
+
+        Parameters
+        ----------
+        features
+            Q x D array of query feature vectors.
+        k
+            Number of neighbours to find.
+        n_probe
+            Number of lists to search. Default self.n_probe.
+
+        Returns
+        -------
+        (numpy.ndarray, numpy.ndarray)
+            Q x k array of distances to the neighbours in increasing order,
+            and Q x k array of the IDs of the neighbours. If fewer than k
+            neighbours are found, distances are padded with inf and IDs with
+            -1.
+        """
+        features = numpy.asarray(features, dtype=float).reshape(
+            (-1, self.centroids.shape[1]))
+        n_queries = len(features)
+        if n_probe is None:
+            n_probe = self.n_probe
+        n_probe = max(min(n_probe, len(self.centroids)), 1)
+
+        # Find the lists to probe for each query.
+        probes = numpy.zeros((n_queries, n_probe), dtype=int)
+        for start in range(0, n_queries, _ASSIGN_BLOCK_ROWS):
+            stop = start + _ASSIGN_BLOCK_ROWS
+            centroid_sq_dists = _sq_dists(features[start:stop], self.centroids)
+            if n_probe < len(self.centroids):
+                probes[start:stop] = numpy.argpartition(
+                    centroid_sq_dists, n_probe - 1, axis=1)[:, :n_probe]
+            else:
+                probes[start:stop] = numpy.arange(n_probe)
+
+        # Group the queries by the lists they probe. Each probed list is then
+        # read from the database once and compared against all of its queries
+        # with one matrix product. Queries that already have closer neighbours
+        # skip merging a list.
+        best_sq_dists = numpy.full((n_queries, k), numpy.inf)
+        best_positions = numpy.full((n_queries, k), -1, dtype=int)
+        probes = probes.ravel()
+        probe_order = numpy.argsort(probes, kind='mergesort')
+        probe_offsets = numpy.searchsorted(
+            probes[probe_order], numpy.arange(len(self.centroids) + 1))
+        for list_ in numpy.flatnonzero(numpy.diff(probe_offsets)):
+            members = self._members(list_)
+            if not len(members):
+                continue
+
+            # Probes are stored query by query, n_probe to a query.
+            queries = probe_order[
+                probe_offsets[list_]:probe_offsets[list_ + 1]] // n_probe
+            self._merge_list(features[queries], queries, members,
+                             self._read_members(members), k,
+                             best_sq_dists, best_positions)
+
+        order = numpy.argsort(best_sq_dists, axis=1, kind='mergesort')
+        best_sq_dists = numpy.take_along_axis(best_sq_dists, order, axis=1)
+        best_positions = numpy.take_along_axis(best_positions, order, axis=1)
+        best_ids = numpy.where(best_positions >= 0,
+                               self.ids[best_positions], -1)
+        return numpy.sqrt(best_sq_dists), best_ids
+
+    def density(self, ids: Sequence[int],
+                k: int=DENSITY_NEIGHBOURS) -> numpy.ndarray:
+        """Estimates how dense the feature space is around instances.
+
+        Notes
+        -----
+        Density is 1 / (1 + d / m), where d is the mean distance to the k
+        nearest other instances and m is the median of d over the index. This
+        makes densities independent of the scale of the features: a typical
+        instance has density 1/2, and outliers tend to 0. Densities of the
+        whole index are computed on first use and cached until instances are
+        added. Cached densities are saved with the index.
+
+        Densities are computed one list at a time, so only the features of
+        the lists near that list are read at once.
+
+        Parameters
+        ----------
+        ids
+            Indexed IDs.
+        k
+            Number of neighbours to average over.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of densities in (0, 1].
+        """
+        if k not in self._densities:
+            logging.debug('Computing densities of {} instances.'.format(
+                len(self)))
+            mean_dists = numpy.zeros(len(self))
+            for list_ in range(len(self.centroids)):
+                members = self._members(list_)
+                if not len(members):
+                    continue
+
+                # The nearest neighbour of each instance is itself.
+                dists, _ = self.query(self._read_members(members), k=k + 1)
+                dists = dists[:, 1:]
+                dists[~numpy.isfinite(dists)] = numpy.nan
+                with numpy.errstate(all='ignore'):
+                    mean_dists[members] = numpy.nanmean(dists, axis=1)
+            mean_dists[numpy.isnan(mean_dists)] = 0
+            scale = numpy.median(mean_dists)
+            if scale <= 0:
+                scale = 1
+            self._densities[k] = 1 / (1 + mean_dists / scale)
+        return self._densities[k][self._positions(ids)]
@@ -1,6 +1,7 @@
 """Labeller classes."""
 
 from abc import ABC, abstractmethod
+from typing import Sequence
 
 import acton.database
 import astropy.io.ascii
@@ -29,6 +30,32 @@ class Labeller(ABC):
             T x F label array.
         """
 
+    def query_batch(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Queries the labeller for many instances at once.
+
+        Notes
+        -----
+        This queries each ID separately. Subclasses should override this if
+        they can look up many labels at once. With no IDs there is nothing to
+        query, so the label shape is taken to be 1 x F with F = 1, matching
+        the labellers in this module.
+
+        Parameters
+        ----------
+        ids
+            IDs of instances to label.
+
+        Returns
+        -------
+        numpy.ndarray
+            T x N x F label array.
+        """
+        labels = [self.query(id_) for id_ in ids]
+        if not labels:
+            return numpy.zeros((1, 0, 1))
+
+        return numpy.stack(labels, axis=1)
+
 
 class ASCIITableLabeller(Labeller):
     """Labeller that obtains labels from an ASCII table.
@@ -41,11 +68,19 @@ class ASCIITableLabeller(Labeller):
         Name of the column where IDs are stored.
     label_col : str
         Name of the column where binary labels are stored.
+    lazy : bool
+        Whether only the ID and label columns were read from the table.
     _table : astropy.table.Table
         Table object.
+    _labels : numpy.ndarray
+        Label column of the table.
+    _rows : numpy.ndarray
+        Maps each ID to the index of the row holding its label: the first row
+        with the same name in the ID column.
     """
 
-    def __init__(self, path: str, id_col: str, label_col: str):
+    def __init__(self, path: str, id_col: str, label_col: str,
+                 lazy: bool=False):
         """
         path
             Path to table.
@@ -53,15 +88,48 @@ class ASCIITableLabeller(Labeller):
             Name of the column where IDs are stored.
         label_col
             Name of the column where binary labels are stored.
+        lazy
+            Whether to only read the ID and label columns from the table.
         """
         self.path = path
         self.id_col = id_col
         self.label_col = label_col
-        self._table = astropy.io.ascii.read(self.path)
-        self._id_to_name = {}
-        for id_, row in enumerate(self._table):
-            name = row[self.id_col]
-            self._id_to_name[id_] = name
+        self.lazy = lazy
+        if self.lazy:
+            self._table = astropy.io.ascii.read(
+                self.path, include_names=[self.id_col, self.label_col])
+        else:
+            self._table = astropy.io.ascii.read(self.path)
+
+        # Index the table once so that lookups don't scan it.
+        names = numpy.asarray(self._table[self.id_col])
+        _, first_rows, name_indices = numpy.unique(
+            names, return_index=True, return_inverse=True)
+        self._rows = first_rows[name_indices.ravel()]
+        self._labels = numpy.asarray(self._table[self.label_col])
+
+    def _lookup(self, ids: numpy.ndarray) -> numpy.ndarray:
+        """Looks up the labels of IDs.
+
+        Parameters
+        ----------
+        ids
+            Array of IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of labels with the same shape as ids.
+
+        Raises
+        ------
+        KeyError
+            If an ID is not in the table.
+        """
+        unknown = (ids < 0) | (ids >= len(self._rows))
+        if unknown.any():
+            raise KeyError('Unknown id: {}'.format(ids[unknown][0]))
+        return self._labels[self._rows[ids]]
 
     def query(self, id_: int) -> numpy.ndarray:
         """Queries the labeller.
@@ -76,10 +144,22 @@ class ASCIITableLabeller(Labeller):
         numpy.ndarray
             1 x 1 label array.
         """
-        for row in self._table:
-            if row[self.id_col] == self._id_to_name[id_]:
-                return row[self.label_col].reshape((1, 1))
-        raise KeyError('Unknown id: {}'.format(id_))
+        return self._lookup(numpy.array([id_], dtype=int)).reshape((1, 1))
+
+    def query_batch(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Queries the labeller for many instances at once.
+
+        Parameters
+        ----------
+        ids
+            IDs of instances to label.
+
+        Returns
+        -------
+        numpy.ndarray
+            1 x N x 1 label array.
+        """
+        return self._lookup(numpy.asarray(ids, dtype=int)).reshape((1, -1, 1))
 
 
 class DatabaseLabeller(Labeller):
@@ -113,6 +193,21 @@ class DatabaseLabeller(Labeller):
         """
         return self._db.read_labels([0], [id_]).reshape((1, 1))
 
+    def query_batch(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Queries the labeller for many instances at once.
+
+        Parameters
+        ----------
+        ids
+            IDs of instances to label.
+
+        Returns
+        -------
+        numpy.ndarray
+            1 x N x 1 label array.
+        """
+        return self._db.read_labels([0], ids).reshape((1, -1, 1))
+
 
 # For safe string-based access to labeller classes.
 LABELLERS = {
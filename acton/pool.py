@@ -0,0 +1,242 @@
+"""Bookkeeping for pools of labelled and unlabelled instances."""
+
+from typing import Sequence
+
+import numpy
+
+
+class Pool(object):
+    """Tracks which instances of a pool have been labelled.
+
+    Notes
+    -----
+    Instances are kept in a boolean mask over the sorted pool IDs, so
+    labelling a batch of b instances only searches for and sets the batch's
+    entries, in O(b log N) time. The sorted labelled and unlabelled IDs are
+    built from the mask in O(N) time when they're next read and cached until
+    more instances are labelled. Random samples of the unlabelled IDs are
+    drawn from the mask directly, without building them.
+
+    Attributes
+    ----------
+    ids : numpy.ndarray
+        Sorted array of all IDs in the pool.
+    _labelled : numpy.ndarray
+        Boolean array where the ith entry is True iff ids[i] is labelled.
+    _n_labelled : int
+        Number of labelled instances.
+    _rng : numpy.random.Generator
+        Random number generator for sampling.
+    _labelled_ids : numpy.ndarray
+        Sorted array of labelled IDs, or None if it needs rebuilding.
+    _unlabelled_ids : numpy.ndarray
+        Sorted array of unlabelled IDs, or None if it needs rebuilding.
+    """
+
+    def __init__(self, ids: Sequence[int],
+                 rng: numpy.random.Generator=None):
+        """
+        Parameters
+        ----------
+        ids
+            IDs of instances in the pool.
+        rng
+            Random number generator for sampling. By default, one is seeded
+            from numpy.random, so numpy.random.seed makes samples
+            reproducible.
+        """
+        self.ids = numpy.unique(numpy.asarray(ids, dtype=int))
+        self._labelled = numpy.zeros(len(self.ids), dtype=bool)
+        self._n_labelled = 0
+        if rng is None:
+            rng = numpy.random.default_rng(numpy.random.randint(2 ** 31))
+        self._rng = rng
+        self._labelled_ids = None
+        self._unlabelled_ids = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Finds the positions of IDs in the pool.
+
+        Parameters
+        ----------
+        ids
+            IDs of instances in the pool.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of indices into self.ids.
+
+        Raises
+        ------
+        KeyError
+            If an ID is not in the pool.
+        """
+        ids = numpy.asarray(ids, dtype=int)
+        if not len(self.ids) and len(ids):
+            raise KeyError('Unknown id: {}'.format(ids[0]))
+
+        positions = numpy.searchsorted(self.ids, ids)
+        positions = numpy.minimum(positions, max(len(self.ids) - 1, 0))
+        unknown = self.ids[positions] != ids
+        if unknown.any():
+            raise KeyError('Unknown id: {}'.format(ids[unknown][0]))
+        return positions
+
+    def label(self, ids: Sequence[int]):
+        """Marks instances as labelled.
+
+        Parameters
+        ----------
+        ids
+            IDs of instances to mark. IDs that are already labelled are
+            ignored.
+        """
+        positions = self._positions(ids)
+        positions = numpy.unique(positions[~self._labelled[positions]])
+        if not len(positions):
+            return
+
+        self._labelled[positions] = True
+        self._n_labelled += len(positions)
+        self._labelled_ids = None
+        self._unlabelled_ids = None
+
+    def is_labelled(self, ids: Sequence[int]) -> numpy.ndarray:
+        """Checks whether instances are labelled.
+
+        Parameters
+        ----------
+        ids
+            IDs of instances in the pool.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array where the ith entry is True iff the ith ID is
+            labelled.
+        """
+        return self._labelled[self._positions(ids)]
+
+    def sample_unlabelled(self, size: float,
+                          strategy: str='random') -> numpy.ndarray:
+        """Draws a subsample of the unlabelled IDs without replacement.
+
+        Notes
+        -----
+        Random samples that are small beside the unlabelled pool are drawn by
+        rejection: positions in the pool are drawn uniformly and labelled ones
+        are discarded. This costs O(size log size) and never reads the whole
+        pool. Larger random samples and systematic samples are drawn from the
+        sorted unlabelled IDs, which are rebuilt in O(N) after labelling.
+
+        Parameters
+        ----------
+        size
+            Number of IDs to draw. If less than 1, the fraction of unlabelled
+            IDs to draw instead. All unlabelled IDs are returned if size is at
+            least the number of unlabelled IDs.
+        strategy
+            'random' draws uniformly from the unlabelled IDs. 'systematic'
+            splits the sorted unlabelled IDs into equal intervals and draws one
+            ID at random from each, so the sample evenly covers ID order. This
+            only spreads the sample over the pool if ID order is meaningful,
+            e.g. IDs follow position on the sky or time of observation.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted array of unlabelled IDs.
+
+        Raises
+        ------
+        ValueError
+            If size is not positive or strategy is unknown.
+        """
+        if size <= 0:
+            raise ValueError('Sample size must be positive: {}'.format(size))
+
+        if strategy not in {'random', 'systematic'}:
+            raise ValueError('Unknown sampling strategy: {}'.format(strategy))
+
+        n_unlabelled = len(self.ids) - self._n_labelled
+        if size < 1:
+            size = int(numpy.ceil(size * n_unlabelled))
+        size = int(size)
+        if size >= n_unlabelled:
+            return self.unlabelled_ids
+
+        if strategy == 'random' and 4 * size <= n_unlabelled:
+            return self.ids[self._sample_positions(size, n_unlabelled)]
+
+        unlabelled_ids = self.unlabelled_ids
+        if strategy == 'random':
+            indices = self._rng.choice(n_unlabelled, size=size,
+                                       replace=False)
+            indices.sort()
+        else:
+            edges = numpy.linspace(0, n_unlabelled, size + 1).astype(int)
+            indices = edges[:-1] + (numpy.random.random(size) *
+                                    numpy.diff(edges)).astype(int)
+        return unlabelled_ids[indices]
+
+    def _sample_positions(self, size: int,
+                          n_unlabelled: int) -> numpy.ndarray:
+        """Draws positions of unlabelled IDs by rejection sampling.
+
+        Parameters
+        ----------
+        size
+            Number of positions to draw. Should be well below n_unlabelled.
+        n_unlabelled
+            Number of unlabelled IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted array of distinct indices into self.ids.
+        """
+        positions = numpy.zeros(0, dtype=int)
+        while len(positions) < size:
+            # Draw enough positions to expect the rest of the sample, with
+            # some to spare for labelled and repeated positions.
+            n_draws = int(1.25 * (size - len(positions)) * len(self.ids) /
+                          n_unlabelled) + 16
+            draws = self._rng.integers(len(self.ids), size=n_draws)
+            positions = numpy.concatenate(
+                [positions, draws[~self._labelled[draws]]])
+            # Keeping the first draw of each position keeps the sample uniform.
+            _, first = numpy.unique(positions, return_index=True)
+            positions = positions[numpy.sort(first)]
+        return numpy.sort(positions[:size])
+
+    @property
+    def labelled_ids(self) -> numpy.ndarray:
+        """Gets the labelled IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted, read-only array of labelled IDs.
+        """
+        if self._labelled_ids is None:
+            self._labelled_ids = self.ids[self._labelled]
+            self._labelled_ids.setflags(write=False)
+        return self._labelled_ids
+
+    @property
+    def unlabelled_ids(self) -> numpy.ndarray:
+        """Gets the unlabelled IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted, read-only array of unlabelled IDs.
+        """
+        if self._unlabelled_ids is None:
+            self._unlabelled_ids = self.ids[~self._labelled]
+            self._unlabelled_ids.setflags(write=False)
+        return self._unlabelled_ids
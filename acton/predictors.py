@@ -2,11 +2,12 @@
 
 from abc import ABC, abstractmethod
 import logging
-from typing import Iterable, Sequence
+from typing import Callable, Iterable, Sequence
 
 import acton.database
 import acton.kde_predictor
 import GPy as gpy
+import joblib
 import numpy
 import sklearn.base
 import sklearn.linear_model
@@ -59,13 +60,17 @@ class Predictor(ABC):
 
     @abstractmethod
     def reference_predict(
-            self, ids: Sequence[int]) -> (numpy.ndarray, numpy.ndarray):
+            self, ids: Sequence[int],
+            compute_confidences: bool=True) -> (numpy.ndarray, numpy.ndarray):
         """Predicts labels using the best possible method.
 
         Parameters
         ----------
         ids
             List of IDs of instances to predict labels for.
+        compute_confidences
+            Whether to compute confidences. If False, predictors may skip
+            work that is only needed for the confidences and return None.
 
         Returns
         -------
@@ -76,11 +81,72 @@ class Predictor(ABC):
         """
 
 
+def predict_chunked(
+        predict: Callable[[numpy.ndarray], numpy.ndarray],
+        db: acton.database.Database, ids: Sequence[int],
+        chunk_size: int=None, n_jobs: int=1) -> numpy.ndarray:
+    """Predicts labels of instances, reading their features in chunks.
+
+    Notes
+    -----
+    Features are read from the database one chunk of IDs at a time, so only a
+    few chunks are held in memory at once. Chunks are predicted on a pool of
+    n_jobs threads and written into a preallocated output array.
+
+    Parameters
+    ----------
+    predict
+        Function mapping an N x D feature array to an N x T x C array of
+        predictions.
+    db
+        Database storing features.
+    ids
+        List of IDs of instances to predict labels for.
+    chunk_size
+        Number of instances per chunk. If not specified, all features are read
+        and predicted at once.
+    n_jobs
+        Number of threads to predict with. -1 uses all processors.
+
+    Returns
+    -------
+    numpy.ndarray
+        An N x T x C array of predictions.
+    """
+    ids = numpy.asarray(ids, dtype=int)
+    if not chunk_size or len(ids) <= chunk_size:
+        return predict(db.read_features(ids))
+
+    def predict_chunk(start: int, features: numpy.ndarray):
+        return start, predict(features)
+
+    # The pool consumes this generator a few chunks ahead of the workers, so
+    # features are read lazily and one chunk at a time.
+    tasks = (joblib.delayed(predict_chunk)(
+                 start, db.read_features(ids[start:start + chunk_size]))
+             for start in range(0, len(ids), chunk_size))
+
+    predictions = None
+    parallel = joblib.Parallel(n_jobs=n_jobs, prefer='threads',
+                               return_as='generator')
+    for start, chunk in parallel(tasks):
+        if predictions is None:
+            predictions = numpy.empty((len(ids),) + chunk.shape[1:],
+                                      dtype=chunk.dtype)
+        predictions[start:start + len(chunk)] = chunk
+    return predictions
+
+
 class _InstancePredictor(Predictor):
     """Wrapper for a scikit-learn instance.
 
     Attributes
     ----------
+    chunk_size : int
+        Number of instances to predict at once, or None to predict all
+        instances at once.
+    n_jobs : int
+        Number of threads to predict chunks with.
     _db : acton.database.Database
         Database storing features and labels.
     _instance : sklearn.base.BaseEstimator
@@ -88,7 +154,8 @@ class _InstancePredictor(Predictor):
     """
 
     def __init__(self, instance: sklearn.base.BaseEstimator,
-                 db: acton.database.Database):
+                 db: acton.database.Database, chunk_size: int=None,
+                 n_jobs: int=1):
         """
         Arguments
         ---------
@@ -96,9 +163,16 @@ class _InstancePredictor(Predictor):
             scikit-learn predictor instance.
         db
             Database storing features and labels.
+        chunk_size
+            Number of instances to predict at once. If not specified, all
+            instances are predicted at once.
+        n_jobs
+            Number of threads to predict chunks with. -1 uses all processors.
         """
         self._db = db
         self._instance = instance
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
 
     def fit(self, ids: Iterable[int]):
         """Fits the predictor to labelled data.
@@ -110,6 +184,18 @@ class _InstancePredictor(Predictor):
         """
         features = self._db.read_features(ids)
         labels = self._db.read_labels([0], ids)
+        self._fit_features(features, labels)
+
+    def _fit_features(self, features: numpy.ndarray, labels: numpy.ndarray):
+        """Fits the predictor to feature vectors.
+
+        Parameters
+        ----------
+        features
+            N x D array of feature vectors.
+        labels
+            1 x N x 1 array of labels.
+        """
         self._instance.fit(features, labels.ravel())
 
     def predict(self, ids: Sequence[int]) -> (numpy.ndarray, None):
@@ -133,24 +219,45 @@ class _InstancePredictor(Predictor):
         numpy.ndarray
             A N array of confidences (or None if not applicable).
         """
-        features = self._db.read_features(ids)
+        predictions = predict_chunked(
+            self._predict_features, self._db, ids,
+            chunk_size=self.chunk_size, n_jobs=self.n_jobs)
+        return predictions, None
+
+    def _predict_features(self, features: numpy.ndarray) -> numpy.ndarray:
+        """Predicts labels of feature vectors.
+
+        Parameters
+        ----------
+        features
+            N x D array of feature vectors.
+
+        Returns
+        -------
+        numpy.ndarray
+            An N x 1 x C array of corresponding predictions.
+        """
         try:
             probs = self._instance.predict_proba(features)
-            return probs.reshape((probs.shape[0], 1, probs.shape[1])), None
+            return probs.reshape((probs.shape[0], 1, probs.shape[1]))
         except AttributeError:
             probs = self._instance.predict(features)
             if len(probs.shape) == 1:
-                return probs.reshape((probs.shape[0], 1, 1)), None
+                return probs.reshape((probs.shape[0], 1, 1))
             else:
                 raise NotImplementedError()
 
-    def reference_predict(self, ids: Sequence[int]) -> (numpy.ndarray, None):
+    def reference_predict(self, ids: Sequence[int],
+                          compute_confidences: bool=True
+                          ) -> (numpy.ndarray, None):
         """Predicts labels using the best possible method.
 
         Parameters
         ----------
         ids
             List of IDs of instances to predict labels for.
+        compute_confidences
+            Ignored; this predictor has no confidences.
 
         Returns
         -------
@@ -163,8 +270,8 @@ class _InstancePredictor(Predictor):
 
 
 def from_instance(predictor: sklearn.base.BaseEstimator,
-                  db: acton.database.Database, regression: bool=False
-                  ) -> Predictor:
+                  db: acton.database.Database, regression: bool=False,
+                  chunk_size: int=None, n_jobs: int=1) -> Predictor:
     """Converts a scikit-learn predictor instance into a Predictor instance.
 
     Arguments
@@ -175,13 +282,19 @@ def from_instance(predictor: sklearn.base.BaseEstimator,
         Database storing features and labels.
     regression
         Whether this predictor does regression (as opposed to classification).
+    chunk_size
+        Number of instances to predict at once. If not specified, all
+        instances are predicted at once.
+    n_jobs
+        Number of threads to predict chunks with. -1 uses all processors.
 
     Returns
     -------
     Predictor
         Predictor instance wrapping the scikit-learn predictor.
     """
-    ip = _InstancePredictor(predictor, db)
+    ip = _InstancePredictor(predictor, db, chunk_size=chunk_size,
+                            n_jobs=n_jobs)
     if regression:
         ip.prediction_type = 'regression'
     return ip
@@ -200,12 +313,15 @@ def from_class(Predictor: type, regression: bool=False) -> type:
     Returns
     -------
     type
-        Predictor class wrapping the scikit-learn class.
+        Predictor class wrapping the scikit-learn class. Its constructor takes
+        a database, an optional chunk_size, and keyword arguments for the
+        scikit-learn class. n_jobs, if given, is also used to predict chunks.
     """
     class Predictor_(_InstancePredictor):
 
-        def __init__(self, db, **kwargs):
-            super().__init__(instance=None, db=db)
+        def __init__(self, db, chunk_size=None, **kwargs):
+            super().__init__(instance=None, db=db, chunk_size=chunk_size,
+                             n_jobs=kwargs.get('n_jobs', 1))
             self._instance = Predictor(**kwargs)
 
     if regression:
@@ -217,6 +333,12 @@ def from_class(Predictor: type, regression: bool=False) -> type:
 class Committee(Predictor):
     """A predictor using a committee of other predictors.
 
+    Notes
+    -----
+    Committee members wrapping scikit-learn predictors share one read of the
+    features. Members are fitted and make predictions in parallel on a pool of
+    n_jobs threads.
+
     Attributes
     ----------
     n_classifiers : int
@@ -224,6 +346,11 @@ class Committee(Predictor):
     subset_size : float
         Percentage of known labels to take subsets of to train the
         classifier. Lower numbers increase variety.
+    n_jobs : int
+        Number of threads to fit and predict with.
+    chunk_size : int
+        Number of instances to predict at once, or None to predict all
+        instances at once.
     _db : acton.database.Database
         Database storing features and labels.
     _committee : List[sklearn.linear_model.LogisticRegression]
@@ -234,7 +361,7 @@ class Committee(Predictor):
 
     def __init__(self, Predictor: type, db: acton.database.Database,
                  n_classifiers: int=10, subset_size: float=0.6,
-                 **kwargs: dict):
+                 n_jobs: int=1, chunk_size: int=None, **kwargs: dict):
         """
         Parameters
         ----------
@@ -247,16 +374,33 @@ class Committee(Predictor):
         subset_size
             Percentage of known labels to take subsets of to train the
             classifier. Lower numbers increase variety.
+        n_jobs
+            Number of threads to fit and predict with. -1 uses all processors.
+        chunk_size
+            Number of instances to predict at once. If not specified, all
+            instances are predicted at once.
         kwargs
             Keyword arguments passed to the underlying Predictor.
         """
         self.n_classifiers = n_classifiers
         self.subset_size = subset_size
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
         self._db = db
         self._committee = [Predictor(db=db, **kwargs)
                            for _ in range(n_classifiers)]
         self._reference_predictor = Predictor(db=db, **kwargs)
 
+    def _parallel(self) -> joblib.Parallel:
+        """Makes a pool of threads to run committee members on.
+
+        Returns
+        -------
+        joblib.Parallel
+            Thread pool.
+        """
+        return joblib.Parallel(n_jobs=self.n_jobs, prefer='threads')
+
     def fit(self, ids: Iterable[int]):
         """Fits the predictor to labelled data.
 
@@ -265,18 +409,52 @@ class Committee(Predictor):
         ids
             List of IDs of instances to train from.
         """
+        ids = numpy.asarray(ids, dtype=int)
         # Get labels so we can stratify a split.
         labels = self._db.read_labels([0], ids)
-        for classifier in self._committee:
-            # Take a subsets to introduce variety.
+        # Take subsets to introduce variety. These are drawn up front so that
+        # they don't depend on the order the members are fitted in.
+        subsets = []
+        for _ in self._committee:
             try:
                 subset, _ = sklearn.model_selection.train_test_split(
-                    ids, train_size=self.subset_size, stratify=labels)
+                    numpy.arange(len(ids)), train_size=self.subset_size,
+                    stratify=labels.ravel())
             except ValueError:
                 # Too few labels.
-                subset = ids
-            classifier.fit(subset)
-        self._reference_predictor.fit(ids)
+                subset = numpy.arange(len(ids))
+            subsets.append(numpy.sort(subset))
+
+        members = self._committee + [self._reference_predictor]
+        subsets.append(numpy.arange(len(ids)))
+        if all(isinstance(member, _InstancePredictor) for member in members):
+            features = self._db.read_features(ids)
+            self._parallel()(
+                joblib.delayed(member._fit_features)(
+                    features[subset], labels[:, subset])
+                for member, subset in zip(members, subsets))
+        else:
+            self._parallel()(
+                joblib.delayed(member.fit)(ids[subset])
+                for member, subset in zip(members, subsets))
+
+    def _predict_features(self, features: numpy.ndarray) -> numpy.ndarray:
+        """Predicts labels of feature vectors with each committee member.
+
+        Parameters
+        ----------
+        features
+            N x D array of feature vectors.
+
+        Returns
+        -------
+        numpy.ndarray
+            An N x T x C array of corresponding predictions.
+        """
+        predictions = self._parallel()(
+            joblib.delayed(classifier._predict_features)(features)
+            for classifier in self._committee)
+        return numpy.concatenate(predictions, axis=1)
 
     def predict(self, ids: Sequence[int]) -> (numpy.ndarray, numpy.ndarray):
         """Predicts labels of instances.
@@ -299,22 +477,85 @@ class Committee(Predictor):
         numpy.ndarray
             A N array of confidences (or None if not applicable).
         """
-        predictions = numpy.concatenate(
-            [classifier.predict(ids)[0]
-             for classifier in self._committee],
-            axis=1)
+        if all(isinstance(classifier, _InstancePredictor)
+               for classifier in self._committee):
+            predictions = predict_chunked(
+                self._predict_features, self._db, ids,
+                chunk_size=self.chunk_size)
+        else:
+            results = self._parallel()(
+                joblib.delayed(classifier.predict)(ids)
+                for classifier in self._committee)
+            predictions = numpy.concatenate(
+                [predictions for predictions, _ in results], axis=1)
         assert predictions.shape[:2] == (len(ids), len(self._committee))
         stdevs = predictions.std(axis=1).mean(axis=1)
         return predictions, stdevs
 
+    def score(self, ids: Sequence[int], compute_committee: bool=True
+              ) -> (numpy.ndarray, numpy.ndarray, numpy.ndarray):
+        """Predicts labels with the committee and the reference predictor.
+
+        Notes
+        -----
+        If the members wrap scikit-learn predictors, features are read once
+        and all predictions are made in one pass over them.
+
+        Parameters
+        ----------
+        ids
+            List of IDs of instances to predict labels for.
+        compute_committee
+            Whether to make committee predictions. If False, only the
+            reference predictor is run.
+
+        Returns
+        -------
+        numpy.ndarray
+            An N x T x C array of committee predictions, or None if
+            compute_committee is False.
+        numpy.ndarray
+            A N array of standard deviations of the committee predictions, or
+            None if compute_committee is False.
+        numpy.ndarray
+            An N x 1 x C array of reference predictions.
+        """
+        if not compute_committee:
+            return None, None, self._reference_predictor.predict(ids)[0]
+
+        members = self._committee + [self._reference_predictor]
+        if all(isinstance(member, _InstancePredictor) for member in members):
+            def predict_features(features: numpy.ndarray) -> numpy.ndarray:
+                predictions = self._parallel()(
+                    joblib.delayed(member._predict_features)(features)
+                    for member in members)
+                return numpy.concatenate(predictions, axis=1)
+
+            # The last "member" is the reference predictor.
+            all_predictions = predict_chunked(
+                predict_features, self._db, ids, chunk_size=self.chunk_size)
+            predictions = all_predictions[:, :-1]
+            reference_predictions = all_predictions[:, -1:]
+        else:
+            predictions, _ = self.predict(ids)
+            reference_predictions = self._reference_predictor.predict(ids)[0]
+
+        stdevs = predictions.std(axis=1).mean(axis=1)
+        return predictions, stdevs, reference_predictions
+
     def reference_predict(
-            self, ids: Sequence[int]) -> (numpy.ndarray, numpy.ndarray):
+            self, ids: Sequence[int],
+            compute_confidences: bool=True) -> (numpy.ndarray, numpy.ndarray):
         """Predicts labels using the best possible method.
 
         Parameters
         ----------
         ids
             List of IDs of instances to predict labels for.
+        compute_confidences
+            Whether to compute confidences. These are the standard deviations
+            of the committee predictions, so if False, only the reference
+            predictor is run and None is returned for the confidences.
 
         Returns
         -------
@@ -323,8 +564,9 @@ class Committee(Predictor):
         numpy.ndarray
             A N array of confidences (or None if not applicable).
         """
-        _, stdevs = self.predict(ids)
-        return self._reference_predictor.predict(ids)[0], stdevs
+        _, stdevs, predictions = self.score(
+            ids, compute_committee=compute_confidences)
+        return predictions, stdevs
 
 
 def AveragePredictions(predictor: Predictor) -> Predictor:
@@ -372,7 +614,7 @@ class GPClassifier(Predictor):
         Database storing features and labels.
     """
     def __init__(self, db: acton.database.Database, max_iters: int=50000,
-                 n_jobs: int=1):
+                 n_jobs: int=1, chunk_size: int=None):
         """
         Parameters
         ----------
@@ -382,6 +624,8 @@ class GPClassifier(Predictor):
             Maximum optimisation iterations.
         n_jobs
             Does nothing; here for compatibility with sklearn.
+        chunk_size
+            Does nothing; here for compatibility with other predictors.
         """
         self._db = db
         self.max_iters = max_iters
@@ -440,13 +684,16 @@ class GPClassifier(Predictor):
         return predictions.reshape((-1, 1, 2)), variances
 
     def reference_predict(
-            self, ids: Sequence[int]) -> (numpy.ndarray, numpy.ndarray):
+            self, ids: Sequence[int],
+            compute_confidences: bool=True) -> (numpy.ndarray, numpy.ndarray):
         """Predicts labels using the best possible method.
 
         Parameters
         ----------
         ids
             List of IDs of instances to predict labels for.
+        compute_confidences
+            Ignored; the variances are computed with the predictions.
 
         Returns
         -------
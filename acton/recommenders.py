@@ -2,10 +2,11 @@
 
 from abc import ABC, abstractmethod
 import logging
-from typing import Sequence
+from typing import Iterable, Sequence, Tuple
 import warnings
 
 import acton.database
+import acton.index
 import numpy
 import scipy.stats
 
@@ -19,8 +20,16 @@ def choose_mmr(features: numpy.ndarray, scores: numpy.ndarray, n: int,
     Scores are chosen from highest to lowest. If there are less scores to choose
     from than requested, all scores will be returned in order of preference.
 
+    Each selection maximises l * score + (1 - l) * distance to the nearest
+    selection, so lower l gives more diverse selections. The distance from
+    each instance to its nearest selection is kept up to date as selections
+    are made, so each selection costs one pass over the features. For very
+    large problems, see choose_mmr_approx.
+
     Parameters
     ----------
+    features
+        N x D array of feature vectors.
     scores
         1D array of scores.
     n
@@ -40,40 +49,218 @@ def choose_mmr(features: numpy.ndarray, scores: numpy.ndarray, n: int,
     if n == 0:
         return []
 
-    selections = [scores.argmax()]
-    selections_set = set(selections)
+    selections = [int(scores.argmax())]
+    selected = numpy.zeros(len(scores), dtype=bool)
+    selected[selections[0]] = True
 
     logging.debug('Running MMR.')
-    dists = []
-    dists_matrix = None
-    while len(selections) < n:
-        if len(selections) % (n // 10) == 0:
+    min_dists = numpy.full(len(scores), numpy.inf)
+    n_selections = min(n, len(scores))
+    while len(selections) < n_selections:
+        if len(selections) % max(n // 10, 1) == 0:
             logging.debug('MMR epoch {}/{}.'.format(len(selections), n))
-        # Compute distances for last selection.
+        # Update distances with the last selection.
         last = features[selections[-1]:selections[-1] + 1]
-        last_dists = numpy.linalg.norm(features - last, axis=1)
-        dists.append(last_dists)
-        dists_matrix = numpy.array(dists)
+        numpy.minimum(min_dists, numpy.linalg.norm(features - last, axis=1),
+                      out=min_dists)
+
+        margins = l * scores + (1 - l) * min_dists
+        margins[selected] = -numpy.inf
+        next_best = int(margins.argmax())
+        selections.append(next_best)
+        selected[next_best] = True
+
+    return selections
+
+
+def choose_mmr_approx(features: numpy.ndarray, scores: numpy.ndarray, n: int,
+                      l: float=0.5, n_candidates: int=None,
+                      block_size: int=None) -> Sequence[int]:
+    """Approximately chooses n scores using maximal marginal relevance.
+
+    Notes
+    -----
+    This approximates choose_mmr in two ways so that it scales to millions of
+    scores and thousands of selections. First, only the n_candidates highest
+    scores are considered. Second, selections are made in blocks: the
+    block_size best margins are all selected at once, and distances to the
+    whole block are then computed with one matrix product.
+
+    With n_candidates = len(scores) and block_size = 1, this is equivalent to
+    choose_mmr up to floating point error.
+
+    Parameters
+    ----------
+    features
+        N x D array of feature vectors.
+    scores
+        1D array of scores.
+    n
+        Number of scores to choose.
+    l
+        Lambda parameter for MMR. l = 1 gives a relevance-ranked list and l = 0
+        gives a maximal diversity ranking.
+    n_candidates
+        Number of highest scores to choose from. Default 10n.
+    block_size
+        Number of scores to choose at once. Default n / 100.
+
+    Returns
+    -------
+    Sequence[int]
+        List of indices of scores chosen.
+    """
+    if n < 0:
+        raise ValueError('n must be a non-negative integer.')
+
+    if n == 0:
+        return []
+
+    if n_candidates is None:
+        n_candidates = 10 * n
+    n_candidates = min(max(n_candidates, n), len(scores))
+    if block_size is None:
+        block_size = max(n // 100, 1)
+
+    # Only the highest scores are candidates.
+    if n_candidates < len(scores):
+        candidates = numpy.argpartition(-scores, n_candidates - 1)[
+            :n_candidates]
+    else:
+        candidates = numpy.arange(len(scores))
+    features = numpy.asarray(features[candidates], dtype=float)
+    scores = numpy.asarray(scores[candidates], dtype=float)
+    sq_norms = (features ** 2).sum(axis=1)
+
+    selections = [int(scores.argmax())]
+    selected = numpy.zeros(len(scores), dtype=bool)
+    selected[selections[0]] = True
+    block = selections[:]
+
+    logging.debug('Running approximate MMR.')
+    min_sq_dists = numpy.full(len(scores), numpy.inf)
+    n_selections = min(n, len(scores))
+    while len(selections) < n_selections:
+        # Update distances with the last block of selections, using
+        # |x - y|^2 = |x|^2 + |y|^2 - 2 x.y. Candidates are processed a few
+        # thousand rows at a time so the intermediate products stay in cache.
+        block_features = features[block].T
+        block_sq_norms = sq_norms[block]
+        for start in range(0, len(scores), 4096):
+            stop = start + 4096
+            products = features[start:stop].dot(block_features)
+            products *= -2
+            products += block_sq_norms
+            block_sq_dists = products.min(axis=1) + sq_norms[start:stop]
+            numpy.minimum(min_sq_dists[start:stop], block_sq_dists,
+                          out=min_sq_dists[start:stop])
+
+        margins = l * scores + (1 - l) * numpy.sqrt(
+            numpy.maximum(min_sq_dists, 0))
+        margins[selected] = -numpy.inf
+        size = min(block_size, n_selections - len(selections))
+        if size == 1:
+            block = [int(margins.argmax())]
+        else:
+            block = numpy.argpartition(-margins, size - 1)[:size]
+            block = block[numpy.argsort(-margins[block], kind='mergesort')]
+            block = block.tolist()
+        selections.extend(block)
+        selected[block] = True
+
+    return candidates[selections].tolist()
+
+
+def choose_kcenter(features: numpy.ndarray, scores: numpy.ndarray, n: int,
+                   l: float=0.5, n_candidates: int=None) -> Sequence[int]:
+    """Chooses n scores that balance score against coverage of feature space.
+
+    Notes
+    -----
+    This is greedy k-center selection weighted by score. The highest score is
+    chosen first, then each selection maximises
+
+        l * score + (1 - l) * distance to the nearest selection,
 
-        next_best = None
-        next_best_margin = float('-inf')
+    where scores are rescaled to [0, 1] and distances are rescaled by the
+    largest distance to the first selection. l = 1 chooses the n highest scores
+    and l = 0 gives farthest-first traversal, which covers feature space.
 
-        for i in range(len(scores)):
-            if i in selections_set:
-                continue
+    Only the n_candidates highest scores are considered, and the distance from
+    each candidate to its nearest selection is kept up to date with one
+    matrix-vector product per selection, so this scales to thousands of
+    selections from millions of scores.
 
-            margin = l * (scores[i] - (1 - l) * dists_matrix[:, i].max())
-            if margin > next_best_margin:
-                next_best_margin = margin
-                next_best = i
+    Parameters
+    ----------
+    features
+        N x D array of feature vectors.
+    scores
+        1D array of scores.
+    n
+        Number of scores to choose.
+    l
+        Trade-off between score and coverage in [0, 1].
+    n_candidates
+        Number of highest scores to choose from. Default 10n.
 
-        if next_best is None:
-            break
+    Returns
+    -------
+    Sequence[int]
+        List of indices of scores chosen.
+    """
+    if n < 0:
+        raise ValueError('n must be a non-negative integer.')
 
+    if n == 0:
+        return []
+
+    if n_candidates is None:
+        n_candidates = 10 * n
+    n_candidates = min(max(n_candidates, n), len(scores))
+    candidates = _top_n(numpy.asarray(scores, dtype=float), n_candidates)
+    candidates.sort()
+    features = numpy.asarray(features[candidates], dtype=float)
+    scores = numpy.asarray(scores[candidates], dtype=float)
+    sq_norms = (features ** 2).sum(axis=1)
+
+    # Rescale scores to [0, 1] so they're comparable to distances. Infinite
+    # scores (e.g. from EntropyRecommender) are clipped to the finite range.
+    finite = numpy.isfinite(scores)
+    if finite.any():
+        low, high = scores[finite].min(), scores[finite].max()
+        scores = numpy.clip(scores, low, high)
+        scores = (scores - low) / max(high - low, 1e-12)
+    else:
+        scores = numpy.zeros(len(scores))
+
+    selections = [int(scores.argmax())]
+    selected = numpy.zeros(len(scores), dtype=bool)
+    selected[selections[0]] = True
+
+    logging.debug('Running k-center selection.')
+    min_sq_dists = numpy.full(len(scores), numpy.inf)
+    scale = None
+    n_selections = min(n, len(scores))
+    while len(selections) < n_selections:
+        if len(selections) % max(n // 10, 1) == 0:
+            logging.debug('k-center epoch {}/{}.'.format(len(selections), n))
+        # Update distances with the last selection, using
+        # |x - y|^2 = |x|^2 + |y|^2 - 2 x.y.
+        last = selections[-1]
+        sq_dists = sq_norms + sq_norms[last] - 2 * features.dot(features[last])
+        numpy.minimum(min_sq_dists, sq_dists, out=min_sq_dists)
+        min_dists = numpy.sqrt(numpy.maximum(min_sq_dists, 0))
+        if scale is None:
+            scale = max(min_dists.max(), 1e-12)
+
+        margins = l * scores + (1 - l) * min_dists / scale
+        margins[selected] = -numpy.inf
+        next_best = int(margins.argmax())
         selections.append(next_best)
-        selections_set.add(next_best)
+        selected[next_best] = True
 
-    return selections
+    return candidates[selections].tolist()
 
 
 def choose_boltzmann(features: numpy.ndarray, scores: numpy.ndarray, n: int,
@@ -85,8 +272,18 @@ def choose_boltzmann(features: numpy.ndarray, scores: numpy.ndarray, n: int,
     Scores are chosen from highest to lowest. If there are less scores to choose
     from than requested, all scores will be returned in order of preference.
 
+    Scores are sampled without replacement with the Gumbel-top-k trick: each
+    score is divided by the temperature and perturbed with Gumbel noise, and
+    the n largest perturbed scores are chosen. This draws from the same
+    distribution as repeatedly sampling with probability proportional to
+    exp(score / temperature) and removing the sample, but never exponentiates
+    the scores, so low temperatures can't overflow. A temperature of 0 chooses
+    the n highest scores.
+
     Parameters
     ----------
+    features
+        N x D array of feature vectors. Unused.
     scores
         1D array of scores.
     n
@@ -103,29 +300,71 @@ def choose_boltzmann(features: numpy.ndarray, scores: numpy.ndarray, n: int,
     if n < 0:
         raise ValueError('n must be a non-negative integer.')
 
+    if temperature < 0:
+        raise ValueError('temperature must be non-negative.')
+
+    n = min(n, len(scores))
     if n == 0:
         return []
 
-    boltzmann_scores = numpy.exp(scores / temperature)
-    boltzmann_scores /= boltzmann_scores.sum()
-    not_chosen = list(range(len(boltzmann_scores)))
-    chosen = []
-    while len(chosen) < n and not_chosen:
-        scores_ = boltzmann_scores[not_chosen]
-        r = numpy.random.uniform(high=scores_.sum())
-        total = 0
-        upto = 0
-        while True:
-            score = scores_[upto]
-            total += score
-            if total > r:
-                break
+    keys = _boltzmann_keys(scores, temperature)
+    chosen = _top_n(keys, n)
+    chosen = chosen[numpy.argsort(-keys[chosen], kind='mergesort')]
+    return chosen.tolist()
+
+
+def _boltzmann_keys(scores: numpy.ndarray,
+                    temperature: float) -> numpy.ndarray:
+    """Perturbs scores so that the largest are a Boltzmann sample.
+
+    Parameters
+    ----------
+    scores
+        1D array of scores.
+    temperature
+        Non-negative temperature parameter for sampling.
+
+    Returns
+    -------
+    numpy.ndarray
+        1D array of keys. The indices of the n largest keys are a sample of n
+        scores without replacement from the Boltzmann distribution.
+    """
+    if temperature == 0:
+        return numpy.asarray(scores, dtype=float)
+
+    return scores / temperature + numpy.random.gumbel(size=len(scores))
+
+
+def _top_n(keys: numpy.ndarray, n: int) -> numpy.ndarray:
+    """Finds the indices of the n largest keys, in no particular order.
+
+    Parameters
+    ----------
+    keys
+        1D array of keys.
+    n
+        Number of keys to find.
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the min(n, len(keys)) largest keys.
+    """
+    if n >= len(keys):
+        return numpy.arange(len(keys))
+
+    return numpy.argpartition(-keys, n - 1)[:n]
 
-            upto += 1
-        chosen.append(not_chosen[upto])
-        not_chosen.pop(upto)
 
-    return chosen
+# Strategies for selecting instances to label from their scores, mapped to
+# whether the strategy uses the features of the instances.
+SELECTIONS = {
+    'boltzmann': False,
+    'mmr': True,
+    'mmr_approx': True,
+    'kcenter': True,
+}
 
 
 class Recommender(ABC):
@@ -133,8 +372,133 @@ class Recommender(ABC):
 
     Attributes
     ----------
+    selection : str
+        Strategy for selecting instances from their scores. One of SELECTIONS.
+    index : acton.index.FeatureIndex
+        Index over the features of the pool, or None.
+    density_weight : float
+        Exponent of the density that scores are weighted by.
     """
 
+    def __init__(self, db: acton.database.Database,
+                 selection: str='boltzmann',
+                 index: acton.index.FeatureIndex=None,
+                 density_weight: float=0):
+        """
+        Parameters
+        ----------
+        db
+            Features database.
+        selection
+            Strategy for selecting instances from their scores. One of
+            SELECTIONS. Features are only read if the strategy uses them.
+        index
+            Index over the features of the pool.
+        density_weight
+            If positive, scores are multiplied by the density of the feature
+            space around each instance to this power, so that representative
+            instances are preferred to outliers (Settles 2009). Densities are
+            queried from the index.
+        """
+        if selection not in SELECTIONS:
+            raise ValueError('Unknown selection: {}. Selections are one of '
+                             '{}.'.format(selection, list(SELECTIONS)))
+
+        if density_weight and index is None:
+            raise ValueError('Density weighting requires an index.')
+
+        self._db = db
+        self.selection = selection
+        self.index = index
+        self.density_weight = density_weight
+
+    @property
+    def needs_features(self) -> bool:
+        """Whether the selection strategy uses features.
+
+        Returns
+        -------
+        bool
+            True iff features must be read to make recommendations.
+        """
+        return SELECTIONS[self.selection]
+
+    def _choose(self, ids: Sequence[int], scores: numpy.ndarray, n: int,
+                diversity: float) -> Sequence[int]:
+        """Chooses instances to label from their scores.
+
+        Notes
+        -----
+        Features are only read from the database if the selection strategy
+        uses them.
+
+        Parameters
+        ----------
+        ids
+            Sequence of IDs in the unlabelled data pool.
+        scores
+            1D array of scores. The ith score must correspond with the ith ID.
+        n
+            Number of recommendations to make.
+        diversity
+            Recommendation diversity in [0, 1].
+
+        Returns
+        -------
+        Sequence[int]
+            IDs of the instances to label.
+        """
+        if not self.needs_features:
+            features = None
+        else:
+            features = self._db.read_features(ids)
+        if self.selection == 'boltzmann':
+            indices = choose_boltzmann(features, scores, n,
+                                       temperature=diversity * 2)
+        elif self.selection == 'mmr':
+            indices = choose_mmr(features, scores, n, l=1 - diversity)
+        elif self.selection == 'kcenter':
+            indices = choose_kcenter(features, scores, n, l=1 - diversity)
+        else:
+            indices = choose_mmr_approx(features, scores, n, l=1 - diversity)
+        return [ids[i] for i in indices]
+
+    @abstractmethod
+    def score(self, predictions: numpy.ndarray) -> numpy.ndarray:
+        """Scores instances by how useful they would be to label.
+
+        Parameters
+        ----------
+        predictions
+            N x T x C array of predictions.
+
+        Returns
+        -------
+        numpy.ndarray
+            N array of scores. Higher scores are more useful.
+        """
+
+    def _weight(self, ids: Sequence[int],
+                scores: numpy.ndarray) -> numpy.ndarray:
+        """Weights scores by density, if density weighting is enabled.
+
+        Parameters
+        ----------
+        ids
+            Sequence of IDs in the unlabelled data pool.
+        scores
+            1D array of scores. The ith score must correspond with the ith ID.
+
+        Returns
+        -------
+        numpy.ndarray
+            1D array of weighted scores.
+        """
+        if not self.density_weight:
+            return scores
+
+        return scores * self.index.density(ids) ** self.density_weight
+
     @abstractmethod
     def recommend(self, ids: Sequence[int],
                   predictions: numpy.ndarray,
@@ -158,18 +522,84 @@ class Recommender(ABC):
             IDs of the instances to label.
         """
 
+    def recommend_stream(
+            self, chunks: Iterable[Tuple[Sequence[int], numpy.ndarray]],
+            n: int=1, diversity: float=0.5) -> Sequence[int]:
+        """Recommends instances to label from chunks of the unlabelled pool.
+
+        Notes
+        -----
+        Each chunk is scored and discarded, keeping only a bounded number of
+        candidates, so memory use doesn't depend on the size of the pool.
+
+        For Boltzmann selection, the n best Gumbel-perturbed scores are kept,
+        which gives exactly the same distribution as recommend. For other
+        selection strategies, the 10n highest scores are kept and the strategy
+        is run on those, as in choose_mmr_approx.
+
+        Parameters
+        ----------
+        chunks
+            Iterable of (ids, predictions) pairs, where ids is a sequence of
+            IDs in the unlabelled data pool and predictions is the
+            corresponding N x T x C array of predictions.
+        n
+            Number of recommendations to make.
+        diversity
+            Recommendation diversity in [0, 1].
+
+        Returns
+        -------
+        Sequence[int]
+            IDs of the instances to label.
+        """
+        if self.selection == 'boltzmann':
+            n_kept = n
+            temperature = diversity * 2
+        else:
+            n_kept = 10 * n
+
+        kept_ids = numpy.zeros(0, dtype=int)
+        kept_scores = numpy.zeros(0)
+        kept_keys = numpy.zeros(0)
+        for ids, predictions in chunks:
+            scores = self._weight(ids, self.score(predictions))
+            if self.selection == 'boltzmann':
+                keys = _boltzmann_keys(scores, temperature)
+            else:
+                keys = scores
+            kept_ids = numpy.concatenate([kept_ids, numpy.asarray(ids)])
+            kept_scores = numpy.concatenate([kept_scores, scores])
+            kept_keys = numpy.concatenate([kept_keys, keys])
+            best = _top_n(kept_keys, n_kept)
+            kept_ids = kept_ids[best]
+            kept_scores = kept_scores[best]
+            kept_keys = kept_keys[best]
+
+        if self.selection == 'boltzmann':
+            order = numpy.argsort(-kept_keys, kind='mergesort')
+            return kept_ids[order][:n].tolist()
+
+        return self._choose(kept_ids, kept_scores, n, diversity)
+
 
 class RandomRecommender(Recommender):
     """Recommends instances at random."""
 
-    def __init__(self, db: acton.database.Database):
-        """
+    def score(self, predictions: numpy.ndarray) -> numpy.ndarray:
+        """Scores instances by how useful they would be to label.
+
         Parameters
         ----------
-        db
-            Features database.
+        predictions
+            N x T x C array of predictions.
+
+        Returns
+        -------
+        numpy.ndarray
+            N array of zeros.
         """
-        self._db = db
+        return numpy.zeros(predictions.shape[0])
 
     def recommend(self, ids: Sequence[int],
                   predictions: numpy.ndarray,
@@ -194,18 +624,70 @@ class RandomRecommender(Recommender):
         """
         return numpy.random.choice(list(ids), size=n)
 
+    def recommend_stream(
+            self, chunks: Iterable[Tuple[Sequence[int], numpy.ndarray]],
+            n: int=1, diversity: float=0.5) -> Sequence[int]:
+        """Recommends instances to label from chunks of the unlabelled pool.
+
+        Notes
+        -----
+        Unlike recommend, instances are drawn without replacement.
+
+        Parameters
+        ----------
+        chunks
+            Iterable of (ids, predictions) pairs, where ids is a sequence of
+            IDs in the unlabelled data pool and predictions is the
+            corresponding N x T x C array of predictions.
+        n
+            Number of recommendations to make.
+        diversity
+            Recommendation diversity in [0, 1].
+
+        Returns
+        -------
+        Sequence[int]
+            IDs of the instances to label.
+        """
+        # With equal scores, Boltzmann selection is uniform.
+        return super().recommend_stream(chunks, n=n, diversity=0.5)
+
 
 class QBCRecommender(Recommender):
     """Recommends instances by committee disagreement."""
 
-    def __init__(self, db: acton.database.Database):
-        """
+    def score(self, predictions: numpy.ndarray) -> numpy.ndarray:
+        """Scores instances by committee disagreement.
+
+        Notes
+        -----
+        The score is the fraction of the committee that disagrees with the
+        plurality label, so scores don't depend on the other instances.
+
         Parameters
         ----------
-        db
-            Features database.
+        predictions
+            N x T x C array of predictions.
+
+        Returns
+        -------
+        numpy.ndarray
+            N array of scores.
         """
-        self._db = db
+        assert predictions.shape[1] > 2, "QBC must have > 2 predictors."
+        labels = predictions.argmax(axis=2)
+        plurality_labels, plurality_counts = scipy.stats.mode(labels, axis=1)
+        # Newer versions of scipy drop the reduced axis.
+        plurality_labels = numpy.reshape(plurality_labels, (-1, 1))
+        assert plurality_labels.shape == (predictions.shape[0], 1), \
+            'plurality_labels has shape {}; expected {}'.format(
+                plurality_labels.shape, (predictions.shape[0], 1))
+        agree_with_plurality = labels == plurality_labels
+        assert labels.shape == agree_with_plurality.shape
+        n_agree = agree_with_plurality.sum(axis=1)
+        # Agreement is now between 0 and 1.
+        p_agree = n_agree / predictions.shape[1]
+        return 1 - p_agree
 
     def recommend(self, ids: Sequence[int],
                   predictions: numpy.ndarray,
@@ -233,35 +715,36 @@ class QBCRecommender(Recommender):
         Sequence[int]
             IDs of the instances to label.
         """
-        assert predictions.shape[1] > 2, "QBC must have > 2 predictors."
         assert len(ids) == predictions.shape[0]
         assert 0 <= diversity <= 1
-        labels = predictions.argmax(axis=2)
-        plurality_labels, plurality_counts = scipy.stats.mode(labels, axis=1)
-        assert plurality_labels.shape == (predictions.shape[0], 1), \
-            'plurality_labels has shape {}; expected {}'.format(
-                plurality_labels.shape, (predictions.shape[0], 1))
-        agree_with_plurality = labels == plurality_labels
-        assert labels.shape == agree_with_plurality.shape
-        n_agree = labels.sum(axis=1)
-        p_agree = n_agree / n_agree.max()  # Agreement is now between 0 and 1.
-        disagreement = 1 - p_agree
-        indices = choose_boltzmann(self._db.read_features(ids), disagreement, n,
-                                   temperature=diversity * 2)
-        return [ids[i] for i in indices]
+        scores = self._weight(ids, self.score(predictions))
+        return self._choose(ids, scores, n, diversity)
 
 
 class UncertaintyRecommender(Recommender):
     """Recommends instances by confidence-based uncertainty sampling."""
 
-    def __init__(self, db: acton.database.Database):
-        """
+    def score(self, predictions: numpy.ndarray) -> numpy.ndarray:
+        """Scores instances by the uncertainty of their most likely label.
+
         Parameters
         ----------
-        db
-            Features database.
+        predictions
+            N x 1 x C array of predictions.
+
+        Returns
+        -------
+        numpy.ndarray
+            N array of scores.
         """
-        self._db = db
+        if predictions.shape[1] != 1:
+            raise ValueError('Uncertainty sampling must have one predictor')
+
+        # x* = argmax (1 - p(y^ | x)) where y^ = argmax p(y | x)
+        # (Settles 2009).
+        proximities = 1 - predictions.max(axis=2).ravel()
+        assert proximities.shape == (predictions.shape[0],)
+        return proximities
 
     def recommend(self, ids: Sequence[int],
                   predictions: numpy.ndarray,
@@ -289,31 +772,39 @@ class UncertaintyRecommender(Recommender):
         Sequence[int]
             IDs of the instances to label.
         """
-        if predictions.shape[1] != 1:
-            raise ValueError('Uncertainty sampling must have one predictor')
-
         assert len(ids) == predictions.shape[0]
-
-        # x* = argmax (1 - p(y^ | x)) where y^ = argmax p(y | x) (Settles 2009).
-        proximities = 1 - predictions.max(axis=2).ravel()
-        assert proximities.shape == (len(ids),)
-
-        indices = choose_boltzmann(self._db.read_features(ids), proximities, n,
-                                   temperature=diversity * 2)
-        return [ids[i] for i in indices]
+        scores = self._weight(ids, self.score(predictions))
+        return self._choose(ids, scores, n, diversity)
 
 
 class EntropyRecommender(Recommender):
     """Recommends instances by confidence-based uncertainty sampling."""
 
-    def __init__(self, db: acton.database.Database):
-        """
+    def score(self, predictions: numpy.ndarray) -> numpy.ndarray:
+        """Scores instances by the entropy of their predictions.
+
         Parameters
         ----------
-        db
-            Features database.
+        predictions
+            N x 1 x C array of predictions.
+
+        Returns
+        -------
+        numpy.ndarray
+            N array of scores.
         """
-        self._db = db
+        if predictions.shape[1] != 1:
+            raise ValueError('Uncertainty sampling must have one predictor')
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings(action='ignore', category=RuntimeWarning)
+            proximities = -predictions * numpy.log(predictions)
+
+        proximities = proximities.sum(axis=1).max(axis=1).ravel()
+        proximities[numpy.isnan(proximities)] = float('-inf')
+
+        assert proximities.shape == (predictions.shape[0],)
+        return proximities
 
     def recommend(self, ids: Sequence[int],
                   predictions: numpy.ndarray,
@@ -337,36 +828,37 @@ class EntropyRecommender(Recommender):
         Sequence[int]
             IDs of the instances to label.
         """
-        if predictions.shape[1] != 1:
-            raise ValueError('Uncertainty sampling must have one predictor')
-
         assert len(ids) == predictions.shape[0]
-
-        with warnings.catch_warnings():
-            warnings.filterwarnings(action='ignore', category=RuntimeWarning)
-            proximities = -predictions * numpy.log(predictions)
-
-        proximities = proximities.sum(axis=1).max(axis=1).ravel()
-        proximities[numpy.isnan(proximities)] = float('-inf')
-
-        assert proximities.shape == (len(ids),)
-
-        indices = choose_boltzmann(self._db.read_features(ids), proximities, n,
-                                   temperature=diversity * 2)
-        return [ids[i] for i in indices]
+        scores = self._weight(ids, self.score(predictions))
+        return self._choose(ids, scores, n, diversity)
 
 
 class MarginRecommender(Recommender):
     """Recommends instances by margin-based uncertainty sampling."""
 
-    def __init__(self, db: acton.database.Database):
-        """
+    def score(self, predictions: numpy.ndarray) -> numpy.ndarray:
+        """Scores instances by the margin between their two likeliest labels.
+
         Parameters
         ----------
-        db
-            Features database.
+        predictions
+            N x 1 x C array of predictions.
+
+        Returns
+        -------
+        numpy.ndarray
+            N array of scores.
         """
-        self._db = db
+        if predictions.shape[1] != 1:
+            raise ValueError('Uncertainty sampling must have one predictor')
+
+        # x* = argmin p(y1^ | x) - p(y2^ | x) where yn^ = argmax p(yn | x)
+        # (Settles 2009).
+        partitioned = numpy.partition(predictions, -2, axis=2)
+        most_likely = partitioned[:, 0, -1]
+        second_most_likely = partitioned[:, 0, -2]
+        assert most_likely.shape == (predictions.shape[0],)
+        return 1 - (most_likely - second_most_likely)
 
     def recommend(self, ids: Sequence[int],
                   predictions: numpy.ndarray,
@@ -394,22 +886,9 @@ class MarginRecommender(Recommender):
         Sequence[int]
             IDs of the instances to label.
         """
-        if predictions.shape[1] != 1:
-            raise ValueError('Uncertainty sampling must have one predictor')
-
         assert len(ids) == predictions.shape[0]
-
-        # x* = argmin p(y1^ | x) - p(y2^ | x) where yn^ = argmax p(yn | x)
-        # (Settles 2009).
-        partitioned = numpy.partition(predictions, -2, axis=2)
-        most_likely = partitioned[:, 0, -1]
-        second_most_likely = partitioned[:, 0, -2]
-        assert most_likely.shape == (len(ids),)
-        scores = 1 - (most_likely - second_most_likely)
-
-        indices = choose_boltzmann(self._db.read_features(ids), scores, n,
-                                   temperature=diversity * 2)
-        return [ids[i] for i in indices]
+        scores = self._weight(ids, self.score(predictions))
+        return self._choose(ids, scores, n, diversity)
 
 
 # For safe string-based access to recommender classes.
@@ -40,6 +40,7 @@ setup(
             'acton-predict=acton.cli:predict',
             'acton-recommend=acton.cli:recommend',
             'acton-label=acton.cli:label',
+            'acton-layout=acton.cli:layout',
         ]
     },
     include_package_data=True,
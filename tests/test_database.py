@@ -10,9 +10,12 @@ Tests for `database` module.
 import os.path
 import logging
 import tempfile
+import time
 import unittest
+import unittest.mock
 
 from acton import database
+import h5py
 import numpy
 
 
@@ -113,3 +116,401 @@ class TestManagedHDF5Database(unittest.TestCase):
             self.assertTrue(numpy.allclose(
                 new_labels,
                 db.read_labels(labeller_ids, ids)))
+
+    def test_write_features_blocks(self):
+        """ManagedHDF5Database writes unsorted, gappy, and repeated IDs."""
+        path = self.temp_path('test_write_features_blocks.h5')
+        ids = [7, 2, 3, 4, 10, 3, 0]
+        features = numpy.arange(len(ids) * 2, dtype='float32').reshape((-1, 2))
+        with database.ManagedHDF5Database(path) as db:
+            db.write_features(ids, features)
+            self.assertEqual(
+                [0, 2, 3, 4, 7, 10], sorted(db.get_known_instance_ids()))
+
+        with h5py.File(path, 'r') as h5_file:
+            stored = h5_file['features'][()]
+        self.assertEqual((11, 2), stored.shape)
+        # The last write of a repeated ID wins.
+        self.assertTrue(numpy.allclose(features[5], stored[3]))
+        for id_, feature in zip([7, 2, 4, 10, 0], features[[0, 1, 3, 4, 6]]):
+            self.assertTrue(numpy.allclose(feature, stored[id_]))
+
+    @unittest.skipUnless(os.environ.get('ACTON_BENCHMARK'),
+                         'Set ACTON_BENCHMARK to run benchmarks.')
+    def test_write_labels_benchmark(self):
+        """Block-wise label writes are faster than element-wise writes."""
+        n_labellers = 3
+        n_instances = 500
+        labeller_ids = list(range(n_labellers))
+        ids = list(range(n_instances))
+        numpy.random.shuffle(ids)
+        labels = numpy.random.random(
+            size=(n_labellers, n_instances, 1)).astype('float32')
+
+        # Element-wise writes, as ManagedHDF5Database used to do them.
+        with h5py.File(self.temp_path('elementwise.h5'), 'w') as h5_file:
+            labels_h5 = h5_file.create_dataset(
+                'labels', shape=(n_labellers, n_instances, 1),
+                dtype='float32', maxshape=(None, None, None))
+            then = time.perf_counter()
+            for labeller_idx, labeller_id in enumerate(labeller_ids):
+                for instance_idx, instance_id in enumerate(ids):
+                    labels_h5[labeller_id, instance_id, :] = labels[
+                        labeller_idx, instance_idx]
+            elementwise_time = time.perf_counter() - then
+
+        with database.ManagedHDF5Database(self.temp_path('blocks.h5')) as db:
+            then = time.perf_counter()
+            db.write_labels(labeller_ids, ids, labels)
+            block_time = time.perf_counter() - then
+
+        logging.info('Element-wise: {:.3f} s; block-wise: {:.3f} s.'.format(
+            elementwise_time, block_time))
+        self.assertLess(block_time, elementwise_time)
+
+        with h5py.File(self.temp_path('blocks.h5'), 'r') as h5_file:
+            stored = h5_file['labels'][()]
+        self.assertTrue(numpy.allclose(labels[:, numpy.argsort(ids)], stored))
+
+    def test_read_repeated_ids(self):
+        """ManagedHDF5Database reads unsorted and repeated IDs."""
+        path = self.temp_path('test_read_repeated_ids.h5')
+        n_instances = 50
+        features = numpy.random.random(size=(n_instances, 3)).astype('float32')
+        labels = numpy.random.random(
+            size=(2, n_instances, 1)).astype('float32')
+        with database.ManagedHDF5Database(path) as db:
+            db.write_features(list(range(n_instances)), features)
+            db.write_labels([0, 1], list(range(n_instances)), labels)
+
+        ids = [49, 3, 3, 0, 17, 49, 2]
+        with database.ManagedHDF5Database(path) as db:
+            self.assertTrue(numpy.allclose(features[ids],
+                                           db.read_features(ids)))
+            self.assertTrue(numpy.allclose(labels[[1, 0]][:, ids],
+                                           db.read_labels([1, 0], ids)))
+            self.assertEqual((0, 3), db.read_features([]).shape)
+
+    def test_known_ids(self):
+        """ManagedHDF5Database indexes known IDs across writes and opens."""
+        path = self.temp_path('test_known_ids.h5')
+        features = numpy.zeros((3, 2), dtype='float32')
+        labels = numpy.zeros((1, 2, 1), dtype='float32')
+        with database.ManagedHDF5Database(path) as db:
+            db.write_features([5, 1, 3], features)
+            db.write_labels([2], [1, 8], labels)
+            self.assertEqual([1, 3, 5, 8], db.get_known_instance_ids())
+
+        with database.ManagedHDF5Database(path) as db:
+            self.assertEqual([1, 3, 5, 8], db.get_known_instance_ids())
+            self.assertEqual([2], db.get_known_labeller_ids())
+            self.assertEqual(
+                [False, True, False, True, True, False],
+                db.has_instance_ids([0, 1, 2, 3, 8, 100]).tolist())
+            self.assertEqual([True, False],
+                             db.has_labeller_ids([2, 0]).tolist())
+            with h5py.File(path, 'r') as h5_file:
+                self.assertEqual(4, h5_file['instance_ids'].shape[0])
+
+    def test_known_ids_growth(self):
+        """ManagedHDF5Database grows its ID index geometrically."""
+        path = self.temp_path('test_known_ids_growth.h5')
+        with database.ManagedHDF5Database(path) as db:
+            lengths = set()
+            for id_ in range(1, 200):
+                db.write_features([id_], numpy.zeros((1, 2), dtype='float32'))
+                lengths.add(len(db._known_ids['instance_ids']))
+            # One resize per doubling.
+            self.assertLessEqual(len(lengths), 9)
+            self.assertEqual(list(range(1, 200)), db.get_known_instance_ids())
+            self.assertEqual([True, False],
+                             db.has_instance_ids([199, 200]).tolist())
+
+    def test_layout_options(self):
+        """ManagedHDF5Database records its layout options in the file."""
+        path = self.temp_path('test_layout_options.h5')
+        with database.ManagedHDF5Database(
+                path, layout='column', chunk_rows=16,
+                compression='gzip', shuffle=True) as db:
+            db.write_features([0, 1, 2], numpy.zeros((3, 4), dtype='float32'))
+            db.write_labels([0], [0, 1], numpy.zeros((1, 2, 1),
+                                                     dtype='float32'))
+
+        with h5py.File(path, 'r') as h5_file:
+            self.assertEqual('column', h5_file.attrs['layout'])
+            self.assertEqual(16, h5_file.attrs['chunk_rows'])
+            self.assertEqual((16, 1), h5_file['features'].chunks)
+            self.assertEqual('gzip', h5_file['features'].compression)
+            self.assertTrue(h5_file['features'].shuffle)
+            self.assertEqual((1, 16, 1), h5_file['labels'].chunks)
+
+        with database.ManagedHDF5Database(path) as db:
+            self.assertEqual('column', db.layout)
+            self.assertEqual(16, db.chunk_rows)
+
+        with self.assertRaises(ValueError):
+            with database.ManagedHDF5Database(path, layout='row'):
+                pass
+
+    def test_recommend_layout(self):
+        """recommend_layout recommends one of the benchmarked layouts."""
+        layouts = [{'layout': 'row', 'chunk_rows': 8},
+                   {'layout': 'column', 'chunk_rows': 8}]
+        layout = database.recommend_layout(100, 3, layouts=layouts, n_reads=2)
+        self.assertIn(layout, layouts)
+
+
+class TestHDF5Reader(unittest.TestCase):
+    """Tests the HDF5Reader class."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_str.h5'))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_read_unsorted_ids(self):
+        """HDF5Reader reads unsorted and repeated IDs."""
+        ids = [33, 2, 2, 0, 17, 33]
+        with h5py.File(self.path, 'r') as h5_file:
+            features = h5_file['features'][()]
+            labels = h5_file['labels'][()]
+
+        with database.HDF5Reader(self.path, ['features'], 'labels',
+                                 encode_labels=False) as reader:
+            self.assertTrue(numpy.allclose(features[ids],
+                                           reader.read_features(ids)))
+            self.assertEqual(labels[ids].tolist(),
+                             reader.read_labels([0], ids).ravel().tolist())
+
+    def test_read_feature_columns(self):
+        """HDF5Reader reads features stored one column per dataset."""
+        path = os.path.join(self.tempdir.name, 'columns.h5')
+        features = numpy.random.random(size=(40, 3))
+        with h5py.File(path, 'w') as h5_file:
+            for col in range(3):
+                h5_file.create_dataset('col{}'.format(col),
+                                       data=features[:, col])
+            h5_file.create_dataset('labels', data=numpy.arange(40) % 2)
+
+        ids = [39, 5, 5, 0, 12]
+        with database.HDF5Reader(path, ['col2', 'col0'], 'labels') as reader:
+            self.assertTrue(numpy.allclose(features[ids][:, [2, 0]],
+                                           reader.read_features(ids)))
+
+    def test_feature_cache(self):
+        """HDF5Reader reads features from a packed sidecar file."""
+        path = os.path.join(self.tempdir.name, 'columns.h5')
+        cache_path = os.path.join(self.tempdir.name, 'columns.features.h5')
+        features = numpy.random.random(size=(40, 3))
+        with h5py.File(path, 'w') as h5_file:
+            for col in range(3):
+                h5_file.create_dataset('col{}'.format(col),
+                                       data=features[:, col])
+            h5_file.create_dataset('labels', data=numpy.arange(40) % 2)
+
+        ids = [39, 5, 5, 0, 12]
+        feature_cols = ['col2', 'col0']
+        with database.HDF5Reader(path, feature_cols, 'labels',
+                                 feature_cache=cache_path) as reader:
+            self.assertTrue(numpy.allclose(features[ids][:, [2, 0]],
+                                           reader.read_features(ids)))
+        with h5py.File(cache_path, 'r') as cache_file:
+            self.assertEqual((40, 2), cache_file['features'].shape)
+
+        # The sidecar is reused while the columns are unchanged...
+        mtime = os.stat(cache_path).st_mtime_ns
+        with database.HDF5Reader(path, feature_cols, 'labels',
+                                 feature_cache=cache_path) as reader:
+            reader.read_features(ids)
+        self.assertEqual(mtime, os.stat(cache_path).st_mtime_ns)
+
+        # ...and rebuilt when they change.
+        with database.HDF5Reader(path, ['col1'], 'labels',
+                                 feature_cache=cache_path) as reader:
+            self.assertTrue(numpy.allclose(features[ids][:, [1]],
+                                           reader.read_features(ids)))
+
+    @unittest.skipUnless(os.environ.get('ACTON_BENCHMARK'),
+                         'Set ACTON_BENCHMARK to run benchmarks.')
+    def test_read_benchmark(self):
+        """Benchmarks HDF5Reader reads of 1e5 to 1e7 IDs."""
+        path = os.path.join(self.tempdir.name, 'benchmark.h5')
+        n_instances = 10 ** 7
+        with h5py.File(path, 'w') as h5_file:
+            h5_file.create_dataset(
+                'features', data=numpy.random.random(size=(n_instances, 4)))
+            h5_file.create_dataset(
+                'labels', data=numpy.random.randint(2, size=n_instances))
+
+        with database.HDF5Reader(path, ['features'], 'labels') as reader:
+            for n_ids in [10 ** 5, 10 ** 6, 10 ** 7]:
+                ids = numpy.random.randint(n_instances, size=n_ids)
+                then = time.perf_counter()
+                reader.read_features(ids)
+                reader.read_labels([0], ids)
+                logging.info('Read {} IDs in {:.3f} s.'.format(
+                    n_ids, time.perf_counter() - then))
+
+
+class TestASCIIReader(unittest.TestCase):
+    """Tests the ASCIIReader class."""
+
+    def setUp(self):
+        self.path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_str.txt'))
+
+    def test_chunked(self):
+        """ASCIIReader reads the same table whether or not it is chunked."""
+        with database.ASCIIReader(self.path, [], 'label') as reader:
+            ids = reader.get_known_instance_ids()
+            features = reader.read_features(ids)
+            labels = reader.read_labels([0], ids)
+
+        # The table is about 2 KB, so this parses it in several chunks.
+        with database.ASCIIReader(self.path, [], 'label',
+                                  chunk_size=500) as reader:
+            self.assertEqual(ids, reader.get_known_instance_ids())
+            self.assertTrue(numpy.allclose(
+                features, reader.read_features(ids)))
+            self.assertTrue(numpy.array_equal(
+                labels, reader.read_labels([0], ids)))
+
+    def test_chunked_failure(self):
+        """ASCIIReader cleans up if a chunked conversion fails."""
+        with tempfile.TemporaryDirectory() as scratch:
+            with unittest.mock.patch.object(
+                    database.tempfile, 'tempdir', scratch), \
+                    unittest.mock.patch.object(
+                        database.ASCIIReader, '_db_from_ascii_chunks',
+                        side_effect=ValueError('Bad chunk.')):
+                with self.assertRaises(ValueError):
+                    with database.ASCIIReader(self.path, [], 'label',
+                                              chunk_size=500):
+                        pass
+            self.assertEqual([], os.listdir(scratch))
+
+    def test_cache(self):
+        """ASCIIReader reuses cached conversions of unchanged tables."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with database.ASCIIReader(self.path, [], 'label',
+                                      cache_dir=cache_dir) as reader:
+                ids = reader.get_known_instance_ids()
+                features = reader.read_features(ids)
+                labels = reader.read_labels([0], ids)
+                classes = reader.label_encoder.classes_
+
+            with unittest.mock.patch.object(
+                    database.io_ascii, 'read',
+                    side_effect=AssertionError('Table was parsed again.')):
+                with database.ASCIIReader(self.path, [], 'label',
+                                          cache_dir=cache_dir) as reader:
+                    self.assertTrue(numpy.allclose(
+                        features, reader.read_features(ids)))
+                    self.assertTrue(numpy.array_equal(
+                        labels, reader.read_labels([0], ids)))
+                    self.assertEqual(list(classes),
+                                     list(reader.label_encoder.classes_))
+                    # Entries are shared, so they're opened read-only and a
+                    # second reader can open the same entry at once.
+                    self.assertEqual('r', reader._db._h5_file.mode)
+                    with database.ASCIIReader(self.path, [], 'label',
+                                              cache_dir=cache_dir) as other:
+                        self.assertTrue(numpy.allclose(
+                            features, other.read_features(ids)))
+                    self.assertTrue(numpy.allclose(
+                        features, reader.read_features(ids)))
+
+            # A different column selection is a different entry. The cache is
+            # too small for both, so the older entry is evicted.
+            with database.ASCIIReader(self.path, ['col0'], 'label',
+                                      cache_dir=cache_dir,
+                                      cache_max_bytes=1):
+                pass
+            entries = [f for f in os.listdir(cache_dir) if f.endswith('.h5')]
+            self.assertEqual(1, len(entries))
+
+
+class TestPandasReader(unittest.TestCase):
+    """Tests the PandasReader class."""
+
+    def setUp(self):
+        self.path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas_str.h5'))
+
+    def test_read(self):
+        """PandasReader reads features and labels by ID."""
+        ids = [5, 0, 5, 33]
+        with database.PandasReader(self.path, [], 'label',
+                                   'classification') as reader:
+            df = reader._df
+            features = reader.read_features(ids)
+            labels = reader.read_labels([0], ids)
+
+        self.assertEqual((4, 3), features.shape)
+        for row, id_ in enumerate(ids):
+            self.assertTrue(numpy.allclose(
+                df.iloc[id_][['col0', 'col1', 'col2']].astype(float),
+                features[row]))
+        self.assertEqual((1, 4, 1), labels.shape)
+        self.assertEqual(labels[0, 0, 0], labels[0, 2, 0])
+        self.assertEqual(
+            list(df['label'].iloc[ids]),
+            list(reader.label_encoder.inverse_transform(labels.ravel())))
+
+
+class TestFITSReader(unittest.TestCase):
+    """Tests the FITSReader class."""
+
+    def setUp(self):
+        self.path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification.fits'))
+
+    def test_memmap(self):
+        """FITSReader reads the same features with and without memmap."""
+        feature_cols = ['col{}'.format(i) for i in range(20)]
+        ids = [3, 1, 1, 20, 21, 22]
+        with database.FITSReader(self.path, feature_cols, 'col20',
+                                 memmap=False) as reader:
+            features = reader.read_features(ids)
+            range_features = reader.read_features(list(range(5, 10)))
+            self.assertTrue(reader._features.flags.owndata)
+
+        # By default, astropy decides whether to memory-map the file.
+        with database.FITSReader(self.path, feature_cols, 'col20') as reader:
+            self.assertTrue(numpy.allclose(
+                features, reader.read_features(ids)))
+            self.assertFalse(reader._features.flags.owndata)
+
+        with database.FITSReader(self.path, feature_cols, 'col20',
+                                 memmap=True) as reader:
+            self.assertTrue(numpy.allclose(
+                features, reader.read_features(ids)))
+            self.assertTrue(numpy.allclose(
+                range_features, reader.read_features(list(range(5, 10)))))
+            # Adjacent columns of the same type are viewed, not copied.
+            self.assertFalse(reader._features.flags.owndata)
+
+        # Non-adjacent columns can't be viewed, so they are copied.
+        with database.FITSReader(self.path, ['col5', 'col2'], 'col20',
+                                 memmap=True) as reader:
+            self.assertTrue(numpy.allclose(features[:, [5, 2]],
+                                           reader.read_features(ids)))
+
+    def test_encoded_labels(self):
+        """FITSReader encodes labels once as small integers."""
+        with database.FITSReader(self.path, [], 'col20') as reader:
+            labels = reader.read_labels([0], [0, 1, 2, 0])
+            self.assertEqual((1, 4, 1), labels.shape)
+            self.assertEqual(numpy.uint8, labels.dtype)
+            self.assertEqual(labels[0, 0, 0], labels[0, 3, 0])
+            # Encodings don't depend on which labels are read together.
+            for id_ in range(3):
+                self.assertEqual(labels[0, id_, 0],
+                                 reader.read_labels([0], [id_])[0, 0, 0])
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+"""
+test_index
+----------------------------------
+
+Tests for `index` module.
+"""
+
+import os.path
+import tempfile
+import unittest
+import unittest.mock
+
+import acton.database
+import acton.index
+import acton.recommenders
+import h5py
+import numpy
+
+
+class TestFeatureIndex(unittest.TestCase):
+    """Tests the FeatureIndex class."""
+
+    def setUp(self):
+        self.ids = numpy.arange(500) * 3
+        self.features = numpy.random.random(size=(500, 4))
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db = acton.database.ManagedHDF5Database(
+            os.path.join(self.tempdir.name, 'features.h5'),
+            feature_dtype='float64')
+        self.db.__enter__()
+        self.db.write_features(self.ids, self.features)
+        self.index = acton.index.FeatureIndex.build(self.db, self.ids,
+                                                    n_lists=10)
+
+    def tearDown(self):
+        self.db.__exit__(None, None, None)
+        self.tempdir.cleanup()
+
+    def brute_force(self, queries, k):
+        dists = numpy.linalg.norm(
+            queries[:, None, :] - self.features[None, :, :], axis=2)
+        nearest = numpy.argsort(dists, axis=1)[:, :k]
+        return (numpy.take_along_axis(dists, nearest, axis=1),
+                self.ids[nearest])
+
+    def test_query_exact(self):
+        """FeatureIndex finds exact neighbours when probing every list."""
+        queries = numpy.random.random(size=(20, 4))
+        dists, ids = self.index.query(queries, k=5, n_probe=10)
+        expected_dists, expected_ids = self.brute_force(queries, 5)
+        self.assertEqual(expected_ids.tolist(), ids.tolist())
+        self.assertTrue(numpy.allclose(expected_dists, dists, atol=1e-6))
+
+    def test_query_approximate(self):
+        """FeatureIndex finds most neighbours when probing some lists."""
+        queries = numpy.random.random(size=(100, 4))
+        _, ids = self.index.query(queries, k=5, n_probe=3)
+        _, expected_ids = self.brute_force(queries, 5)
+        recall = numpy.mean([len(set(a) & set(b)) / 5
+                             for a, b in zip(ids, expected_ids)])
+        self.assertGreater(recall, 0.8)
+
+    def test_query_too_few(self):
+        """FeatureIndex pads queries with too few neighbours."""
+        dists, ids = self.index.query(self.features[:1], k=600, n_probe=10)
+        self.assertEqual((1, 600), ids.shape)
+        self.assertEqual([-1] * 100, ids[0, 500:].tolist())
+        self.assertTrue(numpy.isinf(dists[0, 500:]).all())
+
+    def test_add(self):
+        """FeatureIndex adds and updates instances incrementally."""
+        self.db.write_features([1, 3], numpy.array([[0.5, 0.5, 0.5, 0.5],
+                                                    [2, 2, 2, 2]]))
+        self.index.add([1, 3])
+        self.assertEqual(501, len(self.index))
+        self.assertEqual([True, True, False],
+                         self.index.contains([1, 3, 2]).tolist())
+        dists, ids = self.index.query([[2, 2, 2, 2], [0.5, 0.5, 0.5, 0.5]],
+                                      k=1)
+        self.assertEqual([3, 1], ids[:, 0].tolist())
+        self.assertTrue(numpy.allclose(0, dists))
+        with self.assertRaises(KeyError):
+            self.index.density([2])
+
+    def test_reads_database(self):
+        """FeatureIndex reads features from its database when queried."""
+        with unittest.mock.patch.object(
+                self.db, 'read_features', wraps=self.db.read_features) as read:
+            self.index.query(self.features[:1], k=5, n_probe=2)
+        # Only the members of the two probed lists are read.
+        self.assertEqual(2, read.call_count)
+        n_read = sum(len(call[0][0]) for call in read.call_args_list)
+        self.assertLess(n_read, len(self.ids))
+
+    def test_density(self):
+        """FeatureIndex finds outliers less dense than other instances."""
+        self.db.write_features([1], numpy.full((1, 4), 10.0))
+        self.index.add([1])
+        densities = self.index.density([0, 1])
+        self.assertGreater(densities[0], densities[1])
+
+    def test_density_scale(self):
+        """FeatureIndex densities don't depend on the scale of features."""
+        densities = self.index.density(self.ids)
+        self.assertAlmostEqual(0.5, numpy.median(densities), places=2)
+        with acton.database.ManagedHDF5Database(
+                os.path.join(self.tempdir.name, 'scaled.h5'),
+                feature_dtype='float64') as db:
+            db.write_features(self.ids, self.features * 1000)
+            scaled = acton.index.FeatureIndex(
+                db, self.index.centroids * 1000, self.ids)
+            self.assertTrue(numpy.allclose(densities,
+                                           scaled.density(self.ids)))
+
+    def test_save_load(self):
+        """FeatureIndex can be saved and loaded with its densities."""
+        path = os.path.join(self.tempdir.name, 'index.h5')
+        densities = self.index.density(self.ids)
+        self.index.save(path)
+        # Feature vectors stay in the database.
+        with h5py.File(path, 'r') as index_file:
+            self.assertEqual({'centroids', 'ids', 'lists', 'densities'},
+                             set(index_file))
+        index = acton.index.FeatureIndex.load(path, self.db)
+        self.assertEqual(self.ids.tolist(), index.ids.tolist())
+        with unittest.mock.patch.object(index, 'query') as query:
+            self.assertTrue(numpy.allclose(densities,
+                                           index.density(self.ids)))
+            query.assert_not_called()
+
+    def test_from_database(self):
+        """FeatureIndex is built beside a database, then updated."""
+        db_path = os.path.join(self.tempdir.name, 'db.h5')
+        index_path = os.path.join(self.tempdir.name, 'db.index.h5')
+        with acton.database.ManagedHDF5Database(db_path) as db:
+            db.write_features(self.ids, self.features)
+
+        with acton.database.ManagedHDF5Database(db_path,
+                                                read_only=True) as db:
+            index = acton.index.FeatureIndex.from_database(
+                db, index_path, ids=self.ids[:400])
+            self.assertEqual(400, len(index))
+
+            with unittest.mock.patch.object(
+                    db, 'read_features', wraps=db.read_features) as read:
+                index = acton.index.FeatureIndex.from_database(db, index_path)
+                self.assertEqual(self.ids[400:].tolist(),
+                                 list(read.call_args[0][0]))
+            self.assertEqual(500, len(index))
+            self.assertEqual(
+                500, len(acton.index.FeatureIndex.load(index_path, db)))
+
+    def test_from_database_stale(self):
+        """FeatureIndex is rebuilt if the database changes."""
+        db_path = os.path.join(self.tempdir.name, 'db.h5')
+        index_path = os.path.join(self.tempdir.name, 'db.index.h5')
+        with acton.database.ManagedHDF5Database(
+                db_path, feature_dtype='float64') as db:
+            db.write_features(self.ids, self.features)
+            acton.index.FeatureIndex.from_database(db, index_path)
+            db.write_features(self.ids[:1], numpy.full((1, 4), 5.0))
+
+        with acton.database.ManagedHDF5Database(db_path,
+                                                read_only=True) as db:
+            index = acton.index.FeatureIndex.from_database(db, index_path)
+            dists, ids = index.query([[5, 5, 5, 5]], k=1, n_probe=1)
+        self.assertEqual(self.ids[0], ids[0, 0])
+        self.assertEqual(0, dists[0, 0])
+
+
+class TestDensityWeighting(unittest.TestCase):
+    """Tests recommenders weighted by density."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_recommend(self):
+        """Recommenders prefer dense instances with density weighting."""
+        ids = numpy.arange(100)
+        features = numpy.random.normal(size=(100, 2))
+        features[0] = 100
+        with acton.database.ManagedHDF5Database(
+                os.path.join(self.tempdir.name, 'features.h5')) as db:
+            db.write_features(ids, features)
+            index = acton.index.FeatureIndex.build(db, ids)
+            # Densities are cached, so the database isn't read again.
+            index.density(ids)
+        # The outlier is the most uncertain instance.
+        predictions = numpy.full((100, 1, 2), 0.1)
+        predictions[:, 0, 1] = 0.9
+        predictions[0] = 0.5
+        predictions[1:11, 0] = [0.4, 0.6]
+
+        db = unittest.mock.Mock()
+        ur = acton.recommenders.UncertaintyRecommender(db)
+        self.assertEqual([0], ur.recommend(ids, predictions, diversity=0))
+        ur = acton.recommenders.UncertaintyRecommender(
+            db, index=index, density_weight=1)
+        self.assertNotEqual([0], ur.recommend(ids, predictions, diversity=0))
+        db.read_features.assert_not_called()
+
+    def test_requires_index(self):
+        """Density weighting requires an index."""
+        with self.assertRaises(ValueError):
+            acton.recommenders.UncertaintyRecommender(None, density_weight=1)
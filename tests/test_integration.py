@@ -14,6 +14,8 @@ import unittest.mock
 
 import acton.cli
 import acton.database
+import acton.labellers
+import acton.predictors
 import acton.proto.io
 import acton.proto.wrappers
 import acton.proto.acton_pb2
@@ -249,6 +251,165 @@ class TestIntegration(unittest.TestCase):
                 2, len(protos),
                 msg='Expected 2 protobufs; found {}'.format(len(protos)))
 
+    def test_classification_candidate_pool(self):
+        """Acton recommends from a subsampled candidate pool."""
+        pandas_path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas.h5'))
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(
+                acton.cli.main,
+                ['--data', pandas_path,
+                 '-o', 'candidates.pb',
+                 '--recommender', 'UncertaintyRecommender',
+                 '--predictor', 'LogisticRegression',
+                 '--epochs', '2',
+                 '--label', 'col20',
+                 '--pandas-key', 'classification',
+                 '--candidate-pool-size', '0.5',
+                 '--candidate-sampling', 'systematic'])
+
+            if result.exit_code != 0:
+                raise result.exception
+
+            self.assertEqual(
+                b'UncertaintyRecommender | LogisticRegression | '
+                b'0.5 candidates (systematic)',
+                acton.proto.io.read_metadata('candidates.pb'))
+
+            reader = acton.proto.io.read_protos(
+                'candidates.pb', acton.proto.acton_pb2.Predictions)
+
+            protos = list(reader)
+
+            self.assertEqual(
+                2, len(protos),
+                msg='Expected 2 protobufs; found {}'.format(len(protos)))
+
+    def test_classification_streaming(self):
+        """Acton streams recommendations over chunks of the pool."""
+        pandas_path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas.h5'))
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(
+                acton.cli.main,
+                ['--data', pandas_path,
+                 '-o', 'streaming.pb',
+                 '--recommender', 'UncertaintyRecommender',
+                 '--predictor', 'LogisticRegression',
+                 '--epochs', '2',
+                 '--label', 'col20',
+                 '--pandas-key', 'classification',
+                 '--chunk-size', '16'])
+
+            if result.exit_code != 0:
+                raise result.exception
+
+            reader = acton.proto.io.read_protos(
+                'streaming.pb', acton.proto.acton_pb2.Predictions)
+
+            protos = list(reader)
+
+            self.assertEqual(
+                2, len(protos),
+                msg='Expected 2 protobufs; found {}'.format(len(protos)))
+
+    def test_classification_query_batch(self):
+        """Acton labels each batch of recommendations with one query."""
+        pandas_path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas.h5'))
+        query_batch = acton.labellers.DatabaseLabeller.query_batch
+        with self.runner.isolated_filesystem(), unittest.mock.patch.object(
+                acton.labellers.DatabaseLabeller, 'query_batch',
+                autospec=True, side_effect=query_batch) as mock:
+            result = self.runner.invoke(
+                acton.cli.main,
+                ['--data', pandas_path,
+                 '-o', 'query_batch.pb',
+                 '--recommender', 'RandomRecommender',
+                 '--predictor', 'LogisticRegression',
+                 '--epochs', '2',
+                 '--initial-count', '5',
+                 '--label', 'col20',
+                 '--pandas-key', 'classification'])
+
+            if result.exit_code != 0:
+                raise result.exception
+
+            self.assertEqual(2, mock.call_count)
+            self.assertEqual(5, len(mock.call_args_list[0][0][1]))
+
+    def test_classification_diversity(self):
+        """Acton makes diverse batches of recommendations."""
+        pandas_path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas.h5'))
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(
+                acton.cli.main,
+                ['--data', pandas_path,
+                 '-o', 'diversity.pb',
+                 '--recommender', 'UncertaintyRecommender',
+                 '--predictor', 'LogisticRegression',
+                 '--epochs', '2',
+                 '--label', 'col20',
+                 '--pandas-key', 'classification',
+                 '--recommendation-count', '5',
+                 '--selection', 'kcenter',
+                 '--diversity', '0.8'])
+
+            if result.exit_code != 0:
+                raise result.exception
+
+            self.assertEqual(
+                b'UncertaintyRecommender | LogisticRegression | '
+                b'kcenter selection (diversity 0.8)',
+                acton.proto.io.read_metadata('diversity.pb'))
+
+            reader = acton.proto.io.read_protos(
+                'diversity.pb', acton.proto.acton_pb2.Predictions)
+
+            protos = list(reader)
+
+            self.assertEqual(
+                2, len(protos),
+                msg='Expected 2 protobufs; found {}'.format(len(protos)))
+
+    def test_classification_index(self):
+        """Acton weights recommendations by density from an index."""
+        pandas_path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas.h5'))
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(
+                acton.cli.main,
+                ['--data', pandas_path,
+                 '-o', 'index.pb',
+                 '--recommender', 'UncertaintyRecommender',
+                 '--predictor', 'LogisticRegression',
+                 '--epochs', '2',
+                 '--label', 'col20',
+                 '--pandas-key', 'classification',
+                 '--selection', 'kcenter',
+                 '--index', 'features.index.h5',
+                 '--density-weight', '1'])
+
+            if result.exit_code != 0:
+                raise result.exception
+
+            self.assertTrue(os.path.exists('features.index.h5'))
+
+            reader = acton.proto.io.read_protos(
+                'index.pb', acton.proto.acton_pb2.Predictions)
+
+            protos = list(reader)
+
+            self.assertEqual(
+                2, len(protos),
+                msg='Expected 2 protobufs; found {}'.format(len(protos)))
+
     def test_classification_passive_fits(self):
         """Acton handles a passive classification task with a FITS table."""
         fits_path = os.path.realpath(
@@ -349,6 +510,13 @@ class TestComponentCLI(unittest.TestCase):
     def setUp(self):
         self.runner = CliRunner()
 
+    def test_recommend_diversity_range(self):
+        """acton-recommend rejects diversities outside [0, 1]."""
+        result = self.runner.invoke(acton.cli.recommend,
+                                    ['--diversity', '1.5'])
+        self.assertEqual(2, result.exit_code)
+        self.assertIn('must be in [0, 1]', result.output)
+
     def test_label_args(self):
         """acton-label takes arguments and outputs a protobuf."""
         db_path = os.path.realpath(
@@ -467,6 +635,65 @@ class TestComponentCLI(unittest.TestCase):
                 'encode_labels': True,
             }, output_db_kwargs)
 
+    def test_predict_chunked(self):
+        """acton-predict makes the same predictions in chunks."""
+        db_path = os.path.realpath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         'data', 'classification_pandas.h5'))
+
+        with self.runner.isolated_filesystem():
+            db_kwargs = {
+                'feature_cols': ['col10', 'col11'],
+                'label_col': 'col20',
+                'key': 'classification',
+                'encode_labels': True,
+            }
+            with acton.database.PandasReader(db_path, **db_kwargs) as db:
+                proto = acton.proto.wrappers.LabelPool.make(
+                    ids=[1, 2, 3],
+                    db=db)
+            proto = proto.proto.SerializeToString()
+            length = struct.pack('<Q', len(proto))
+
+            predictions = []
+            predict_chunked = acton.predictors.predict_chunked
+            for args in [[], ['--chunk-size', '7']]:
+                with unittest.mock.patch.object(
+                        acton.predictors, 'predict_chunked',
+                        side_effect=predict_chunked) as mock:
+                    result = self.runner.invoke(
+                        acton.cli.predict, args, input=length + proto)
+
+                if result.exit_code != 0:
+                    raise result.exception
+
+                chunk_size = int(args[1]) if args else None
+                self.assertEqual(chunk_size, mock.call_args[1]['chunk_size'])
+                proto_out = result.output_bytes[8:]
+                predictions.append(
+                    acton.proto.wrappers.Predictions.deserialise(proto_out))
+
+            self.assertEqual(predictions[0].predicted_ids,
+                             predictions[1].predicted_ids)
+            self.assertGreater(len(predictions[0].predicted_ids), 7)
+            self.assertTrue(numpy.allclose(predictions[0].predictions,
+                                           predictions[1].predictions))
+
+    def test_layout(self):
+        """acton-layout prints a recommended database layout."""
+        result = self.runner.invoke(
+            acton.cli.layout,
+            ['--instances', '1000000', '--features', '3',
+             '--max-instances', '500'])
+
+        if result.exit_code != 0:
+            raise result.exception
+
+        lines = result.output.strip().split('\n')
+        self.assertEqual(['chunk_rows', 'compression', 'layout'],
+                         [line.split(': ')[0] for line in lines])
+        self.assertIn(lines[2], {'layout: row', 'layout: column'})
+
     def test_recommend(self):
         """acton-recommend takes and outputs a protobuf."""
         db_path = os.path.realpath(
@@ -49,3 +49,38 @@ ATCDFS J033126.71-285630.3|03 31 26.72|-28 56 30.3|0
         self.assertEqual(
             labeller.query(4),
             numpy.array([[0]]))
+
+    def test_query_batch(self):
+        """ASCIITableLabeller can query many IDs from a table at once."""
+        labeller = acton.labellers.ASCIITableLabeller(
+            self.path, 'name', 'is_agn')
+        ids = [4, 0, 1, 4]
+        labels = labeller.query_batch(ids)
+        self.assertEqual((1, 4, 1), labels.shape)
+        for index, id_ in enumerate(ids):
+            self.assertEqual(labeller.query(id_), labels[0, index])
+        with self.assertRaises(KeyError):
+            labeller.query_batch([0, 6])
+        self.assertEqual((1, 0, 1), labeller.query_batch([]).shape)
+
+    def test_query_batch_default(self):
+        """Labeller.query_batch stacks queries, even with no IDs."""
+        class TableLabeller(acton.labellers.Labeller):
+            def __init__(self, table_labeller):
+                self.table_labeller = table_labeller
+
+            def query(self, id_):
+                return self.table_labeller.query(id_)
+
+        labeller = TableLabeller(acton.labellers.ASCIITableLabeller(
+            self.path, 'name', 'is_agn'))
+        self.assertEqual([[[0], [1]]], labeller.query_batch([4, 0]).tolist())
+        self.assertEqual((1, 0, 1), labeller.query_batch([]).shape)
+
+    def test_lazy(self):
+        """ASCIITableLabeller can read only the ID and label columns."""
+        labeller = acton.labellers.ASCIITableLabeller(
+            self.path, 'name', 'is_agn', lazy=True)
+        self.assertEqual(['name', 'is_agn'], labeller._table.colnames)
+        self.assertEqual([1, 1, 0, 0, 0, 0],
+                         labeller.query_batch(range(6)).ravel().tolist())
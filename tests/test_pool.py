@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+test_pool
+----------------------------------
+
+Tests for `pool` module.
+"""
+
+import unittest
+
+import acton.pool
+import numpy
+
+
+class TestPool(unittest.TestCase):
+    """Tests the Pool class."""
+
+    def test_label(self):
+        """Pool tracks labelled and unlabelled IDs as instances change."""
+        pool = acton.pool.Pool([7, 3, 1, 9, 5])
+        self.assertEqual([], pool.labelled_ids.tolist())
+        self.assertEqual([1, 3, 5, 7, 9], pool.unlabelled_ids.tolist())
+
+        pool.label([9, 3])
+        pool.label([1, 3, 1])
+        self.assertEqual([1, 3, 9], pool.labelled_ids.tolist())
+        self.assertEqual([5, 7], pool.unlabelled_ids.tolist())
+        self.assertEqual([True, False],
+                         pool.is_labelled([9, 7]).tolist())
+
+        with self.assertRaises(ValueError):
+            pool.unlabelled_ids[0] = 1
+
+    def test_cached_ids(self):
+        """Pool rebuilds sorted IDs only after new instances are labelled."""
+        pool = acton.pool.Pool([3, 1, 2])
+        unlabelled_ids = pool.unlabelled_ids
+        self.assertIs(unlabelled_ids, pool.unlabelled_ids)
+        pool.label([2])
+        pool.label([2])
+        self.assertEqual([1, 3], pool.unlabelled_ids.tolist())
+        labelled_ids = pool.labelled_ids
+        pool.label([2])
+        self.assertIs(labelled_ids, pool.labelled_ids)
+
+    def test_unknown_ids(self):
+        """Pool raises KeyError for IDs not in the pool."""
+        pool = acton.pool.Pool([1, 2, 3])
+        with self.assertRaises(KeyError):
+            pool.label([4])
+        with self.assertRaises(KeyError):
+            pool.is_labelled([0])
+        with self.assertRaises(KeyError):
+            acton.pool.Pool([]).label([0])
+
+    def test_matches_sets(self):
+        """Pool agrees with set arithmetic over random batches."""
+        ids = numpy.random.choice(1000, size=300, replace=False)
+        pool = acton.pool.Pool(ids)
+        labelled = set()
+        for _ in range(10):
+            batch = numpy.random.choice(ids, size=20)
+            pool.label(batch)
+            labelled |= set(batch.tolist())
+            self.assertEqual(sorted(labelled), pool.labelled_ids.tolist())
+            self.assertEqual(sorted(set(ids.tolist()) - labelled),
+                             pool.unlabelled_ids.tolist())
+
+    def test_sample_unlabelled(self):
+        """Pool draws subsamples of the unlabelled IDs."""
+        pool = acton.pool.Pool(range(100))
+        pool.label(range(0, 100, 2))
+
+        for strategy in ['random', 'systematic']:
+            sample = pool.sample_unlabelled(10, strategy=strategy)
+            self.assertEqual(10, len(set(sample.tolist())))
+            self.assertFalse(pool.is_labelled(sample).any())
+            self.assertEqual(sorted(sample.tolist()), sample.tolist())
+
+        self.assertEqual(25, len(pool.sample_unlabelled(0.5)))
+        self.assertEqual(50, len(pool.sample_unlabelled(1000)))
+        # Systematic samples take one ID from each interval of ID order.
+        sample = pool.sample_unlabelled(5, strategy='systematic')
+        self.assertEqual([0, 1, 2, 3, 4], (sample // 20).tolist())
+        with self.assertRaises(ValueError):
+            pool.sample_unlabelled(10, strategy='unknown')
+
+    def test_sample_unlabelled_lazy(self):
+        """Pool draws small random samples without listing unlabelled IDs."""
+        pool = acton.pool.Pool(numpy.arange(10000) * 2)
+        pool.label(numpy.arange(0, 20000, 4))
+        sample = pool.sample_unlabelled(100)
+        self.assertIsNone(pool._unlabelled_ids)
+        self.assertEqual(100, len(set(sample.tolist())))
+        self.assertFalse(pool.is_labelled(sample).any())
+        self.assertEqual(sorted(sample.tolist()), sample.tolist())
+
+        # Every unlabelled ID is about as likely to be drawn.
+        counts = numpy.zeros(10000)
+        for _ in range(200):
+            counts[pool.sample_unlabelled(100) // 2] += 1
+        self.assertEqual(0, counts[::2].sum())
+        self.assertLess(abs(counts[1::2].mean() - 4), 0.1)
+        self.assertLess(counts[1::2].std(), 3)
+
+    def test_sample_unlabelled_seed(self):
+        """Pool samples are reproducible with numpy.random.seed."""
+        samples = []
+        for _ in range(2):
+            numpy.random.seed(0)
+            samples.append(acton.pool.Pool(range(1000)).sample_unlabelled(10))
+        self.assertEqual(samples[0].tolist(), samples[1].tolist())
+        rng = numpy.random.default_rng(1)
+        pool = acton.pool.Pool(range(1000), rng=rng)
+        self.assertIs(rng, pool._rng)
@@ -124,6 +124,101 @@ class TestSklearnWrapper(unittest.TestCase):
             self.assertEqual((2, 1, 2), probs.shape)
 
 
+class TestChunkedPrediction(unittest.TestCase):
+    """Tests chunked prediction."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tempdir.name, 'chunked.h5')
+        self.ids = list(range(103))
+        self.features = numpy.random.random(size=(103, 3))
+        labels = (self.features.sum(axis=1) > 1.5).astype(int)
+        with acton.database.ManagedHDF5Database(self.db_path) as db:
+            db.write_features(self.ids, self.features)
+            db.write_labels([0], self.ids, labels.reshape((1, -1, 1)))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_chunked(self):
+        """Chunked predictions match predictions made all at once."""
+        Predictor = acton.predictors.from_class(
+            sklearn.linear_model.LogisticRegression)
+        ids = self.ids[::-1]
+        with acton.database.ManagedHDF5Database(self.db_path) as db:
+            predictor = Predictor(db)
+            predictor.fit(self.ids)
+            probs, _ = predictor.predict(ids)
+
+            chunked = Predictor(db, chunk_size=10, n_jobs=2)
+            chunked.fit(self.ids)
+            chunked_probs, _ = chunked.predict(ids)
+
+        self.assertEqual((103, 1, 2), chunked_probs.shape)
+        self.assertTrue(numpy.allclose(probs, chunked_probs))
+
+
+class TestParallelCommittee(unittest.TestCase):
+    """Tests Committee with parallel and chunked members."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tempdir.name, 'committee.h5')
+        self.ids = list(range(103))
+        self.features = numpy.random.random(size=(103, 3))
+        labels = (self.features.sum(axis=1) > 1.5).astype(int)
+        with acton.database.ManagedHDF5Database(self.db_path) as db:
+            db.write_features(self.ids, self.features)
+            db.write_labels([0], self.ids, labels.reshape((1, -1, 1)))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_committee(self):
+        """Committee reads features once and runs members in parallel."""
+        Predictor = acton.predictors.from_class(
+            sklearn.linear_model.LogisticRegression)
+        with acton.database.ManagedHDF5Database(self.db_path) as db:
+            committee = acton.predictors.Committee(
+                Predictor, db, n_classifiers=4, n_jobs=2, chunk_size=10)
+            with unittest.mock.patch.object(
+                    db, 'read_features', wraps=db.read_features) as read:
+                committee.fit(self.ids)
+                self.assertEqual(1, read.call_count)
+            probs, stdevs = committee.predict(self.ids)
+
+        self.assertEqual((103, 4, 2), probs.shape)
+        self.assertEqual((103,), stdevs.shape)
+        # Members are trained on different subsets, so they disagree.
+        self.assertTrue((stdevs > 0).any())
+
+    def test_committee_score(self):
+        """Committee scores instances with one read of their features."""
+        Predictor = acton.predictors.from_class(
+            sklearn.linear_model.LogisticRegression)
+        with acton.database.ManagedHDF5Database(self.db_path) as db:
+            committee = acton.predictors.Committee(
+                Predictor, db, n_classifiers=4, n_jobs=2)
+            committee.fit(self.ids)
+            with unittest.mock.patch.object(
+                    db, 'read_features', wraps=db.read_features) as read:
+                probs, stdevs, reference = committee.score(self.ids)
+                self.assertEqual(1, read.call_count)
+
+            committee_probs, committee_stdevs = committee.predict(self.ids)
+            reference_probs, reference_stdevs = committee.reference_predict(
+                self.ids)
+            self.assertTrue(numpy.allclose(committee_probs, probs))
+            self.assertTrue(numpy.allclose(committee_stdevs, stdevs))
+            self.assertTrue(numpy.allclose(reference_probs, reference))
+            self.assertTrue(numpy.allclose(reference_stdevs, stdevs))
+
+            probs, stdevs = committee.reference_predict(
+                self.ids, compute_confidences=False)
+            self.assertTrue(numpy.allclose(reference_probs, probs))
+            self.assertIsNone(stdevs)
+
+
 class TestGPClassifier(unittest.TestCase):
     """Integration test for GPClassifier."""
 
@@ -48,3 +48,261 @@ class TestMarginRecommender(unittest.TestCase):
         mr = acton.recommenders.MarginRecommender(db)
         id_ = mr.recommend(ids, predictions=predictions)
         self.assertIn(id_[0], ids)
+
+
+class TestChooseMMR(unittest.TestCase):
+
+    def setUp(self):
+        self.features = numpy.random.random(size=(50, 3))
+        self.scores = numpy.random.random(size=50)
+
+    def brute_force_mmr(self, n, lam):
+        """Chooses n scores with MMR by directly evaluating every margin."""
+        selections = [self.scores.argmax()]
+        while len(selections) < n:
+            margins = [
+                lam * score + (1 - lam) * min(
+                    numpy.linalg.norm(self.features[i] - self.features[j])
+                    for j in selections)
+                if i not in selections else -numpy.inf
+                for i, score in enumerate(self.scores)]
+            selections.append(int(numpy.argmax(margins)))
+        return selections
+
+    def test_choose_mmr(self):
+        """choose_mmr chooses the same scores as a direct evaluation of MMR."""
+        for n in [1, 3, 12]:
+            for lam in [0.0, 0.5, 1.0]:
+                self.assertEqual(
+                    self.brute_force_mmr(n, lam),
+                    acton.recommenders.choose_mmr(
+                        self.features, self.scores, n, l=lam))
+
+    def test_choose_mmr_all(self):
+        """choose_mmr returns all scores if more are requested."""
+        selections = acton.recommenders.choose_mmr(
+            self.features, self.scores, 60)
+        self.assertEqual(list(range(50)), sorted(selections))
+
+    def test_choose_mmr_approx(self):
+        """choose_mmr_approx approximates choose_mmr."""
+        # Without approximations, the two are the same.
+        self.assertEqual(
+            acton.recommenders.choose_mmr(self.features, self.scores, 12),
+            acton.recommenders.choose_mmr_approx(
+                self.features, self.scores, 12, n_candidates=50,
+                block_size=1))
+
+        selections = acton.recommenders.choose_mmr_approx(
+            self.features, self.scores, 12, n_candidates=20, block_size=4)
+        self.assertEqual(12, len(set(selections)))
+        # Only the 20 best scores are candidates.
+        best = set(numpy.argsort(-self.scores)[:20].tolist())
+        self.assertTrue(set(selections) <= best)
+
+    def test_nearest_distance(self):
+        """MMR prefers instances far from every selection."""
+        features = numpy.array([[0.0, 0.0], [0.1, 0.0], [5.0, 0.0]])
+        scores = numpy.array([1.0, 0.9, 0.8])
+        # After choosing 0, the margins are 0.45 + 0.05 for 1 and
+        # 0.4 + 2.5 for 2. Then 1 is the only choice left.
+        self.assertEqual(
+            [0, 2, 1],
+            acton.recommenders.choose_mmr(features, scores, 3, l=0.5))
+        self.assertEqual(
+            [0, 2, 1],
+            acton.recommenders.choose_mmr_approx(
+                features, scores, 3, l=0.5, n_candidates=3, block_size=1))
+
+    def test_diversity(self):
+        """MMR spreads selections over clusters as diversity increases."""
+        # Two clusters 10 units apart. The first has all the best scores.
+        features = numpy.concatenate([
+            numpy.random.random(size=(50, 2)),
+            numpy.random.random(size=(50, 2)) + 10])
+        scores = numpy.concatenate([numpy.random.random(size=50) + 1,
+                                    numpy.random.random(size=50)])
+        for choose in [acton.recommenders.choose_mmr,
+                       acton.recommenders.choose_mmr_approx]:
+            n_far = []
+            for diversity in [0.0, 0.5, 0.9, 1.0]:
+                selections = choose(features, scores, 10, l=1 - diversity)
+                self.assertEqual(10, len(set(selections)))
+                n_far.append(sum(s >= 50 for s in selections))
+            self.assertEqual(0, n_far[0])
+            self.assertTrue(all(a <= b for a, b in zip(n_far, n_far[1:])))
+            self.assertGreaterEqual(n_far[-1], 1)
+
+
+class TestChooseBoltzmann(unittest.TestCase):
+
+    def test_zero_temperature(self):
+        """choose_boltzmann chooses the highest scores at zero temperature."""
+        scores = numpy.array([0.1, 0.9, 0.5, 0.7, 0.3])
+        self.assertEqual(
+            [1, 3, 2],
+            acton.recommenders.choose_boltzmann(None, scores, 3,
+                                                temperature=0))
+
+    def test_low_temperature(self):
+        """choose_boltzmann doesn't overflow at low temperatures."""
+        scores = numpy.array([0.1, 0.9, 0.5, 0.7, 0.3])
+        self.assertEqual(
+            [1, 3, 2],
+            acton.recommenders.choose_boltzmann(None, scores, 3,
+                                                temperature=1e-6))
+
+    def test_choose_all(self):
+        """choose_boltzmann returns all scores if more are requested."""
+        scores = numpy.random.random(size=20)
+        self.assertEqual(
+            list(range(20)),
+            sorted(acton.recommenders.choose_boltzmann(None, scores, 30)))
+
+    def test_distribution(self):
+        """choose_boltzmann samples from the Boltzmann distribution."""
+        numpy.random.seed(0)
+        scores = numpy.log(numpy.array([1.0, 2.0, 3.0, 4.0]))
+        n_trials = 4000
+        firsts = numpy.zeros(4)
+        for _ in range(n_trials):
+            chosen = acton.recommenders.choose_boltzmann(None, scores, 2)
+            self.assertEqual(2, len(set(chosen)))
+            firsts[chosen[0]] += 1
+        # The first choice is drawn with probability exp(score) / sum.
+        self.assertTrue(numpy.allclose([0.1, 0.2, 0.3, 0.4],
+                                       firsts / n_trials, atol=0.03))
+
+
+class TestSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.n = 10
+        self.ids = list(range(self.n))
+        self.predictions = numpy.random.random(size=(self.n, 1, 2))
+        self.db = unittest.mock.Mock()
+        self.db.read_features.return_value = numpy.random.random(
+            size=(self.n, 3))
+
+    def test_boltzmann_skips_features(self):
+        """Recommenders don't read features for Boltzmann selection."""
+        ur = acton.recommenders.UncertaintyRecommender(self.db)
+        self.assertFalse(ur.needs_features)
+        recommendations = ur.recommend(self.ids, self.predictions, n=3)
+        self.assertEqual(3, len(set(recommendations)))
+        self.db.read_features.assert_not_called()
+
+    def test_mmr_reads_features(self):
+        """Recommenders read features for MMR selection."""
+        ur = acton.recommenders.UncertaintyRecommender(self.db,
+                                                       selection='mmr')
+        self.assertTrue(ur.needs_features)
+        recommendations = ur.recommend(self.ids, self.predictions, n=3)
+        self.assertEqual(3, len(set(recommendations)))
+        self.db.read_features.assert_called_once_with(self.ids)
+
+    def test_unknown_selection(self):
+        """Recommenders reject unknown selections."""
+        with self.assertRaises(ValueError):
+            acton.recommenders.MarginRecommender(self.db, selection='unknown')
+
+
+class TestRecommendStream(unittest.TestCase):
+
+    def setUp(self):
+        self.n = 1000
+        self.ids = numpy.arange(self.n) * 2
+        self.predictions = numpy.random.random(size=(self.n, 1, 3))
+        self.predictions /= self.predictions.sum(axis=2, keepdims=True)
+        self.db = unittest.mock.Mock()
+        self.db.read_features.side_effect = lambda ids: numpy.asarray(
+            ids, dtype=float).reshape((-1, 1))
+
+    def chunks(self, chunk_size):
+        for start in range(0, self.n, chunk_size):
+            yield (self.ids[start:start + chunk_size],
+                   self.predictions[start:start + chunk_size])
+
+    def test_zero_diversity(self):
+        """Streaming recommendations match batch ones at zero diversity."""
+        for Recommender in [acton.recommenders.UncertaintyRecommender,
+                            acton.recommenders.EntropyRecommender,
+                            acton.recommenders.MarginRecommender]:
+            recommender = Recommender(self.db)
+            expected = recommender.recommend(
+                self.ids, self.predictions, n=5, diversity=0)
+            streamed = recommender.recommend_stream(
+                self.chunks(64), n=5, diversity=0)
+            self.assertEqual(list(expected), list(streamed))
+
+    def test_mmr(self):
+        """Streaming MMR only reads features for the best candidates."""
+        ur = acton.recommenders.UncertaintyRecommender(self.db,
+                                                       selection='mmr')
+        recommendations = ur.recommend_stream(self.chunks(64), n=3)
+        self.assertEqual(3, len(set(recommendations)))
+        self.db.read_features.assert_called_once()
+        candidates = self.db.read_features.call_args[0][0]
+        self.assertEqual(30, len(candidates))
+        self.assertTrue(set(recommendations) <= set(candidates))
+
+    def test_qbc(self):
+        """QBCRecommender scores chunks independently."""
+        predictions = numpy.random.random(size=(self.n, 5, 3))
+        qbc = acton.recommenders.QBCRecommender(self.db)
+        scores = qbc.score(predictions)
+        self.assertEqual((self.n,), scores.shape)
+        self.assertTrue(numpy.allclose(
+            scores[:10], qbc.score(predictions[:10])))
+        self.assertTrue(((0 <= scores) & (scores < 1)).all())
+
+    def test_random(self):
+        """RandomRecommender streams without replacement."""
+        rr = acton.recommenders.RandomRecommender(self.db)
+        recommendations = rr.recommend_stream(self.chunks(64), n=50)
+        self.assertEqual(50, len(set(recommendations)))
+        self.assertTrue(set(recommendations) <= set(self.ids))
+
+
+class TestChooseKCenter(unittest.TestCase):
+
+    def setUp(self):
+        # Two well-separated clusters, one with higher scores.
+        self.features = numpy.concatenate([
+            numpy.random.normal(size=(50, 2)),
+            numpy.random.normal(size=(50, 2)) + 100])
+        self.scores = numpy.concatenate([
+            numpy.random.random(size=50) + 1,
+            numpy.random.random(size=50)])
+
+    def test_relevance(self):
+        """choose_kcenter chooses the highest scores when l = 1."""
+        chosen = acton.recommenders.choose_kcenter(
+            self.features, self.scores, 5, l=1)
+        self.assertEqual(numpy.argsort(-self.scores)[:5].tolist(), chosen)
+
+    def test_coverage(self):
+        """choose_kcenter covers feature space when l < 1."""
+        chosen = acton.recommenders.choose_kcenter(
+            self.features, self.scores, 2, l=0.5, n_candidates=100)
+        self.assertEqual(int(self.scores.argmax()), chosen[0])
+        self.assertGreaterEqual(chosen[1], 50)
+
+    def test_choose_all(self):
+        """choose_kcenter chooses every score if there are too few."""
+        chosen = acton.recommenders.choose_kcenter(
+            self.features, self.scores, 200, l=0)
+        self.assertEqual(list(range(100)), sorted(chosen))
+
+    def test_recommender(self):
+        """Recommenders use k-center selection with diversity."""
+        db = unittest.mock.Mock()
+        db.read_features.return_value = self.features
+        predictions = numpy.stack([self.scores / 2, 1 - self.scores / 2],
+                                  axis=1).reshape((100, 1, 2))
+        mr = acton.recommenders.MarginRecommender(db, selection='kcenter')
+        recommendations = mr.recommend(list(range(100)), predictions, n=10,
+                                       diversity=0.9)
+        self.assertEqual(10, len(set(recommendations)))
+        self.assertTrue(any(r < 50 for r in recommendations))
+        self.assertTrue(any(r >= 50 for r in recommendations))